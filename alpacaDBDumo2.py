@@ -1,7 +1,11 @@
+import argparse
+import bisect
+import json
 import requests
 import psycopg2
 from datetime import datetime, timedelta
 import time
+from data_quality import check_symbol, clean_records, mark_gap, open_gaps
 
 # Alpaca API credentials
 API_KEY = ""
@@ -14,6 +18,16 @@ DB_PORT = 5432
 DB_NAME = "alpaca_data"
 DB_USER = "postgres"
 DB_PASSWORD = "secretpass"
+DB_PARAMS = {
+    "host": DB_HOST,
+    "port": DB_PORT,
+    "database": DB_NAME,
+    "user": DB_USER,
+    "password": DB_PASSWORD
+}
+
+# Gaps closer together than this are re-fetched with one request window
+GAP_MERGE_DISTANCE = timedelta(days=1)
 
 def get_last_id():
     try:
@@ -34,11 +48,12 @@ def get_last_id():
         print(f"Error getting last ID: {e}")
         return 0
 
-def fetch_trading_data(symbol, start_date, end_date, page_token=None):
+def fetch_trading_data(symbol, start, end, page_token=None):
+    """Fetch one page of 1-minute bars between two RFC 3339 timestamps"""
     url = f"{BASE_URL}/stocks/{symbol}/bars"
     params = {
-        "start": f"{start_date}T09:00:00Z",
-        "end": f"{end_date}T16:00:00Z",
+        "start": start,
+        "end": end,
         "timeframe": "1Min",
         "limit": 10000  # Maximum allowed by Alpaca
     }
@@ -58,6 +73,8 @@ def fetch_trading_data(symbol, start_date, end_date, page_token=None):
         return None
 
 def insert_into_postgres(data, symbol, start_id):
+    """Clean and insert a page of bars; returns the last id used, or None if nothing was committed"""
+    conn = None
     try:
         conn = psycopg2.connect(
             host=DB_HOST,
@@ -67,6 +84,16 @@ def insert_into_postgres(data, symbol, start_id):
             password=DB_PASSWORD
         )
         cursor = conn.cursor()
+        cursor.execute(
+            "SELECT timestamp FROM trading_info WHERE symbol = %s AND timestamp BETWEEN %s AND %s",
+            (symbol, data[0]["t"], data[-1]["t"])
+        )
+        existing = [row[0] for row in cursor.fetchall()]
+        data, report = clean_records(symbol, data, existing)
+        summary = report.summary()
+        print(f"Dropped {summary['bars'] - len(data)} of {summary['bars']} bars "
+              f"(already stored, {summary['duplicates']} duplicate, {summary['off_session']} outside "
+              f"the session, {summary['invalid']} invalid); {summary['outliers']} return outliers kept")
         
         current_id = start_id
         for record in data:
@@ -93,19 +120,97 @@ def insert_into_postgres(data, symbol, start_id):
                     close_price, number_of_trades, volume, volume_weighted_average_price
                 )
             )
-        
+        if data:
+            # Delivered on commit; app.py drops what its caches hold for the symbol and
+            # the daily rollup re-aggregates it from the earliest day written
+            cursor.execute("SELECT pg_notify('bars_changed', %s)",
+                           (json.dumps({"symbol": symbol, "start": min(record["t"] for record in data)}),))
         conn.commit()
         cursor.close()
         conn.close()
         return current_id
     except Exception as e:
         print(f"Database error: {e}")
-        return start_id
+        if conn is not None:
+            conn.close()
+        return None
+
+def fetch_all(symbol, start, end):
+    """Fetch every page of bars between two RFC 3339 timestamps; None if a request failed"""
+    bars = []
+    page_token = None
+    while True:
+        # Add delay to respect rate limits
+        time.sleep(0.5)
+        response = fetch_trading_data(symbol, start, end, page_token)
+        if response is None:
+            return None
+        bars.extend(response.get("bars") or [])
+        page_token = response.get("next_page_token")
+        if not page_token:
+            return bars
+
+def backfill_gaps(symbol, start_date, end_date):
+    """Re-fetch only the session minutes recorded as missing in bar_gaps"""
+    report = check_symbol(DB_PARAMS, symbol, start_date, end_date)
+    print(f"Quality check: {report.summary()}")
+    
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        gaps = open_gaps(conn, symbol, start_date, f"{end_date} 23:59:59")
+        # Merge nearby gaps into shared request windows: (start, end, gaps)
+        windows = []
+        for gap in gaps:
+            if windows and gap[1] - windows[-1][1] <= GAP_MERGE_DISTANCE:
+                windows[-1][1] = max(windows[-1][1], gap[2])
+                windows[-1][2].append(gap)
+            else:
+                windows.append([gap[1], gap[2], [gap]])
+        print(f"Backfilling {len(gaps)} gaps with {len(windows)} request windows...")
+        
+        current_id = get_last_id()
+        for window_start, window_end, window_gaps in windows:
+            bars = fetch_all(
+                symbol,
+                window_start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                (window_end - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            )
+            if bars is None:
+                continue  # Leave the gaps open to retry
+            if bars:
+                inserted_id = insert_into_postgres(bars, symbol, current_id)
+                if inserted_id is None:
+                    continue  # Nothing was stored; leave the gaps open to retry
+                current_id = inserted_id
+            # Judge each gap by the rows now stored, not the fetched bars cleaning may have dropped
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT timestamp FROM trading_info WHERE symbol = %s AND timestamp >= %s AND timestamp < %s "
+                    "ORDER BY timestamp",
+                    (symbol, window_start, window_end)
+                )
+                stored = [row[0] for row in cursor.fetchall()]
+            for gap_id, gap_start, gap_end in window_gaps:
+                # Gaps the source has no usable bars for (no trades that minute) are not fetched again
+                i = bisect.bisect_left(stored, gap_start)
+                found = i < len(stored) and stored[i] < gap_end
+                mark_gap(conn, gap_id, 'filled' if found else 'empty')
+    finally:
+        conn.close()
 
 def main():
-    symbol = "AAPL"
-    start_date = "2023-01-01"  # Replace with your start date
-    end_date = "2024-01-01"    # Replace with your end date
+    parser = argparse.ArgumentParser(description="Load 1-minute bars from Alpaca into trading_info")
+    parser.add_argument('--symbol', default="AAPL")
+    parser.add_argument('--start', default="2023-01-01", help="Start date (YYYY-MM-DD)")
+    parser.add_argument('--end', default="2024-01-01", help="End date (YYYY-MM-DD)")
+    parser.add_argument('--backfill', action='store_true',
+                        help="Only re-fetch the missing minutes recorded in bar_gaps")
+    args = parser.parse_args()
+    symbol, start_date, end_date = args.symbol, args.start, args.end
+    
+    if args.backfill:
+        backfill_gaps(symbol, start_date, end_date)
+        return
     
     print(f"Fetching trading data for {symbol} from {start_date} to {end_date}...")
     
@@ -120,8 +225,8 @@ def main():
         # Add delay to respect rate limits
         time.sleep(0.5)
         
-        # Fetch data with pagination
-        response = fetch_trading_data(symbol, start_date, end_date, page_token)
+        # Fetch data with pagination; bars outside the regular session are dropped before insert
+        response = fetch_trading_data(symbol, f"{start_date}T00:00:00Z", f"{end_date}T23:59:59Z", page_token)
         
         if not response or not response.get("bars"):
             break
@@ -131,7 +236,11 @@ def main():
         print(f"Processing {len(data)} records...")
         
         # Insert data and get the last used ID
-        current_id = insert_into_postgres(data, symbol, current_id)
+        inserted_id = insert_into_postgres(data, symbol, current_id)
+        if inserted_id is None:
+            print("Stopping: a page could not be stored; rerun to resume")
+            break
+        current_id = inserted_id
         
         # Check if there's more data to fetch
         page_token = response.get("next_page_token")
@@ -139,6 +248,10 @@ def main():
             break
     
     print(f"Completed! Total records processed: {total_records}")
+    
+    # Record missing minutes in bar_gaps for a later --backfill run
+    report = check_symbol(DB_PARAMS, symbol, start_date, end_date)
+    print(f"Quality check: {report.summary()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
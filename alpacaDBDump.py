@@ -1,6 +1,9 @@
+import os
+import json
 import requests
 import psycopg2
 from datetime import datetime, timedelta
+from data_quality import clean_records
 
 # Alpaca API credentials
 API_KEY = os.getenv('APCA_API_KEY_ID')
@@ -17,9 +20,10 @@ DB_PASSWORD = "secretpass"
 # Function to fetch trading data
 def fetch_trading_data(symbol, start_date, end_date):
     url = f"{BASE_URL}/stocks/{symbol}/bars"
+    # Whole UTC days; bars outside the regular session are dropped before insert
     params = {
-        "start": f"{start_date}T09:00:00Z",
-        "end": f"{end_date}T16:00:00Z",
+        "start": f"{start_date}T00:00:00Z",
+        "end": f"{end_date}T23:59:59Z",
         "timeframe": "1Min",
     }
     headers = {
@@ -44,6 +48,16 @@ def insert_into_postgres(data, symbol):
             password=DB_PASSWORD
         )
         cursor = conn.cursor()
+        cursor.execute(
+            "SELECT timestamp FROM trading_info WHERE symbol = %s AND timestamp BETWEEN %s AND %s",
+            (symbol, data[0]["t"], data[-1]["t"])
+        )
+        existing = [row[0] for row in cursor.fetchall()]
+        data, report = clean_records(symbol, data, existing)
+        summary = report.summary()
+        print(f"Dropped {summary['bars'] - len(data)} of {summary['bars']} bars "
+              f"(already stored, {summary['duplicates']} duplicate, {summary['off_session']} outside "
+              f"the session, {summary['invalid']} invalid); {summary['outliers']} return outliers kept")
         for record in data:
             timestamp = datetime.strptime(record["t"], "%Y-%m-%dT%H:%M:%SZ")
             open_price = record["o"]
@@ -67,6 +81,11 @@ def insert_into_postgres(data, symbol):
                     number_of_trades, volume, volume_weighted_average_price
                 )
             )
+        if data:
+            # Delivered on commit; app.py drops what its caches hold for the symbol and
+            # the daily rollup re-aggregates it from the earliest day written
+            cursor.execute("SELECT pg_notify('bars_changed', %s)",
+                           (json.dumps({"symbol": symbol, "start": min(record["t"] for record in data)}),))
         conn.commit()
         cursor.close()
         conn.close()
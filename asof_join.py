@@ -0,0 +1,206 @@
+from datetime import timedelta
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import psycopg2
+
+# trading_info columns that can be aligned
+BAR_FIELDS = ('open_price', 'high_price', 'low_price', 'close_price',
+              'number_of_trades', 'volume', 'volume_weighted_average_price')
+CLOCKS = ('union', 'intersection')
+
+Duration = Union[int, str, np.timedelta64, timedelta, None]
+
+
+class AlignedBars(NamedTuple):
+    """Bars of several symbols as of each time of a common clock"""
+    clock: np.ndarray                # datetime64[ns], ascending
+    symbols: List[str]
+    fields: Dict[str, np.ndarray]    # field -> symbol x clock matrix, NaN where no bar is usable
+    observed_at: np.ndarray          # symbol x clock time of the bar used (NaT where none)
+
+
+def to_ns(value: Duration) -> Optional[int]:
+    """Duration in nanoseconds from an int (ns), timedelta, numpy timedelta64 or a string like '5Min'"""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        import pandas as pd
+        return int(pd.Timedelta(value).value)
+    return int(np.timedelta64(value, 'ns').astype(np.int64))
+
+
+def _times_ns(times) -> np.ndarray:
+    return np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    # A sort and neighbour compare; np.unique is several times slower on large int64 arrays
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def asof_index(times: np.ndarray, clock: np.ndarray, tolerance: Optional[int] = None,
+               limit: Optional[int] = None) -> np.ndarray:
+    """
+    Index of the last bar at or before each clock time, or -1 where none is usable
+
+    Args:
+        times: Bar times of one symbol as int64 ns, ascending
+        clock: Clock times as int64 ns, ascending
+        tolerance: Oldest a bar may be, in ns, to be carried to a clock time
+        limit: Most clock times after the one a bar first appears at that it may be carried to
+    """
+    # Clock position each bar is first seen at; counting the bars seen up to each clock
+    # time gives the latest one. Looking bars up in the clock (not the clock in the bars)
+    # keeps it cheap when a union clock is much longer than any one symbol's bars.
+    first_seen = np.searchsorted(clock, times, side='left')
+    index = np.cumsum(np.bincount(first_seen, minlength=len(clock) + 1)[:len(clock)]) - 1
+    usable = index >= 0
+    if tolerance is not None:
+        usable &= clock - times[np.maximum(index, 0)] <= tolerance
+    if limit is not None:
+        # Every clock time after the first one a bar is seen at is a forward fill
+        usable &= np.arange(len(clock)) - first_seen[np.maximum(index, 0)] <= limit
+    return np.where(usable, index, -1)
+
+
+def build_clock(times: Sequence[np.ndarray], how: str = 'union', freq: Optional[int] = None) -> np.ndarray:
+    """
+    Common clock (int64 ns) for several ascending bar time arrays
+
+    Args:
+        times: Bar times of each symbol as int64 ns
+        how: 'union' of all bar times or their 'intersection'
+        freq: Regular grid step in ns over the span of the bars instead (how is then ignored)
+    """
+    times = [t for t in times if len(t)]
+    if not times:
+        return np.empty(0, dtype=np.int64)
+    if freq is not None:
+        start = min(t[0] for t in times) // freq * freq
+        return np.arange(start, max(t[-1] for t in times) + 1, freq, dtype=np.int64)
+    if how == 'union':
+        return _sorted_unique(np.concatenate(times))
+    if how == 'intersection':
+        clock = _sorted_unique(times[0])
+        for t in times[1:]:
+            if not len(clock):
+                break
+            clock = clock[t[np.minimum(np.searchsorted(t, clock), len(t) - 1)] == clock]
+        return clock
+    raise ValueError(f"clock must be one of {', '.join(CLOCKS)}")
+
+
+def align(series: Mapping[str, Tuple[np.ndarray, Mapping[str, np.ndarray]]],
+          clock: Union[str, np.ndarray] = 'union',
+          freq: Duration = None,
+          tolerance: Duration = None,
+          limit: Optional[int] = None) -> AlignedBars:
+    """
+    As-of join of several symbols' bars onto one clock
+
+    Each clock time takes, per symbol, the last bar at or before it, so no
+    value is ever taken from the future. Bars are looked up with one
+    searchsorted per symbol instead of successive merges.
+
+    Args:
+        series: symbol -> (ascending bar times, {field: values})
+        clock: 'union' or 'intersection' of the bar times, a symbol whose bar times
+            are used, or explicit clock times
+        freq: Regular clock step (e.g. '1Min') over the span of the bars, overriding clock
+        tolerance: Oldest a bar may be (e.g. '5Min') to be carried forward
+        limit: Most clock times a bar is forward filled to after the one it appears at
+    """
+    symbols = list(series)
+    times = {symbol: _times_ns(series[symbol][0]) for symbol in symbols}
+    if isinstance(clock, str):
+        if clock in times:
+            clock_ns = _sorted_unique(times[clock])
+        else:
+            clock_ns = build_clock([times[s] for s in symbols], clock, to_ns(freq))
+    else:
+        clock_ns = _sorted_unique(_times_ns(clock))
+    tolerance = to_ns(tolerance)
+
+    field_names = list(dict.fromkeys(name for s in symbols for name in series[s][1]))
+    fields = {name: np.full((len(symbols), len(clock_ns)), np.nan) for name in field_names}
+    observed_at = np.full((len(symbols), len(clock_ns)), np.iinfo(np.int64).min, dtype=np.int64)
+    for row, symbol in enumerate(symbols):
+        bar_times = times[symbol]
+        if not len(bar_times):
+            continue
+        index = asof_index(bar_times, clock_ns, tolerance, limit)
+        missing = index < 0
+        # Gather at every clock time then blank the unusable ones; cheaper than masked assignment
+        taken = np.maximum(index, 0)
+        np.take(bar_times, taken, out=observed_at[row])
+        np.copyto(observed_at[row], np.iinfo(np.int64).min, where=missing)
+        for name, values in series[symbol][1].items():
+            np.take(np.asarray(values, dtype=np.float64), taken, out=fields[name][row])
+            np.copyto(fields[name][row], np.nan, where=missing)
+    return AlignedBars(clock_ns.view('datetime64[ns]'), symbols, fields, observed_at.view('datetime64[ns]'))
+
+
+def align_frames(frames, clock: Union[str, np.ndarray] = 'union', freq: Duration = None,
+                 tolerance: Duration = None, limit: Optional[int] = None,
+                 columns: Optional[Sequence[str]] = None, time_column: str = 'timestamp'):
+    """
+    align() over DataFrames of bars (e.g. from fetch_data), returning one DataFrame
+    indexed by the clock with (symbol, field) columns
+
+    Args:
+        frames: symbol -> DataFrame sorted by time_column
+        columns: Fields to align (default: every numeric column)
+    """
+    import pandas as pd
+
+    series = {}
+    for symbol, df in frames.items():
+        names = columns or [c for c in df.columns if c != time_column and pd.api.types.is_numeric_dtype(df[c])]
+        series[symbol] = (df[time_column].to_numpy(), {name: df[name].to_numpy() for name in names})
+    aligned = align(series, clock, freq, tolerance, limit)
+    data = {(symbol, name): aligned.fields[name][row]
+            for row, symbol in enumerate(aligned.symbols) for name in aligned.fields}
+    return pd.DataFrame(data, index=pd.DatetimeIndex(aligned.clock, name=time_column))
+
+
+def load_series(db_params: Dict[str, str], symbols: Sequence[str], start_date, end_date,
+                fields: Sequence[str] = ('close_price',)) -> Dict[str, Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+    """Bars of several symbols from trading_info in one query, in the form align() takes"""
+    unknown = [f for f in fields if f not in BAR_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT symbol, timestamp, {', '.join(fields)}
+                FROM trading_info
+                WHERE symbol = ANY(%s)
+                AND timestamp BETWEEN %s AND %s
+                ORDER BY symbol, timestamp
+                """,
+                (list(symbols), start_date, end_date)
+            )
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    names = np.array([row[0] for row in rows], dtype=object)
+    times = np.array([row[1] for row in rows], dtype='datetime64[ns]')
+    values = np.array([row[2:] for row in rows], dtype=np.float64).reshape(len(rows), len(fields))
+    # Rows come grouped by symbol, so each symbol is one contiguous slice
+    bounds = np.flatnonzero(names[1:] != names[:-1]) + 1
+    starts = np.r_[0, bounds] if len(rows) else np.empty(0, dtype=int)
+    stops = np.r_[bounds, len(rows)] if len(rows) else np.empty(0, dtype=int)
+    found = {names[a]: (a, b) for a, b in zip(starts, stops)}
+
+    series = {}
+    for symbol in symbols:
+        a, b = found.get(symbol, (0, 0))
+        series[symbol] = (times[a:b], {name: values[a:b, i] for i, name in enumerate(fields)})
+    return series
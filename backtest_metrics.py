@@ -0,0 +1,199 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+NS_PER_YEAR = 365.25 * 24 * 3600 * 1e9
+
+# One row per closed round trip
+ROUND_TRIP_DTYPE = np.dtype([
+    ('entry_time', '<i8'),  # epoch nanoseconds
+    ('exit_time', '<i8'),
+    ('entry_price', '<f8'),
+    ('exit_price', '<f8'),
+    ('side', 'i1'),         # 1 long / -1 short
+    ('pnl', '<f8'),         # side-adjusted return of the trade
+])
+
+
+def bar_periods_per_year(timestamps) -> float:
+    """Bars per year observed over a run's timestamps, the rate MetricsAccumulator.results annualizes with"""
+    times = np.asarray(timestamps, dtype='datetime64[ns]').view(np.int64)
+    years = (times[-1] - times[0]) / NS_PER_YEAR if len(times) > 1 else 0
+    return len(times) / years if years > 0 else 252
+
+
+def pair_round_trips(times: np.ndarray, result, open_trade=None):
+    """
+    Pair a kernel run's entry/exit events into ROUND_TRIP_DTYPE rows
+
+    Events alternate entry, exit, entry, ... except that the first may be the
+    exit of open_trade (entry_time, entry_price, side) carried from an earlier
+    chunk. Returns the round trips and the trade still open afterwards.
+    """
+    idx = result.event_index
+    ev_times = times[idx]
+    ev_price = result.event_price
+    ev_side = result.event_side
+    is_exit = result.event_is_exit
+
+    entry_time = ev_times[~is_exit]
+    entry_price = ev_price[~is_exit]
+    entry_side = ev_side[~is_exit]
+    exit_time = ev_times[is_exit]
+    exit_price = ev_price[is_exit]
+
+    if len(idx) and is_exit[0]:
+        if open_trade is None:
+            raise ValueError("Exit event without an open trade")
+        entry_time = np.concatenate(([open_trade[0]], entry_time))
+        entry_price = np.concatenate(([open_trade[1]], entry_price))
+        entry_side = np.concatenate(([open_trade[2]], entry_side))
+
+    n_closed = len(exit_time)
+    trips = np.zeros(n_closed, dtype=ROUND_TRIP_DTYPE)
+    trips['entry_time'] = entry_time[:n_closed]
+    trips['exit_time'] = exit_time
+    trips['entry_price'] = entry_price[:n_closed]
+    trips['exit_price'] = exit_price
+    trips['side'] = entry_side[:n_closed]
+    trips['pnl'] = trips['side'] * (exit_price - trips['entry_price']) / trips['entry_price']
+
+    if len(entry_time) > n_closed:
+        open_trade = (entry_time[-1], entry_price[-1], entry_side[-1])
+    elif n_closed:
+        open_trade = None
+    return trips, open_trade
+
+
+class MetricsAccumulator:
+    def __init__(self, initial_capital: float):
+        """
+        Streaming performance metrics for a backtest, fed one chunk of bars at a time
+
+        Every statistic is merged per chunk with array operations, so an
+        in-memory run (one chunk) and a chunked run give the same results.
+
+        Args:
+            initial_capital: Starting capital of the backtest
+        """
+        self.initial_capital = initial_capital
+        self.final_capital = initial_capital
+        self.n_bars = 0
+        self.first_time = None
+        self.last_time = None
+        # Strategy return moments (Chan et al. merge) and downside sum of squares
+        self.returns_count = 0
+        self.returns_mean = 0.0
+        self.returns_m2 = 0.0
+        self.downside_sq = 0.0
+        # Drawdown depth and duration
+        self.peak_capital = initial_capital
+        self.peak_time = None
+        self.max_drawdown = 0.0
+        self.max_drawdown_duration = 0
+        # Exposure and turnover
+        self.bars_in_market = 0
+        self.position_changes = 0.0
+        self.last_position = 0
+        # Closed trades
+        self.trades = np.zeros(0, dtype=ROUND_TRIP_DTYPE)
+        self._trade_parts = []
+        self.open_trade = None
+
+    def update(self, timestamps, result) -> None:
+        """Fold one chunk of bars and its simulation_kernels.SimulationResult into the totals"""
+        times = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        capital = result.capital
+        n = len(capital)
+        if not n:
+            return
+        if self.first_time is None:
+            self.first_time = times[0]
+            self.peak_time = times[0]
+        self.last_time = times[-1]
+        self.n_bars += n
+        self.final_capital = float(capital[-1])
+
+        returns = result.strategy_returns[~np.isnan(result.strategy_returns)]
+        if len(returns):
+            n_a, n_b = self.returns_count, len(returns)
+            mean_b = returns.mean()
+            m2_b = ((returns - mean_b) ** 2).sum()
+            delta = mean_b - self.returns_mean
+            total = n_a + n_b
+            self.returns_mean += delta * n_b / total
+            self.returns_m2 += m2_b + delta ** 2 * n_a * n_b / total
+            self.returns_count = total
+            self.downside_sq += np.square(np.minimum(returns, 0)).sum()
+
+        # A bar at or above the running peak resets the drawdown clock
+        running_max = np.maximum.accumulate(np.maximum(capital, self.peak_capital))
+        self.max_drawdown = max(self.max_drawdown, float(np.max(1 - capital / running_max)))
+        at_peak = capital >= running_max
+        peak_idx = np.where(at_peak, np.arange(n), -1)
+        np.maximum.accumulate(peak_idx, out=peak_idx)
+        peak_times = np.where(peak_idx >= 0, times[np.maximum(peak_idx, 0)], self.peak_time)
+        self.max_drawdown_duration = max(self.max_drawdown_duration, int(np.max(times - peak_times)))
+        self.peak_capital = float(running_max[-1])
+        self.peak_time = peak_times[-1]
+
+        position = result.position
+        self.bars_in_market += int(np.count_nonzero(position))
+        self.position_changes += float(np.abs(np.diff(position, prepend=self.last_position)).sum())
+        self.last_position = int(position[-1])
+
+        trips, self.open_trade = pair_round_trips(times, result, self.open_trade)
+        if len(trips):
+            self._trade_parts.append(trips)
+
+    def _years(self) -> float:
+        if self.first_time is None or self.last_time <= self.first_time:
+            return self.n_bars / 252
+        return (self.last_time - self.first_time) / NS_PER_YEAR
+
+    def results(self) -> Dict:
+        """Final metrics, annualized using the observed bar frequency"""
+        if self._trade_parts:
+            self.trades = np.concatenate([self.trades] + self._trade_parts)
+            self._trade_parts = []
+        trips = self.trades
+        years = self._years()
+        periods_per_year = self.n_bars / years if years > 0 else 252
+
+        total_return = (self.final_capital - self.initial_capital) / self.initial_capital
+        annual_return = total_return / years if years > 0 else np.nan
+        std = np.sqrt(self.returns_m2 / (self.returns_count - 1)) if self.returns_count > 1 else np.nan
+        downside = np.sqrt(self.downside_sq / self.returns_count) if self.returns_count else np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.sqrt(periods_per_year) * self.returns_mean / std
+            sortino = np.sqrt(periods_per_year) * self.returns_mean / downside
+            calmar = annual_return / self.max_drawdown if self.max_drawdown else np.nan
+
+        wins = trips['pnl'] > 0
+        profits = trips['pnl'][wins].sum()
+        losses = -trips['pnl'][trips['pnl'] < 0].sum()
+        durations = trips['exit_time'] - trips['entry_time']
+
+        return {
+            'Total Return (%)': round(total_return * 100, 2),
+            'Annual Return (%)': round(annual_return * 100, 2),
+            'Sharpe Ratio': round(float(sharpe), 2),
+            'Sortino Ratio': round(float(sortino), 2),
+            'Calmar Ratio': round(float(calmar), 2),
+            'Max Drawdown (%)': round(self.max_drawdown * 100, 2),
+            'Max Drawdown Duration': str(pd.Timedelta(self.max_drawdown_duration, unit='ns')),
+            'Exposure (%)': round(self.bars_in_market / self.n_bars * 100, 2) if self.n_bars else 0.0,
+            'Turnover (per year)': round(self.position_changes / years, 2) if years > 0 else 0.0,
+            'Number of Trades': len(trips),
+            'Win Rate (%)': round(wins.mean() * 100, 2) if len(trips) else 0.0,
+            'Average Trade Duration': str(pd.Timedelta(int(durations.mean()), unit='ns')) if len(trips) else "N/A",
+            'Profit Factor': round(profits / losses if losses != 0 else float('inf'), 2)
+        }
+
+
+def compute_metrics(timestamps, result, initial_capital: float) -> Dict:
+    """One-shot metrics for a complete in-memory run"""
+    metrics = MetricsAccumulator(initial_capital)
+    metrics.update(timestamps, result)
+    return metrics.results()
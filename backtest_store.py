@@ -0,0 +1,142 @@
+import hashlib
+import json
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Blob header: magic, format version, row count
+_HEADER = struct.Struct('<4sBI')
+_EQUITY_MAGIC = b'EQC1'
+_TRADES_MAGIC = b'TRD1'
+_FORMAT_VERSION = 1
+
+TRADE_DTYPE = np.dtype([
+    ('time', '<i8'),      # epoch nanoseconds
+    ('price', '<f8'),
+    ('returns', '<f8'),   # NaN for entries
+    ('is_exit', 'i1'),
+    ('side', 'i1'),       # 1 = buy, -1 = sell
+])
+
+
+def run_key(strategy: str, symbol: str, start_date: str, end_date: str, parameters: Dict,
+            data_version=None) -> str:
+    """
+    Stable key identifying a backtest run by its inputs
+
+    data_version (e.g. the bar count and newest timestamp of the range) makes
+    runs over bars that have since been added or back-filled get a new key.
+    """
+    payload = json.dumps(
+        [strategy, symbol, str(start_date), str(end_date), parameters]
+        + ([data_version] if data_version is not None else []),
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def json_safe(results: Dict) -> Dict:
+    """Copy a metrics dict replacing NaN/inf values, which JSON columns reject, with None"""
+    safe = {}
+    for name, value in results.items():
+        if isinstance(value, (float, np.floating)):
+            safe[name] = float(value) if np.isfinite(value) else None
+        elif isinstance(value, np.integer):
+            safe[name] = int(value)
+        else:
+            safe[name] = value
+    return safe
+
+
+def _to_epoch_ns(values) -> np.ndarray:
+    return np.asarray(values, dtype='datetime64[ns]').astype(np.int64)
+
+
+def pack_equity_curve(timestamps, capital) -> bytes:
+    """
+    Encode an equity curve as a compressed binary blob
+
+    Timestamps are delta-encoded and the capital series is stored as raw
+    float64, which zlib compresses well because capital only changes when a
+    trade closes.
+    """
+    times = _to_epoch_ns(timestamps)
+    values = np.asarray(capital, dtype='<f8')
+    deltas = np.diff(times, prepend=0).astype('<i8')
+    body = deltas.tobytes() + values.tobytes()
+    return _HEADER.pack(_EQUITY_MAGIC, _FORMAT_VERSION, len(times)) + zlib.compress(body, 6)
+
+
+def unpack_equity_curve(blob: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode a blob from pack_equity_curve into (datetime64[ns], capital) arrays"""
+    magic, version, n = _HEADER.unpack_from(blob)
+    if magic != _EQUITY_MAGIC or version != _FORMAT_VERSION:
+        raise ValueError("Unrecognized equity curve blob")
+    body = zlib.decompress(blob[_HEADER.size:])
+    deltas = np.frombuffer(body, dtype='<i8', count=n)
+    capital = np.frombuffer(body, dtype='<f8', count=n, offset=n * 8)
+    return np.cumsum(deltas).astype('datetime64[ns]'), capital
+
+
+def trades_to_array(trades: List[Dict]) -> np.ndarray:
+    """Convert the trade dicts produced by the backtest classes into TRADE_DTYPE rows"""
+    arr = np.zeros(len(trades), dtype=TRADE_DTYPE)
+    for i, trade in enumerate(trades):
+        is_exit = 'exit_date' in trade
+        arr[i] = (
+            _to_epoch_ns([trade['exit_date' if is_exit else 'entry_date']])[0],
+            trade['exit_price' if is_exit else 'entry_price'],
+            trade.get('returns', np.nan),
+            is_exit,
+            1 if trade['type'] == 'buy' else -1
+        )
+    return arr
+
+
+def array_to_trades(arr: np.ndarray) -> List[Dict]:
+    """Inverse of trades_to_array, with ISO 8601 dates (seconds resolution)"""
+    trades = []
+    times = np.datetime_as_string(arr['time'].astype('datetime64[ns]'), unit='s')
+    for row, ts in zip(arr, times):
+        kind = 'buy' if row['side'] > 0 else 'sell'
+        if row['is_exit']:
+            trades.append({
+                'exit_date': str(ts),
+                'exit_price': float(row['price']),
+                'returns': float(row['returns']),
+                'type': kind
+            })
+        else:
+            trades.append({
+                'entry_date': str(ts),
+                'entry_price': float(row['price']),
+                'type': kind
+            })
+    return trades
+
+
+def format_trades(trades: List[Dict]) -> List[Dict]:
+    """A backtest's trade dicts in the form stored runs are served in"""
+    return array_to_trades(trades_to_array(trades))
+
+
+def pack_trades(trades: List[Dict]) -> bytes:
+    """Encode a trade list as a compressed binary blob"""
+    arr = trades_to_array(trades)
+    return _HEADER.pack(_TRADES_MAGIC, _FORMAT_VERSION, len(arr)) + zlib.compress(arr.tobytes(), 6)
+
+
+def unpack_trade_array(blob: bytes) -> np.ndarray:
+    """Decode a blob from pack_trades into TRADE_DTYPE rows"""
+    magic, version, n = _HEADER.unpack_from(blob)
+    if magic != _TRADES_MAGIC or version != _FORMAT_VERSION:
+        raise ValueError("Unrecognized trades blob")
+    return np.frombuffer(zlib.decompress(blob[_HEADER.size:]), dtype=TRADE_DTYPE, count=n)
+
+
+def unpack_trades(blob: bytes) -> List[Dict]:
+    """Decode a blob from pack_trades back into trade dicts"""
+    return array_to_trades(unpack_trade_array(blob))
@@ -0,0 +1,280 @@
+import json
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+BAR_COLUMNS = [
+    'symbol', 'timestamp', 'open_price', 'high_price', 'low_price', 'close_price',
+    'number_of_trades', 'volume', 'volume_weighted_average_price'
+]
+
+# Partial-bar record: a single trade, or the running aggregate of an unfinished bar
+_RECORD_FIELDS = ('code', 'bucket', 'first_t', 'last_t', 'open', 'high', 'low', 'close',
+                  'volume', 'pv', 'count', 'cum_end')
+
+
+def _empty_bars() -> pd.DataFrame:
+    """Bar frame with no rows but the column dtypes of real bars, so it concatenates cleanly with them"""
+    return pd.DataFrame({
+        'symbol': pd.Series([], dtype=object),
+        'timestamp': pd.Series([], dtype='datetime64[ns]'),
+        **{c: pd.Series([], dtype=np.float64) for c in BAR_COLUMNS[2:6]},
+        'number_of_trades': pd.Series([], dtype=np.int64),
+        'volume': pd.Series([], dtype=np.float64),
+        'volume_weighted_average_price': pd.Series([], dtype=np.float64),
+    }, columns=BAR_COLUMNS)
+
+
+def _to_epoch_ns(times) -> np.ndarray:
+    values = np.asarray(times)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').astype(np.int64)
+    if values.dtype.kind in 'UO' and len(values) and all(str(v).endswith('Z') for v in values):
+        # Stream timestamps are RFC 3339 in UTC, which NumPy parses directly once the 'Z' is dropped
+        return np.array([v[:-1] for v in values], dtype='datetime64[ns]').astype(np.int64)
+    return pd.to_datetime(values, utc=True, format='ISO8601').tz_localize(None).values.astype('datetime64[ns]').astype(np.int64)
+
+
+class TradeBarAggregator:
+    def __init__(self,
+                 kind: str = 'time',
+                 interval: str = '1Min',
+                 threshold: Optional[float] = None,
+                 allowed_lateness: str = '2s',
+                 on_bars: Optional[Callable[[pd.DataFrame], None]] = None):
+        """
+        Build OHLCV/VWAP bars from trade streams in vectorized batches
+
+        Trades are held back until the watermark (latest trade time minus
+        allowed_lateness) passes them, so trades arriving out of order within
+        that window are placed correctly; anything older is counted in
+        late_trades and dropped. Per symbol only one unfinished bar is kept.
+        Volume and dollar bars close when the symbol's cumulative volume or
+        notional crosses the next multiple of threshold.
+
+        Args:
+            kind: 'time', 'volume' or 'dollar' bars
+            interval: Bar length for time bars (pandas offset string)
+            threshold: Shares (volume bars) or notional (dollar bars) per bar
+            allowed_lateness: How far behind the newest trade a trade may arrive
+            on_bars: Called with each DataFrame of finished bars
+        """
+        if kind not in ('time', 'volume', 'dollar'):
+            raise ValueError(f"Unknown bar kind: {kind}")
+        if kind != 'time' and not threshold:
+            raise ValueError("Volume and dollar bars need a threshold")
+        self.kind = kind
+        self.interval_ns = pd.Timedelta(interval).value
+        self.threshold = threshold
+        self.lateness_ns = pd.Timedelta(allowed_lateness).value
+        self.on_bars = on_bars
+        self.late_trades = 0
+        self.symbols: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._max_seen = np.iinfo(np.int64).min
+        self._watermark = np.iinfo(np.int64).min
+        self._cum = np.zeros(0)  # Cumulative volume/notional per symbol code
+        self._pending = self._empty_trades()
+        self._partial = {f: np.zeros(0, dtype=self._dtype(f)) for f in _RECORD_FIELDS}
+
+    @staticmethod
+    def _dtype(field):
+        return np.int64 if field in ('code', 'bucket', 'first_t', 'last_t', 'count') else np.float64
+
+    @staticmethod
+    def _empty_trades():
+        return {'code': np.zeros(0, np.int64), 't': np.zeros(0, np.int64),
+                'price': np.zeros(0), 'size': np.zeros(0)}
+
+    def _encode(self, symbols: np.ndarray) -> np.ndarray:
+        inverse, uniques = pd.factorize(symbols)
+        lookup = np.empty(len(uniques), dtype=np.int64)
+        for i, symbol in enumerate(uniques):
+            code = self._codes.get(symbol)
+            if code is None:
+                code = self._codes[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+                self._cum = np.append(self._cum, 0.0)
+            lookup[i] = code
+        return lookup[inverse]
+
+    def add_trades(self, symbols, times, prices, sizes) -> pd.DataFrame:
+        """
+        Add a batch of trades and return the bars it finished
+
+        Args:
+            symbols: Symbol per trade
+            times: Trade times as epoch nanoseconds, datetime64 or timestamp strings (UTC)
+            prices: Trade prices
+            sizes: Trade sizes
+        """
+        codes = self._encode(np.asarray(symbols))
+        t = _to_epoch_ns(times)
+        prices = np.asarray(prices, dtype=float)
+        sizes = np.asarray(sizes, dtype=float)
+
+        on_time = t > self._watermark
+        self.late_trades += int(len(t) - on_time.sum())
+        batch = {'code': codes[on_time], 't': t[on_time], 'price': prices[on_time], 'size': sizes[on_time]}
+        pending = {k: np.concatenate((self._pending[k], batch[k])) for k in batch}
+        if len(batch['t']):
+            self._max_seen = max(self._max_seen, int(batch['t'].max()))
+            self._watermark = max(self._watermark, self._max_seen - self.lateness_ns)
+
+        release = pending['t'] <= self._watermark
+        self._pending = {k: v[~release] for k, v in pending.items()}
+        released = {k: v[release] for k, v in pending.items()}
+        return self._build(released, final=False)
+
+    def add_messages(self, messages: Iterable[Dict]) -> pd.DataFrame:
+        """Add trades from decoded Alpaca stream messages ({"T": "t", "S", "p", "s", "t"})"""
+        trades = [m for m in messages if m.get('T') == 't']
+        if not trades:
+            return _empty_bars()
+        return self.add_trades(
+            [m['S'] for m in trades], [m['t'] for m in trades],
+            [m['p'] for m in trades], [m['s'] for m in trades]
+        )
+
+    def flush(self) -> pd.DataFrame:
+        """Release every held trade and finish all open bars (end of stream or file)"""
+        released, self._pending = self._pending, self._empty_trades()
+        return self._build(released, final=True)
+
+    def _build(self, trades: Dict[str, np.ndarray], final: bool) -> pd.DataFrame:
+        # Time order, then a stable sort by symbol keeps each symbol's trades in time order
+        if np.all(trades['t'][1:] >= trades['t'][:-1]):
+            order = np.argsort(trades['code'], kind='stable')
+        else:
+            order = np.argsort(trades['t'], kind='stable')
+            order = order[np.argsort(trades['code'][order], kind='stable')]
+        code, t = trades['code'][order], trades['t'][order]
+        price, size = trades['price'][order], trades['size'][order]
+
+        measure = size if self.kind == 'volume' else price * size
+        if self.kind == 'time':
+            bucket = t // self.interval_ns
+            cum_end = np.zeros(len(t))
+        else:
+            # Cumulative measure per symbol, continuing from earlier batches
+            starts = np.flatnonzero(np.r_[True, code[1:] != code[:-1]]) if len(code) else np.zeros(0, np.int64)
+            before = np.zeros(len(measure))
+            before[1:] = np.cumsum(measure)[:-1]
+            offsets = np.repeat(before[starts] - self._cum[code[starts]], np.diff(np.r_[starts, len(code)]))
+            before -= offsets
+            cum_end = before + measure
+            bucket = np.floor(before / self.threshold).astype(np.int64)
+            if len(code):
+                ends = np.r_[starts[1:] - 1, len(code) - 1]
+                self._cum[code[ends]] = cum_end[ends]
+
+        new = {
+            'code': code, 'bucket': bucket, 'first_t': t, 'last_t': t,
+            'open': price, 'high': price, 'low': price, 'close': price,
+            'volume': size, 'pv': price * size, 'count': np.ones(len(t), np.int64), 'cum_end': cum_end,
+        }
+        # Unfinished bars hold only trades older than these, so they go first within a symbol
+        records = {f: np.concatenate((self._partial[f], new[f])) for f in _RECORD_FIELDS}
+        order = np.argsort(records['code'], kind='stable')
+        records = {f: v[order] for f, v in records.items()}
+        if not len(records['code']):
+            return _empty_bars()
+
+        key_change = (np.diff(records['code']) != 0) | (np.diff(records['bucket']) != 0)
+        starts = np.flatnonzero(np.r_[True, key_change])
+        ends = np.r_[starts[1:], len(records['code'])] - 1
+        bars = {
+            'code': records['code'][starts],
+            'bucket': records['bucket'][starts],
+            'first_t': np.minimum.reduceat(records['first_t'], starts),
+            'last_t': np.maximum.reduceat(records['last_t'], starts),
+            'open': records['open'][starts],
+            'high': np.maximum.reduceat(records['high'], starts),
+            'low': np.minimum.reduceat(records['low'], starts),
+            'close': records['close'][ends],
+            'volume': np.add.reduceat(records['volume'], starts),
+            'pv': np.add.reduceat(records['pv'], starts),
+            'count': np.add.reduceat(records['count'], starts),
+            'cum_end': np.maximum.reduceat(records['cum_end'], starts),
+        }
+
+        if final:
+            done = np.ones(len(bars['code']), dtype=bool)
+        elif self.kind == 'time':
+            done = (bars['bucket'] + 1) * self.interval_ns <= self._watermark
+        else:
+            done = bars['cum_end'] >= (bars['bucket'] + 1) * self.threshold
+        self._partial = {f: v[~done] for f, v in bars.items()}
+
+        if not done.any():
+            return _empty_bars()
+        finished = {f: v[done] for f, v in bars.items()}
+        bar_time = finished['bucket'] * self.interval_ns if self.kind == 'time' else finished['first_t']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = np.where(finished['volume'] > 0, finished['pv'] / finished['volume'], finished['close'])
+        df = pd.DataFrame({
+            'symbol': np.array(self.symbols, dtype=object)[finished['code']] if len(finished['code']) else [],
+            'timestamp': bar_time.astype('datetime64[ns]'),
+            'open_price': finished['open'],
+            'high_price': finished['high'],
+            'low_price': finished['low'],
+            'close_price': finished['close'],
+            'number_of_trades': finished['count'],
+            'volume': finished['volume'],
+            'volume_weighted_average_price': vwap,
+        }, columns=BAR_COLUMNS)
+        df = df.sort_values(['timestamp', 'symbol'], kind='stable').reset_index(drop=True)
+        if self.on_bars is not None and len(df):
+            self.on_bars(df)
+        return df
+
+
+def read_trade_csv(path: str, chunk_size: int = 1_000_000) -> Iterable[pd.DataFrame]:
+    """Read a recorded trade file with symbol, timestamp, price, size columns in chunks"""
+    return pd.read_csv(path, chunksize=chunk_size)
+
+
+def aggregate_trade_file(path: str, chunk_size: int = 1_000_000, **aggregator_args) -> pd.DataFrame:
+    """Build bars from a recorded trade CSV file, read chunk_size trades at a time"""
+    aggregator = TradeBarAggregator(**aggregator_args)
+    parts = [
+        aggregator.add_trades(chunk['symbol'], chunk['timestamp'], chunk['price'], chunk['size'])
+        for chunk in read_trade_csv(path, chunk_size)
+    ]
+    parts.append(aggregator.flush())
+    return pd.concat(parts, ignore_index=True)
+
+
+def insert_bars(db_params: Dict[str, str], bars: pd.DataFrame, notify: bool = True) -> None:
+    """Insert finished bars into trading_info and announce them on the 'bar' channel"""
+    if bars.empty:
+        return
+    rows = list(zip(
+        bars['symbol'], bars['timestamp'].dt.to_pydatetime(),
+        *(bars[c].astype(float).tolist() for c in BAR_COLUMNS[2:6]),
+        bars['number_of_trades'].astype(int).tolist(),
+        bars['volume'].astype(float).tolist(),
+        bars['volume_weighted_average_price'].astype(float).tolist()
+    ))
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO trading_info (
+                    symbol, timestamp, open_price, high_price, low_price, close_price,
+                    number_of_trades, volume, volume_weighted_average_price
+                )
+                VALUES %s
+            """, rows)
+            if notify:
+                # Listened to by app.py so the dashboard's 'bar' event stream sees live bars
+                for bar in bars.assign(timestamp=bars['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S.%f')).to_dict('records'):
+                    cursor.execute("SELECT pg_notify('bar', %s)", (json.dumps(bar),))
+        conn.commit()
+    finally:
+        conn.close()
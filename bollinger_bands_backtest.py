@@ -1,9 +1,15 @@
 import pandas as pd
 import numpy as np
 import psycopg2
+import os
 from datetime import datetime
-import matplotlib.pyplot as plt
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional
+from chunked_backtest import run_chunked
+from backtest_metrics import MetricsAccumulator
+from simulation_kernels import simulate, MODE_FLIP
+from indicator_cache import rolling_indicator
+from execution_model import ExecutionModel
+from shared_bars import fetch_shared_bars
 
 class BollingerBandsBacktest:
     def __init__(self, 
@@ -13,7 +19,10 @@ class BollingerBandsBacktest:
                  end_date: str,
                  window: int = 20,
                  num_std: float = 2.0,
-                 initial_capital: float = 100000.0):
+                 initial_capital: float = 100000.0,
+                 commission: float = 0.0,
+                 slippage: float = 0.0,
+                 execution: Optional[Dict] = None):
         """
         Initialize the Bollinger Bands backtest strategy
         
@@ -25,6 +34,10 @@ class BollingerBandsBacktest:
             window: Moving average window
             num_std: Number of standard deviations for bands
             initial_capital: Starting capital for backtest
+            commission: Fraction of traded notional charged on every fill
+            slippage: Fraction of the close price lost to slippage on every fill
+            execution: Further execution_model.ExecutionModel arguments (per-share
+                commission, spread and volume impact, position sizing)
         """
         self.db_params = db_params
         self.symbol = symbol
@@ -33,12 +46,18 @@ class BollingerBandsBacktest:
         self.window = window
         self.num_std = num_std
         self.initial_capital = initial_capital
+        self.commission = commission
+        self.slippage = slippage
+        self.execution = ExecutionModel.from_params(commission, slippage, execution)
         self.positions = 0
         self.capital = initial_capital
         self.trades: List[Dict] = []
         
     def fetch_data(self) -> pd.DataFrame:
-        """Fetch data from PostgreSQL database"""
+        """Fetch data from the shared bar server when one is configured (BAR_SERVER), else PostgreSQL"""
+        df = fetch_shared_bars(self.symbol, self.start_date, self.end_date)
+        if df is not None:
+            return df
         try:
             conn = psycopg2.connect(**self.db_params)
             query = """
@@ -63,10 +82,11 @@ class BollingerBandsBacktest:
     
     def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculate Bollinger Bands indicators"""
-        df['SMA'] = df['close_price'].rolling(window=self.window).mean()
-        df['STD'] = df['close_price'].rolling(window=self.window).std()
+        df['SMA'] = rolling_indicator(self.symbol, 'sma', self.window, df)
+        df['STD'] = rolling_indicator(self.symbol, 'std', self.window, df)
         df['Upper_Band'] = df['SMA'] + (df['STD'] * self.num_std)
         df['Lower_Band'] = df['SMA'] - (df['STD'] * self.num_std)
+        df['Size'] = self.execution.position_size(df['close_price'])
         df['Position'] = 0  # Initialize position column
         return df
     
@@ -93,106 +113,90 @@ class BollingerBandsBacktest:
         
         # Initialize results tracking
         df['Returns'] = df['close_price'].pct_change()
-        df['Strategy_Returns'] = 0.0
-        df['Capital'] = self.initial_capital
-        
-        # Execute trades
-        current_position = 0
-        
-        for i in range(1, len(df)):
-            if df['Position'].iloc[i] != 0 and df['Position'].iloc[i] != current_position:
-                # Close existing position if any
-                if current_position != 0:
-                    returns = (df['close_price'].iloc[i] - entry_price) / entry_price
-                    self.capital *= (1 + returns * current_position)
-                    self.trades.append({
-                        'exit_date': df['timestamp'].iloc[i],
-                        'exit_price': df['close_price'].iloc[i],
-                        'returns': returns,
-                        'type': 'sell' if current_position > 0 else 'buy'
-                    })
-                
-                # Open new position
-                current_position = df['Position'].iloc[i]
-                entry_price = df['close_price'].iloc[i]
-                self.trades.append({
-                    'entry_date': df['timestamp'].iloc[i],
-                    'entry_price': entry_price,
-                    'type': 'buy' if current_position > 0 else 'sell'
-                })
-            
-            df.loc[df.index[i], 'Capital'] = self.capital
-            if current_position != 0:
-                df.loc[df.index[i], 'Strategy_Returns'] = df['Returns'].iloc[i] * current_position
+        metrics = MetricsAccumulator(self.initial_capital)
+        capital, strategy_returns = self._simulate(df, self.initial_state(), metrics)
+        df['Strategy_Returns'] = strategy_returns
+        df['Capital'] = capital
         
         # Calculate strategy performance metrics
-        results = self.calculate_performance_metrics(df)
+        results = metrics.results()
         
         return df, results
     
-    def calculate_performance_metrics(self, df: pd.DataFrame) -> Dict:
-        """Calculate strategy performance metrics"""
-        total_return = (self.capital - self.initial_capital) / self.initial_capital
-        strategy_returns = df['Strategy_Returns'].dropna()
-        
-        results = {
-            'Total Return (%)': round(total_return * 100, 2),
-            'Annual Return (%)': round(total_return / (len(df) / 252) * 100, 2),
-            'Sharpe Ratio': round(np.sqrt(252) * strategy_returns.mean() / strategy_returns.std(), 2),
-            'Max Drawdown (%)': round(self.calculate_max_drawdown(df) * 100, 2),
-            'Number of Trades': len(self.trades),
-            'Win Rate (%)': self.calculate_win_rate(),
-            'Profit Factor': self.calculate_profit_factor()
-        }
-        
-        return results
+    def execute_backtest_chunked(self, chunk_size: int = 100_000) -> Dict:
+        """
+        Execute the backtest over bars streamed from the database in chunks
+
+        Produces the same metrics as execute_backtest while holding at most
+        one chunk of bars (plus the rolling window) in memory.
+        """
+        return run_chunked(self, chunk_size).results()
     
-    def calculate_max_drawdown(self, df: pd.DataFrame) -> float:
-        """Calculate maximum drawdown"""
-        rolling_max = df['Capital'].expanding().max()
-        drawdowns = df['Capital'] / rolling_max - 1
-        return abs(drawdowns.min())
+    @property
+    def lookback(self) -> int:
+        """Bars of history the indicators need before the newest bar"""
+        return max(self.window, self.execution.lookback)
     
-    def calculate_win_rate(self) -> float:
-        """Calculate win rate of trades"""
-        if not self.trades:
-            return 0.0
-        
-        winning_trades = sum(1 for trade in self.trades if 
-                           'returns' in trade and trade['returns'] > 0)
-        return round(winning_trades / (len(self.trades) / 2) * 100, 2)
+    def initial_state(self) -> Dict:
+        """Position state carried between chunks of a run"""
+        return {'position': 0, 'entry_price': None, 'prev_close': None, 'capital': self.capital}
     
-    def calculate_profit_factor(self) -> float:
-        """Calculate profit factor"""
-        profits = sum(trade['returns'] for trade in self.trades if 
-                     'returns' in trade and trade['returns'] > 0)
-        losses = sum(abs(trade['returns']) for trade in self.trades if 
-                    'returns' in trade and trade['returns'] < 0)
+    def _simulate(self, df: pd.DataFrame, state: Dict,
+                  metrics: MetricsAccumulator) -> Tuple[np.ndarray, np.ndarray]:
+        """Apply signals through the simulation kernel, returning the Capital and Strategy_Returns columns"""
+        close = df['close_price'].to_numpy(dtype=float)
+        size = df['Size'].to_numpy(dtype=float)
+        commission, slippage = self.execution.costs(close, df['volume'].to_numpy(dtype=float),
+                                                    self.initial_capital, size)
+        result = simulate(
+            close,
+            df['Position'].to_numpy(dtype=float),
+            MODE_FLIP,
+            state,
+            commission=commission,
+            slippage=slippage,
+            size=size
+        )
+        state.update(result.state)
+        self.capital = result.state['capital']
+        metrics.update(df['timestamp'], result)
+        
+        timestamps = df['timestamp']
+        for i, price, returns, is_exit, side in zip(result.event_index, result.event_price,
+                                                     result.event_returns, result.event_is_exit,
+                                                     result.event_side):
+            if is_exit:
+                self.trades.append({
+                    'exit_date': timestamps.iloc[i],
+                    'exit_price': price,
+                    'returns': returns,
+                    'type': 'sell' if side > 0 else 'buy'
+                })
+            else:
+                self.trades.append({
+                    'entry_date': timestamps.iloc[i],
+                    'entry_price': price,
+                    'type': 'buy' if side > 0 else 'sell'
+                })
         
-        return round(profits / losses if losses != 0 else float('inf'), 2)
+        return result.capital, result.strategy_returns
     
-    def plot_results(self, df: pd.DataFrame) -> None:
-        """Plot backtest results including price, Bollinger Bands, and capital"""
-        plt.figure(figsize=(15, 10))
-        
-        # Plot price and Bollinger Bands
-        plt.subplot(2, 1, 1)
-        plt.plot(df['timestamp'], df['close_price'], label='Price')
-        plt.plot(df['timestamp'], df['Upper_Band'], 'r--', label='Upper Band')
-        plt.plot(df['timestamp'], df['Lower_Band'], 'g--', label='Lower Band')
-        plt.plot(df['timestamp'], df['SMA'], 'y-', label='SMA')
-        plt.fill_between(df['timestamp'], df['Upper_Band'], df['Lower_Band'], alpha=0.1)
-        plt.title(f'Bollinger Bands Strategy - {self.symbol}')
-        plt.legend()
-        
-        # Plot capital
-        plt.subplot(2, 1, 2)
-        plt.plot(df['timestamp'], df['Capital'], label='Portfolio Value')
-        plt.title('Portfolio Value Over Time')
-        plt.legend()
-        
-        plt.tight_layout()
-        plt.show()
+    @property
+    def chart_title(self) -> str:
+        return f'Bollinger Bands Strategy - {self.symbol}'
+
+    @property
+    def chart_indicators(self) -> List[Tuple[str, str, str]]:
+        """(label, column, line style) of the indicator lines drawn over the price"""
+        return [('Upper Band', 'Upper_Band', 'r--'), ('Lower Band', 'Lower_Band', 'g--'), ('SMA', 'SMA', 'y-')]
+
+    def plot_results(self, df: pd.DataFrame, path: Optional[str] = None) -> Optional[str]:
+        """Render price, indicators, trades and capital to an image file (PNG, or SVG by extension)"""
+        # Headless runs (HEADLESS=1, e.g. the API server) never load matplotlib
+        if os.getenv('HEADLESS') == '1':
+            return None
+        from chart_renderer import save_backtest_chart
+        return save_backtest_chart(self, df, path or f"{self.symbol}_bollinger.png")
 
 def main():
     # Database connection parameters
@@ -230,7 +234,9 @@ def main():
             print(f"{metric}: {value}")
         
         # Plot results
-        backtest.plot_results(df)
+        chart = backtest.plot_results(df)
+        if chart:
+            print(f"\nChart saved to {chart}")
         
     except Exception as e:
         print(f"Error during backtest: {e}")
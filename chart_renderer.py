@@ -0,0 +1,198 @@
+import io
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CHART_CACHE_DIR = os.getenv('CHART_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.chart_cache'))
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def _epoch_ns(times) -> np.ndarray:
+    return np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+
+
+def decimate_minmax(times, values, buckets: int) -> np.ndarray:
+    """
+    Indices of the points worth drawing when a series is squeezed into `buckets` pixels
+
+    Keeps the first, last, lowest and highest point of each equal-width time
+    bucket, so the drawn line has the same extremes and shape as the full
+    series. NaN points are dropped.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) <= 4 * buckets:
+        return valid
+    t = _epoch_ns(times)[valid]
+    v = values[valid]
+    span = float(t[-1] - t[0]) + 1
+    bucket = ((t - t[0]) / span * buckets).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, len(v)])
+    ends = starts + counts - 1
+    group = np.repeat(np.arange(len(starts)), counts)
+    extremes = [starts, ends]
+    for reduce in (np.minimum, np.maximum):
+        hits = np.flatnonzero(v == np.repeat(reduce.reduceat(v, starts), counts))
+        # First occurrence of the extreme within each bucket
+        extremes.append(hits[np.r_[True, group[hits][1:] != group[hits][:-1]]])
+    return valid[np.unique(np.concatenate(extremes))]
+
+
+def render_chart(title: str,
+                 price_times,
+                 price_series: Sequence[Tuple[str, Sequence[float], str]],
+                 equity_times,
+                 capital,
+                 trades: Optional[np.ndarray] = None,
+                 fmt: str = 'png',
+                 width: int = 1200,
+                 height: int = 800,
+                 dpi: int = 100) -> bytes:
+    """
+    Render a backtest chart (price panel with indicators and trades, capital panel) to PNG or SVG bytes
+
+    Uses a bare Figure on the Agg canvas, so no GUI backend or pyplot state is
+    involved and it is safe in worker processes and threads.
+
+    Args:
+        title: Price panel title
+        price_times: Timestamps of the price series
+        price_series: (label, values, matplotlib format string) per price-panel line
+        equity_times: Timestamps of the capital series
+        capital: Portfolio value per bar
+        trades: Optional backtest_store.TRADE_DTYPE rows drawn as buy/sell markers
+        fmt: 'png' or 'svg'
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format: {fmt}")
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    price_ax, equity_ax = fig.subplots(2, 1, sharex=True)
+    buckets = width  # one bucket per horizontal pixel
+
+    price_times = np.asarray(price_times, dtype='datetime64[ns]')
+    for label, values, style in price_series:
+        values = np.asarray(values, dtype=float)
+        keep = decimate_minmax(price_times, values, buckets)
+        price_ax.plot(price_times[keep], values[keep], style, label=label, linewidth=1)
+    if trades is not None and len(trades):
+        times = trades['time'].astype('datetime64[ns]')
+        buys = trades['side'] > 0
+        price_ax.scatter(times[buys], trades['price'][buys], marker='^', color='g', label='Buy', zorder=3)
+        price_ax.scatter(times[~buys], trades['price'][~buys], marker='v', color='r', label='Sell', zorder=3)
+    price_ax.set_title(title)
+    price_ax.legend(loc='upper left')
+
+    equity_times = np.asarray(equity_times, dtype='datetime64[ns]')
+    capital = np.asarray(capital, dtype=float)
+    keep = decimate_minmax(equity_times, capital, buckets)
+    equity_ax.plot(equity_times[keep], capital[keep], label='Portfolio Value', linewidth=1)
+    equity_ax.set_title('Portfolio Value Over Time')
+    equity_ax.legend(loc='upper left')
+
+    fig.tight_layout()
+    out = io.BytesIO()
+    fig.savefig(out, format=fmt)
+    return out.getvalue()
+
+
+def _render_to_file(path: str, kwargs: Dict) -> str:
+    body = render_chart(**kwargs)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(body)
+    os.replace(tmp, path)  # Readers never see a partial file
+    return path
+
+
+class ChartRenderer:
+    def __init__(self, cache_dir: str = CHART_CACHE_DIR, max_workers: int = 2):
+        """
+        Render charts in a process pool and keep the results as files keyed by backtest run
+
+        Requests for a chart that is already being rendered wait for that
+        render instead of starting another one.
+
+        Args:
+            cache_dir: Directory for rendered charts
+            max_workers: Rendering processes, started on first use
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+    def path_for(self, key: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{fmt}")
+
+    def get(self, key: str, fmt: str, build_inputs: Callable[[], Dict], timeout: float = 60.0) -> bytes:
+        """
+        Return the cached chart for key, rendering it from build_inputs() (render_chart kwargs) on a miss
+        """
+        path = self.path_for(key, fmt)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            future = self._inflight.get(path)
+            owner = future is None
+            if owner:
+                future = self._inflight[path] = Future()
+        if owner:
+            try:
+                kwargs = {**build_inputs(), 'fmt': fmt}
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._lock:
+                    if self._pool is None:
+                        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                    pool = self._pool
+                future.set_result(pool.submit(_render_to_file, path, kwargs).result(timeout))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(path, None)
+        future.result(timeout)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def backtest_chart_inputs(backtest, df, trades: Optional[np.ndarray] = None,
+                          equity_times=None, capital=None) -> Dict:
+    """
+    render_chart arguments for a backtest: the close plus the strategy's
+    chart_indicators lines, its trades and its capital (taken from df unless given)
+    """
+    series = [('Price', df['close_price'].to_numpy(), '-')] + [
+        (label, df[column].to_numpy(), style) for label, column, style in backtest.chart_indicators
+    ]
+    return {
+        'title': backtest.chart_title,
+        'price_times': df['timestamp'].to_numpy(),
+        'price_series': series,
+        'equity_times': df['timestamp'].to_numpy() if equity_times is None else equity_times,
+        'capital': df['Capital'].to_numpy() if capital is None else capital,
+        'trades': trades,
+    }
+
+
+def save_backtest_chart(backtest, df, path: str, width: int = 1500, height: int = 1000) -> str:
+    """Render a finished backtest to path, PNG or SVG by extension"""
+    from backtest_store import trades_to_array
+
+    fmt = os.path.splitext(path)[1].lstrip('.').lower() or 'png'
+    kwargs = backtest_chart_inputs(backtest, df, trades_to_array(backtest.trades))
+    with open(path, 'wb') as f:
+        f.write(render_chart(**kwargs, fmt=fmt, width=width, height=height))
+    return path
@@ -0,0 +1,72 @@
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+import psycopg2
+
+from backtest_metrics import MetricsAccumulator
+
+
+def iter_bars(db_params: Dict[str, str],
+              symbol: str,
+              start_date: str,
+              end_date: str,
+              chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Stream bars from trading_info in timestamp order, chunk_size rows at a time
+
+    Uses a server-side (named) cursor so only one chunk is held client-side.
+    """
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn.cursor(name='backtest_bars') as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute("""
+                SELECT timestamp, close_price, volume
+                FROM trading_info
+                WHERE symbol = %s
+                AND timestamp BETWEEN %s AND %s
+                ORDER BY timestamp ASC
+            """, (symbol, start_date, end_date))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=['timestamp', 'close_price', 'volume'])
+    finally:
+        conn.close()
+
+
+def simulate_chunk(backtest, chunk: pd.DataFrame, tail: Optional[pd.DataFrame], state: Dict,
+                   metrics: MetricsAccumulator, lookback: int) -> pd.DataFrame:
+    """
+    Compute signals for one chunk of new bars and run them through the backtest's _simulate
+
+    `tail` holds the raw bars preceding the chunk (None for the first one) so
+    rolling windows and diffs see the same history as an in-memory run.
+    Returns the tail to pass with the next chunk.
+    """
+    combined = chunk if tail is None else pd.concat([tail, chunk], ignore_index=True)
+    combined = backtest.generate_signals(backtest.calculate_indicators(combined))
+    bars = combined.iloc[len(combined) - len(chunk):].reset_index(drop=True)
+    backtest._simulate(bars, state, metrics)
+    return combined[['timestamp', 'close_price', 'volume']].iloc[-lookback:]
+
+
+def run_chunked(backtest, chunk_size: int, lookback: Optional[int] = None) -> MetricsAccumulator:
+    """
+    Drive a backtest's indicators and bar simulation over streamed chunks
+
+    The last `lookback` raw bars of each chunk (default: the backtest's own
+    lookback) are prepended to the next one, and the backtest's _simulate
+    carries position and capital state across chunks.
+    """
+    lookback = lookback or backtest.lookback
+    metrics = MetricsAccumulator(backtest.initial_capital)
+    state = backtest.initial_state()
+    tail = None
+    for chunk in iter_bars(backtest.db_params, backtest.symbol, backtest.start_date,
+                           backtest.end_date, chunk_size):
+        tail = simulate_chunk(backtest, chunk, tail, state, metrics, lookback)
+    if metrics.n_bars == 0:
+        raise ValueError("No data available for backtest")
+    return metrics
@@ -0,0 +1,302 @@
+import argparse
+from datetime import time as dtime
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr,
+    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday
+)
+from psycopg2.extras import execute_values
+
+EXCHANGE_TZ = 'America/New_York'
+SESSION_OPEN = dtime(9, 30)
+SESSION_CLOSE = dtime(16, 0)
+EARLY_CLOSE = dtime(13, 0)
+MINUTE_NS = 60 * 10**9
+
+GAPS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS bar_gaps (
+        id SERIAL PRIMARY KEY,
+        symbol VARCHAR NOT NULL,
+        gap_start TIMESTAMP NOT NULL,
+        gap_end TIMESTAMP NOT NULL,
+        minutes INTEGER NOT NULL,
+        status VARCHAR(8) NOT NULL DEFAULT 'open',
+        detected_at TIMESTAMP NOT NULL DEFAULT now(),
+        checked_at TIMESTAMP,
+        UNIQUE (symbol, gap_start)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_bar_gaps_open ON bar_gaps (symbol, gap_start) WHERE status = 'open'",
+]
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Full-day NYSE closures"""
+    rules = [
+        # A Saturday New Year's Day is not observed on the Friday before
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+def trading_sessions(start, end) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Regular session bounds between two dates as UTC epoch ns arrays (open, close)
+
+    Closes at 13:00 ET on the day after Thanksgiving and on July 3 and
+    December 24 when those are trading days.
+    """
+    days = pd.bdate_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize())
+    days = days[~days.isin(NYSEHolidayCalendar().holidays(days.min(), days.max()))] if len(days) else days
+    thanksgiving = USThanksgivingDay.dates(days.min(), days.max()) if len(days) else days
+    early = (((days.month == 7) & (days.day == 3)) | ((days.month == 12) & (days.day == 24)) |
+             days.isin(thanksgiving + pd.Timedelta(days=1)))
+
+    def minutes(clock: dtime) -> int:
+        return clock.hour * 60 + clock.minute
+
+    open_at = pd.to_timedelta(np.full(len(days), minutes(SESSION_OPEN)), unit='min')
+    close_at = pd.to_timedelta(np.where(early, minutes(EARLY_CLOSE), minutes(SESSION_CLOSE)), unit='min')
+    opens = (days + open_at).tz_localize(EXCHANGE_TZ).tz_convert('UTC')
+    closes = (days + close_at).tz_localize(EXCHANGE_TZ).tz_convert('UTC')
+    return opens.as_unit('ns').asi8, closes.as_unit('ns').asi8
+
+
+def expected_minutes(opens: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """Start times (epoch ns) of every 1-minute bar in the given sessions"""
+    counts = (closes - opens) // MINUTE_NS
+    if not counts.sum():
+        return np.empty(0, dtype=np.int64)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(opens, counts) + offsets * MINUTE_NS
+
+
+def in_session(times: np.ndarray, opens: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """Whether each bar start time (epoch ns) falls inside a regular session"""
+    i = np.searchsorted(opens, times, side='right') - 1
+    valid = i >= 0
+    return valid & (times < np.where(valid, closes[np.maximum(i, 0)], 0))
+
+
+class QualityReport(NamedTuple):
+    symbol: str
+    bars: int
+    expected: int
+    duplicates: np.ndarray   # indices of bars repeating an earlier timestamp
+    off_session: np.ndarray  # indices of bars outside the regular session
+    invalid: np.ndarray      # indices of bars with impossible OHLCV values
+    outliers: np.ndarray     # indices of bars whose return is an outlier
+    gaps: np.ndarray         # (start_ns, end_ns) rows of missing session minutes, end exclusive
+
+    def summary(self) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "bars": self.bars,
+            "expected": self.expected,
+            "duplicates": len(self.duplicates),
+            "off_session": len(self.off_session),
+            "invalid": len(self.invalid),
+            "outliers": len(self.outliers),
+            "gaps": len(self.gaps),
+            "missing_minutes": int((self.gaps[:, 1] - self.gaps[:, 0]).sum() // MINUTE_NS),
+        }
+
+
+def validate_bars(symbol: str, times, open_price, high_price, low_price, close_price, volume,
+                  start=None, end=None, outlier_threshold: float = 10.0) -> QualityReport:
+    """
+    Check 1-minute bars against the trading calendar and for bad values
+
+    Args:
+        symbol: Symbol the bars belong to
+        times: Bar start times (UTC), in any order
+        open_price, high_price, low_price, close_price, volume: Bar values
+        start, end: Date range to check for gaps (default: the range of the bars)
+        outlier_threshold: Robust z-score (median/MAD) of a bar's log return,
+            within a session, above which the bar is flagged as an outlier
+    """
+    times = np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+    o, h, l, c, v = (np.asarray(x, dtype=np.float64) for x in (open_price, high_price, low_price, close_price, volume))
+    if start is None or end is None:
+        if not len(times):
+            empty = np.empty(0, dtype=np.int64)
+            return QualityReport(symbol, 0, 0, empty, empty, empty, empty, np.empty((0, 2), dtype=np.int64))
+        start = pd.Timestamp(times.min()) if start is None else start
+        end = pd.Timestamp(times.max()) if end is None else end
+    opens, closes = trading_sessions(start, end)
+
+    order = np.argsort(times, kind='stable')
+    sorted_times = times[order]
+    repeat = np.r_[False, sorted_times[1:] == sorted_times[:-1]]
+    duplicates = np.sort(order[repeat])
+
+    session = in_session(times, opens, closes)
+    off_session = np.flatnonzero(~session)
+
+    with np.errstate(invalid='ignore'):
+        bad = (~np.isfinite(o) | ~np.isfinite(h) | ~np.isfinite(l) | ~np.isfinite(c) | ~np.isfinite(v) |
+               (np.minimum.reduce([o, h, l, c]) <= 0) | (v < 0) |
+               (h < np.maximum.reduce([o, l, c])) | (l > np.minimum.reduce([o, h, c])))
+    invalid = np.flatnonzero(bad)
+
+    # Returns between consecutive clean session bars of the same session
+    clean = order[~repeat & session[order] & ~bad[order]]
+    outliers = np.empty(0, dtype=np.int64)
+    if len(clean) > 2:
+        session_id = np.searchsorted(opens, times[clean], side='right')
+        same = session_id[1:] == session_id[:-1]
+        returns = np.diff(np.log(c[clean]))[same]
+        if len(returns):
+            median = np.median(returns)
+            mad = np.median(np.abs(returns - median)) * 1.4826
+            if mad > 0:
+                flagged = np.abs(returns - median) / mad > outlier_threshold
+                outliers = np.sort(clean[1:][same][flagged])
+
+    expected = expected_minutes(opens, closes)
+    missing = expected[~np.isin(expected, times)]
+    if len(missing):
+        breaks = np.flatnonzero(np.diff(missing) != MINUTE_NS)
+        gap_starts = missing[np.r_[0, breaks + 1]]
+        gap_ends = missing[np.r_[breaks, len(missing) - 1]] + MINUTE_NS
+        gaps = np.column_stack((gap_starts, gap_ends))
+    else:
+        gaps = np.empty((0, 2), dtype=np.int64)
+
+    return QualityReport(symbol, len(times), len(expected), duplicates, off_session, invalid, outliers, gaps)
+
+
+def validate_records(symbol: str, records: List[Dict], start=None, end=None) -> QualityReport:
+    """validate_bars over Alpaca bar records ({'t', 'o', 'h', 'l', 'c', 'v', ...})"""
+    return validate_bars(
+        symbol,
+        pd.to_datetime([r['t'] for r in records], utc=True).tz_localize(None),
+        [r['o'] for r in records], [r['h'] for r in records], [r['l'] for r in records],
+        [r['c'] for r in records], [r['v'] for r in records], start, end
+    )
+
+
+def clean_records(symbol: str, records: List[Dict], existing=None) -> Tuple[List[Dict], QualityReport]:
+    """
+    Drop duplicate, off-session and invalid Alpaca bar records before they are inserted
+
+    Return outliers are kept (they may be real moves) but reported.
+
+    Args:
+        symbol: Symbol the records belong to
+        records: Alpaca bar records
+        existing: Bar start times already stored for the symbol, also treated as duplicates
+    """
+    report = validate_records(symbol, records)
+    drop = np.zeros(len(records), dtype=bool)
+    drop[report.duplicates] = True
+    drop[report.off_session] = True
+    drop[report.invalid] = True
+    if existing is not None and len(records):
+        times = pd.to_datetime([r['t'] for r in records], utc=True).tz_localize(None).as_unit('ns').asi8
+        drop |= np.isin(times, np.asarray(existing, dtype='datetime64[ns]').view(np.int64))
+    return [r for r, d in zip(records, drop) if not d], report
+
+
+def _to_datetime(ns: int):
+    return pd.Timestamp(int(ns)).to_pydatetime()
+
+
+def store_gaps(conn, report: QualityReport) -> int:
+    """
+    Record a report's gaps in bar_gaps as 'open'; returns the number of new gaps
+
+    Gaps already recorded (same symbol and start) keep their status, so
+    intervals the data source had no bars for are not fetched again.
+    """
+    with conn.cursor() as cursor:
+        for statement in GAPS_DDL:
+            cursor.execute(statement)
+        if not len(report.gaps):
+            conn.commit()
+            return 0
+        rows = [
+            (report.symbol, _to_datetime(s), _to_datetime(e), int((e - s) // MINUTE_NS))
+            for s, e in report.gaps
+        ]
+        execute_values(cursor, """
+            INSERT INTO bar_gaps (symbol, gap_start, gap_end, minutes) VALUES %s
+            ON CONFLICT (symbol, gap_start) DO NOTHING
+        """, rows, page_size=1000)
+        added = cursor.rowcount
+    conn.commit()
+    return added
+
+
+def open_gaps(conn, symbol: str, start=None, end=None) -> List[Tuple]:
+    """(id, gap_start, gap_end) of the open gaps of a symbol, oldest first"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT id, gap_start, gap_end FROM bar_gaps
+            WHERE symbol = %s AND status = 'open'
+            AND gap_start >= COALESCE(%s, '-infinity'::timestamp)
+            AND gap_end <= COALESCE(%s, 'infinity'::timestamp)
+            ORDER BY gap_start
+        """, (symbol, start, end))
+        return cursor.fetchall()
+
+
+def mark_gap(conn, gap_id: int, status: str) -> None:
+    """Set a gap's status: 'filled' when bars were found for it, 'empty' when the source had none"""
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE bar_gaps SET status = %s, checked_at = now() WHERE id = %s", (status, gap_id))
+    conn.commit()
+
+
+def check_symbol(db_params: Dict[str, str], symbol: str, start, end, store: bool = True) -> QualityReport:
+    """Validate the stored bars of a symbol over a date range, recording gaps in bar_gaps"""
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT timestamp, open_price, high_price, low_price, close_price, volume
+                FROM trading_info
+                WHERE symbol = %s AND timestamp >= %s AND timestamp < %s::date + 1
+            """, (symbol, start, end))
+            rows = cursor.fetchall()
+        columns = list(zip(*rows)) if rows else [[]] * 6
+        report = validate_bars(symbol, np.array(columns[0], dtype='datetime64[ns]'), *columns[1:],
+                               start=start, end=end)
+        if store:
+            store_gaps(conn, report)
+        return report
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check stored 1-minute bars for gaps, duplicates and bad prices")
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--start', required=True, help="First date to check (YYYY-MM-DD)")
+    parser.add_argument('--end', required=True, help="Last date to check (YYYY-MM-DD)")
+    parser.add_argument('--no-store', action='store_true', help="Don't record gaps in bar_gaps")
+    args = parser.parse_args()
+
+    db_params = {
+        "host": "localhost",
+        "port": 5432,
+        "database": "alpaca_data",
+        "user": "postgres",
+        "password": "secretpass"
+    }
+    for symbol in args.symbols:
+        report = check_symbol(db_params, symbol, args.start, args.end, store=not args.no_store)
+        print(", ".join(f"{k}: {v}" for k, v in report.summary().items()))
@@ -0,0 +1,183 @@
+import itertools
+import json
+import queue
+import select
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import psycopg2
+
+# Event types pushed to the dashboard
+TOPICS = ('log', 'positions', 'job', 'bar', 'symbols')
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class EventBroker:
+    def __init__(self, max_queue: int = 1000, history: int = 1000, keepalive: float = 15.0):
+        """
+        In-process publish/subscribe hub behind the /api/events Server-Sent Events stream
+
+        Args:
+            max_queue: Events buffered per subscriber before it is dropped as too slow
+            history: Recent events kept so reconnecting clients can resume via Last-Event-ID
+            keepalive: Seconds of silence before a keepalive comment is sent
+        """
+        self.max_queue = max_queue
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers: Dict[queue.Queue, Optional[frozenset]] = {}
+        self._hooks: Dict[str, List[Callable]] = {}
+        self._relay = None  # (db_params, channel, topics) once enable_relay is called
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> queue.Queue:
+        """Register a subscriber queue receiving events for the given topics (all if None)"""
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers[q] = frozenset(topics) if topics else None
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(q, None)
+
+    def on(self, topic: str, callback: Callable) -> None:
+        """Call callback(data) in this process for every event delivered on topic"""
+        self._hooks.setdefault(topic, []).append(callback)
+
+    def enable_relay(self, db_params: Dict[str, str], topics: Iterable[str],
+                     channel: str = 'dashboard_events') -> threading.Thread:
+        """
+        Deliver events for `topics` through PostgreSQL NOTIFY instead of in-process
+
+        With several server processes, each one then hands these events to its
+        own subscribers (and hooks), whichever process published them.
+        """
+        self._relay = (db_params, channel, frozenset(topics))
+        return self.listen_postgres(db_params, [], callbacks={channel: self._deliver_relayed})
+
+    def _deliver_relayed(self, payload: str) -> None:
+        message = json.loads(payload)
+        self._deliver(message['topic'], message['data'])
+
+    def publish(self, topic: str, data) -> Optional[int]:
+        """Send an event to every subscriber of its topic and return its id (None when relayed)"""
+        if self._relay is not None and topic in self._relay[2]:
+            db_params, channel, _ = self._relay
+            payload = json.dumps({"topic": topic, "data": data}, default=_json_default)
+            # NOTIFY payloads are limited to 8000 bytes; larger events stay local
+            if len(payload) < 8000:
+                conn = psycopg2.connect(**db_params)
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+                    conn.commit()
+                    return None
+                finally:
+                    conn.close()
+        return self._deliver(topic, data)
+
+    def _deliver(self, topic: str, data) -> int:
+        for callback in self._hooks.get(topic, ()):
+            callback(data)
+        with self._lock:
+            event_id = next(self._ids)
+            event = (event_id, topic, json.dumps(data, default=_json_default))
+            self._history.append(event)
+            subscribers = list(self._subscribers.items())
+
+        for q, topics in subscribers:
+            if topics is not None and topic not in topics:
+                continue
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # A client that can't keep up is cut off; it refetches on reconnect
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(None)
+        return event_id
+
+    def listen_postgres(self, db_params: Dict[str, str], channels: Iterable[str],
+                        callbacks: Optional[Dict[str, Callable[[str], None]]] = None) -> threading.Thread:
+        """
+        Republish PostgreSQL NOTIFY payloads (JSON) on the topic named after their channel
+
+        Lets other processes, such as the trade stream writing live bars, reach
+        dashboard clients without a direct connection to this server. Channels
+        in callbacks are handed to callback(payload) instead of being published.
+        """
+        callbacks = callbacks or {}
+        channels = list(dict.fromkeys([*channels, *callbacks]))
+
+        def run():
+            while True:
+                try:
+                    conn = psycopg2.connect(**db_params)
+                    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                    with conn.cursor() as cursor:
+                        for channel in channels:
+                            cursor.execute(f'LISTEN "{channel}"')
+                    while True:
+                        if select.select([conn], [], [], self.keepalive) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            if notify.channel in callbacks:
+                                try:
+                                    callbacks[notify.channel](notify.payload)
+                                except Exception as e:
+                                    print(f"Error handling {notify.channel} notification: {e}")
+                                continue
+                            try:
+                                self.publish(notify.channel, json.loads(notify.payload))
+                            except ValueError:
+                                self.publish(notify.channel, notify.payload)
+                except psycopg2.Error as e:
+                    print(f"Event listener error: {e}")
+                    time.sleep(5)
+
+        thread = threading.Thread(target=run, name='event-listener', daemon=True)
+        thread.start()
+        return thread
+
+    def stream(self, topics: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None) -> Iterator[str]:
+        """Yield Server-Sent Events text for a single client connection"""
+        topics = frozenset(topics) if topics else None
+        q = self.subscribe(topics)
+        replayed_up_to = 0
+        try:
+            if last_event_id is not None:
+                with self._lock:
+                    missed = [e for e in self._history if e[0] > last_event_id]
+                for event_id, topic, data in missed:
+                    replayed_up_to = event_id
+                    if topics is None or topic in topics:
+                        yield f"id: {event_id}\nevent: {topic}\ndata: {data}\n\n"
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = q.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                event_id, topic, data = event
+                if event_id <= replayed_up_to:
+                    continue
+                yield f"id: {event_id}\nevent: {topic}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(q)
@@ -0,0 +1,147 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+SIZING_MODES = ('fraction', 'volatility')
+# Bars per year of each bar timeframe over regular trading hours (252 sessions of 390 minutes).
+# Volatility sizing annualizes with a fixed rate so a bar gets the same size whether it is
+# sized in a full run, a chunk of one or live.
+BARS_PER_YEAR = {
+    '1Min': 252 * 390,
+    '5Min': 252 * 78,
+    '15Min': 252 * 26,
+    '1Hour': 252 * 6.5,
+    '1Day': 252,
+}
+# Keyword arguments an `execution` dict may set
+EXECUTION_PARAMETERS = ('commission', 'commission_per_share', 'slippage', 'spread', 'impact', 'sizing',
+                        'fraction', 'target_volatility', 'volatility_window', 'max_leverage',
+                        'periods_per_year')
+
+
+class ExecutionModel:
+    def __init__(self,
+                 commission: float = 0.0,
+                 commission_per_share: float = 0.0,
+                 slippage: float = 0.0,
+                 spread: float = 0.0,
+                 impact: float = 0.0,
+                 sizing: str = 'fraction',
+                 fraction: float = 1.0,
+                 target_volatility: float = 0.2,
+                 volatility_window: int = 20,
+                 max_leverage: float = 1.0,
+                 periods_per_year: float = BARS_PER_YEAR['1Min']):
+        """
+        Fill costs and position sizing for the simulation kernels, as per-bar arrays
+
+        Costs:
+            fee per fill (fraction of traded notional) = commission + commission_per_share / price
+            slippage per fill (fraction of price) = slippage + spread / 2
+                + impact * sqrt(order shares / bar volume)
+        The order size used for the volume impact is the one the run's starting
+        capital would buy, so costs stay a vectorized function of the bars.
+
+        Sizing (fraction of capital committed when a position opens, held until it closes):
+            'fraction': always `fraction`
+            'volatility': target_volatility / annualized volatility of the last
+                volatility_window bar returns, capped at max_leverage (0 until the window fills)
+
+        Args:
+            commission: Fraction of traded notional charged per fill
+            commission_per_share: Currency charged per share traded
+            slippage: Fixed fraction of price lost per fill
+            spread: Quoted bid/ask spread as a fraction of price; half is paid per fill
+            impact: Coefficient of the square-root volume participation impact
+            sizing: One of SIZING_MODES
+            fraction: Position size for 'fraction' sizing
+            target_volatility: Annualized volatility targeted by 'volatility' sizing
+            volatility_window: Bars in the realized volatility estimate
+            max_leverage: Largest position size 'volatility' sizing may take
+            periods_per_year: Bars per year for annualizing (default: trading_info's 1-minute bars)
+        """
+        if sizing not in SIZING_MODES:
+            raise ValueError(f"sizing must be one of {', '.join(SIZING_MODES)}")
+        if min(commission, commission_per_share, slippage, spread, impact) < 0:
+            raise ValueError("Costs must not be negative")
+        if (fraction <= 0 or max_leverage <= 0 or target_volatility <= 0 or volatility_window < 2
+                or periods_per_year <= 0):
+            raise ValueError("Invalid sizing parameters")
+        self.commission = commission
+        self.commission_per_share = commission_per_share
+        self.slippage = slippage
+        self.spread = spread
+        self.impact = impact
+        self.sizing = sizing
+        self.fraction = fraction
+        self.target_volatility = target_volatility
+        self.volatility_window = volatility_window
+        self.max_leverage = max_leverage
+        self.periods_per_year = periods_per_year
+
+    @property
+    def lookback(self) -> int:
+        """Bars of history position sizing needs before the newest bar"""
+        return self.volatility_window + 1 if self.sizing == 'volatility' else 0
+
+    def position_size(self, close) -> np.ndarray:
+        """Position size per bar, used by positions opened on that bar"""
+        close = np.asarray(close, dtype=np.float64)
+        if self.sizing == 'fraction':
+            return np.full(len(close), self.fraction)
+
+        returns = np.diff(np.log(close), prepend=np.nan)
+        w = self.volatility_window
+        # Rolling sample std from windowed sums of the returns
+        valid = ~np.isnan(returns)
+        filled = np.where(valid, returns, 0.0)
+        s1 = np.cumsum(np.r_[0.0, filled])
+        s2 = np.cumsum(np.r_[0.0, filled * filled])
+        count = np.cumsum(np.r_[0, valid])
+        n = count[w:] - count[:-w]
+        mean = (s1[w:] - s1[:-w]) / w
+        var = np.maximum((s2[w:] - s2[:-w]) / w - mean * mean, 0.0) * w / (w - 1)
+        vol = np.full(len(close), np.nan)
+        vol[w - 1:] = np.where(n == w, np.sqrt(var * self.periods_per_year), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            size = np.minimum(self.target_volatility / vol, self.max_leverage)
+        return np.where(np.isfinite(size), size, 0.0)
+
+    def costs(self, close, volume, capital: float, size) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-bar fee (fraction of notional) and slippage (fraction of price) for a fill on that bar
+
+        Args:
+            close: Fill prices
+            volume: Bar volumes (shares)
+            capital: Capital the order size is estimated from
+            size: Position size per bar, from position_size
+        """
+        close = np.asarray(close, dtype=np.float64)
+        fee = self.commission + self.commission_per_share / close
+        slip = np.full(len(close), self.slippage + self.spread / 2)
+        if self.impact > 0:
+            shares = capital * np.asarray(size, dtype=np.float64) / close
+            with np.errstate(divide='ignore', invalid='ignore'):
+                participation = np.minimum(shares / np.asarray(volume, dtype=np.float64), 1.0)
+            slip += self.impact * np.sqrt(np.where(np.isnan(participation), 1.0, participation))
+        return fee, slip
+
+    @classmethod
+    def from_params(cls, commission: float = 0.0, slippage: float = 0.0,
+                    execution: Optional[Dict] = None) -> 'ExecutionModel':
+        """
+        Build from a backtest's commission/slippage arguments plus an optional `execution` dict
+
+        Raises ValueError for anything but a dict of EXECUTION_PARAMETERS with valid values.
+        """
+        execution = execution or {}
+        if not isinstance(execution, dict):
+            raise ValueError("execution must be an object")
+        unknown = sorted(set(execution) - set(EXECUTION_PARAMETERS))
+        if unknown:
+            raise ValueError(f"Unknown execution parameters: {', '.join(map(str, unknown))}")
+        try:
+            return cls(**{'commission': commission, 'slippage': slippage, **execution})
+        except TypeError:
+            raise ValueError("Invalid execution parameters")
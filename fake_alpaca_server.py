@@ -0,0 +1,76 @@
+import json
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Run locally and set APCA_DATA_URL=http://localhost:5005/v2 to stand in for Alpaca
+PORT = 5005
+
+
+class FakeAlpacaState:
+    def __init__(self, seed: int = 0):
+        """Random-walk prices per symbol plus request counters for inspection"""
+        self.random = random.Random(seed)
+        self.prices = {}
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    def next_price(self, symbol: str) -> float:
+        with self.lock:
+            price = self.prices.get(symbol, 100.0 + self.random.random() * 100)
+            price = round(max(price * (1 + self.random.gauss(0, 0.001)), 0.01), 2)
+            self.prices[symbol] = price
+            return price
+
+
+class FakeAlpacaHandler(BaseHTTPRequestHandler):
+    state = FakeAlpacaState()
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not self.headers.get('APCA-API-KEY-ID'):
+            self._send_json(401, {"message": "unauthorized"})
+            return
+        with self.state.lock:
+            self.state.request_count += 1
+
+        if url.path == '/v2/stocks/snapshots':
+            symbols = parse_qs(url.query).get('symbols', [''])[0].split(',')
+            now = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+            snapshots = {}
+            for symbol in filter(None, symbols):
+                price = self.state.next_price(symbol)
+                snapshots[symbol] = {
+                    "latestTrade": {"t": now, "p": price, "s": 100},
+                    "latestQuote": {"t": now, "bp": round(price - 0.01, 2), "ap": round(price + 0.01, 2)},
+                }
+            self._send_json(200, snapshots)
+        else:
+            self._send_json(404, {"message": "not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake server in a background thread; port 0 picks a free port"""
+    server = ThreadingHTTPServer(('localhost', port), FakeAlpacaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    print(f"Fake Alpaca API listening on http://localhost:{port}/v2")
+    ThreadingHTTPServer(('localhost', port), FakeAlpacaHandler).serve_forever()
@@ -1,22 +1,26 @@
-import alpaca_trade_api as tradeapi
-import os
-# Alpaca API credentials
-API_KEY = os.getenv('APCA_API_KEY_ID')
-SECRET_KEY = os.getenv('APCA_API_SECRET_KEY')
-BASE_URL = "https://paper-api.alpaca.markets"  # Use this for paper trading; use https://api.alpaca.markets for live trading
+import sys
+from latest_price_service import LatestPriceService
 
-# Initialize Alpaca API client
-api = tradeapi.REST(API_KEY, SECRET_KEY, BASE_URL)
+# Snapshots come from the market data API; orders still go to the paper trading
+# environment at https://paper-api.alpaca.markets (use https://api.alpaca.markets for live trading)
+price_service = LatestPriceService()
 
-def get_latest_price(symbol):
-    try:
-        # Get the latest trade data for the symbol
-        latest_trade = api.get_latest_trade(symbol)
+def get_latest_prices(symbols):
+    """Fetch and print the latest trade for several symbols in batched requests"""
+    quotes = price_service.get_prices(symbols)
+    for symbol in symbols:
+        quote = quotes.get(symbol.upper())
+        if quote is None:
+            print(f"Error fetching data for {symbol}")
+            continue
         print(f"Symbol: {symbol}")
-        print(f"Price: ${latest_trade.price}")
-        print(f"Timestamp: {latest_trade.timestamp}")
-    except Exception as e:
-        print(f"Error fetching data for {symbol}: {e}")
+        print(f"Price: ${quote['price']}")
+        print(f"Timestamp: {quote['timestamp']}")
+    return quotes
+
+def get_latest_price(symbol):
+    return get_latest_prices([symbol]).get(symbol.upper())
 
-# Replace 'AAPL' with the stock symbol you want to check
-get_latest_price("AAPL")
+if __name__ == "__main__":
+    # Pass symbols on the command line, defaults to AAPL
+    get_latest_prices(sys.argv[1:] or ["AAPL"])
@@ -1,4 +1,6 @@
-import alpaca_trade_api as tradeapi
+import csv
+import io
+import os
 import psycopg2
 from psycopg2 import sql
 
@@ -13,14 +15,21 @@ DB_NAME = "alpaca_data"
 DB_USER = "postgres"
 DB_PASSWORD = "secretpass"
 
-# Initialize the Alpaca API
-api = tradeapi.REST(API_KEY, SECRET_KEY, BASE_URL, api_version='v2')
+_api = None
+
+def get_api():
+    """Alpaca API client, created (and its package imported) on first use"""
+    global _api
+    if _api is None:
+        import alpaca_trade_api as tradeapi
+        _api = tradeapi.REST(API_KEY, SECRET_KEY, BASE_URL, api_version='v2')
+    return _api
 
 def get_all_stocks():
     """Fetch all tradable stocks from Alpaca API."""
     try:
         # Get all available assets
-        assets = api.list_assets()
+        assets = get_api().list_assets()
 
         # Filter for stocks that are tradable
         tradable_stocks = [
@@ -34,7 +43,7 @@ def get_all_stocks():
         return []
 
 def insert_stocks_into_db(stocks):
-    """Insert stock data into PostgreSQL table."""
+    """Bulk upsert stock data into PostgreSQL table through a COPY-loaded staging table."""
     try:
         # Connect to the database
         conn = psycopg2.connect(
@@ -56,20 +65,53 @@ def insert_stocks_into_db(stocks):
         );
         """
         cursor.execute(create_table_query)
-        conn.commit()
 
-        # Insert stock data with duplicate check
-        insert_query = """
-        INSERT INTO available_stock (symbol, name, exchange)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (symbol) DO NOTHING; -- Use symbol as a unique identifier
-        """
+        # ON CONFLICT (symbol) needs a unique index; drop duplicates left by
+        # earlier runs so it can be built
+        cursor.execute("""
+        DELETE FROM available_stock a
+        USING available_stock b
+        WHERE a.symbol = b.symbol AND a.id > b.id;
+        """)
+        cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS available_stock_symbol_key
+        ON available_stock (symbol);
+        """)
+
+        # Load the whole universe into a staging table in one COPY
+        cursor.execute("""
+        CREATE TEMP TABLE available_stock_staging (
+            symbol VARCHAR(10) NOT NULL,
+            name TEXT NOT NULL,
+            exchange VARCHAR(20) NOT NULL
+        ) ON COMMIT DROP;
+        """)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
         for stock in stocks:
-            cursor.execute(insert_query, (stock["symbol"], stock["name"], stock["exchange"]))
+            writer.writerow((stock["symbol"], stock["name"] or "", stock["exchange"]))
+        buffer.seek(0)
+        cursor.copy_expert(
+            "COPY available_stock_staging (symbol, name, exchange) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+        # Upsert, only touching rows whose details actually changed
+        cursor.execute("""
+        INSERT INTO available_stock (symbol, name, exchange)
+        SELECT DISTINCT ON (symbol) symbol, name, exchange
+        FROM available_stock_staging
+        ORDER BY symbol
+        ON CONFLICT (symbol) DO UPDATE
+        SET name = EXCLUDED.name, exchange = EXCLUDED.exchange
+        WHERE (available_stock.name, available_stock.exchange)
+            IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.exchange);
+        """)
+        changed = cursor.rowcount
 
         # Commit the changes and close the connection
         conn.commit()
-        print(f"Inserted {len(stocks)} stocks into the database.")
+        print(f"Upserted {len(stocks)} stocks into the database ({changed} new or changed).")
         cursor.close()
         conn.close()
     except Exception as e:
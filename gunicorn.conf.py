@@ -0,0 +1,74 @@
+# Production serving for app.py: preforked workers, each with a thread pool
+#
+#   gunicorn app:app
+#
+# Threads absorb the blocking SQLAlchemy/psycopg2 calls of the read endpoints,
+# and backtests in one request no longer hold up others (the compiled
+# simulation kernels release the GIL). Note each open /api/events stream
+# occupies a thread for as long as the dashboard is connected.
+import multiprocessing
+import os
+
+# PostgreSQL refuses connections beyond max_connections (100 by default). Each
+# worker holds its SQLAlchemy pool plus two LISTEN connections (bar/positions
+# and the event relay); DB_RESERVED_CONNECTIONS is left for everything else:
+# superuser slots, ingest scripts, the bar server, the daily rollup and the
+# short-lived psycopg2 connections of backtests and the screener.
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', 100))
+DB_RESERVED_CONNECTIONS = int(os.getenv('DB_RESERVED_CONNECTIONS', 20))
+LISTEN_CONNECTIONS = 2
+MIN_POOL_SIZE = 4
+db_budget = DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS
+
+bind = os.getenv('BIND', '0.0.0.0:4000')
+# By default no more workers than the connection budget gives a useful pool
+workers = int(os.getenv('WEB_CONCURRENCY', max(1, min(multiprocessing.cpu_count() * 2 + 1,
+                                                      db_budget // (MIN_POOL_SIZE + LISTEN_CONNECTIONS)))))
+worker_class = 'gthread'
+threads = int(os.getenv('THREADS', 16))
+
+# Threads beyond the pool size wait for a connection (up to the pool timeout)
+# rather than opening more; the pool never overflows
+per_worker = db_budget // workers - LISTEN_CONNECTIONS
+pool_size = int(os.getenv('DB_POOL_SIZE', min(threads, per_worker)))
+max_overflow = int(os.getenv('DB_MAX_OVERFLOW', 0))
+if pool_size < 1 or pool_size + max_overflow > per_worker:
+    raise RuntimeError(
+        f"A pool of {pool_size}+{max_overflow} does not fit the {max(per_worker, 0)} connections each of "
+        f"{workers} workers may use under DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS}; lower WEB_CONCURRENCY or DB_POOL_SIZE"
+    )
+os.environ['DB_POOL_SIZE'] = str(pool_size)
+os.environ['DB_MAX_OVERFLOW'] = str(max_overflow)
+# Backtests run inside the request
+timeout = int(os.getenv('TIMEOUT', 300))
+keepalive = 5
+# Import the app once in the master so workers share its memory and its startup cost
+preload_app = True
+
+os.environ.setdefault('PRICE_STREAM', '0')
+os.environ.setdefault('EVENT_RELAY', '1')
+os.environ.setdefault('HEADLESS', '1')
+
+
+def on_starting(server):
+    from app import app, db, ensure_schema, screener, DB_PARAMS
+    from screener import start_daily_rollup
+    with app.app_context():
+        ensure_schema()
+        # Connections must not be shared across the fork
+        db.engine.dispose()
+    # One process keeps daily_bars current for every worker's screener
+    start_daily_rollup(DB_PARAMS, screener.ttl)
+    # One data server process holds the bars every worker's backtests map read-only
+    if os.getenv('SHARED_BARS') == '1' and not os.getenv('BAR_SERVER'):
+        from shared_bars import start_bar_server
+        _, (host, port), authkey = start_bar_server(
+            DB_PARAMS, max_bytes=int(os.getenv('SHARED_BARS_MB', 1024)) * 2**20
+        )
+        os.environ['BAR_SERVER'] = f"{host}:{port}"
+        os.environ['BAR_SERVER_KEY'] = authkey.hex()
+
+
+def post_fork(server, worker):
+    from app import start_background_services
+    start_background_services()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Modules an entry point must not load at import time, and its cumulative import budget in ms
+BUDGETS = {
+    'app': (['matplotlib', 'pandas', 'numba', 'alpaca_trade_api'], 1500),
+    'bollinger_bands_backtest': (['matplotlib', 'numba'], 1500),
+    'moving_average_crossover': (['matplotlib', 'numba'], 1500),
+    'getStocks': (['alpaca_trade_api'], 500),
+    'getLatestPrice': (['pandas', 'matplotlib'], 500),
+}
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """Run `python -X importtime -c "import module"` and return (name, self_us, cumulative_us) rows"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env={**os.environ, 'HEADLESS': '1'},
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"import {module} failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def check(module: str, forbidden: List[str], budget_ms: float, top: int = 10) -> bool:
+    rows = measure(module)
+    loaded = {name.strip() for name, _, _ in rows}
+    total_ms = next(c for name, _, c in rows if name == ' ' + module) / 1000
+    leaked = [m for m in forbidden if m in loaded]
+    ok = total_ms <= budget_ms and not leaked
+
+    print(f"{'OK ' if ok else 'FAIL'} {module}: {total_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    if leaked:
+        print(f"     loads {', '.join(leaked)} at import time")
+    # Slowest direct imports of the module, the ones worth deferring. Rows are
+    # listed children first, indented two spaces per level after one separator
+    direct: Dict[str, int] = {}
+    i = next(i for i, (name, _, _) in enumerate(rows) if name == ' ' + module)
+    for name, _, cumulative in reversed(rows[:i]):
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 0:
+            break
+        if level == 1:
+            direct[name.strip()] = cumulative
+    for name, cumulative in sorted(direct.items(), key=lambda item: -item[1])[:top]:
+        print(f"     {cumulative / 1000:8.1f} ms  {name}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check entry point import times against their budgets")
+    parser.add_argument('modules', nargs='*', help="Modules to check (default: all in BUDGETS)")
+    parser.add_argument('--top', type=int, default=10, help="Slowest imports to list per module")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules or BUDGETS:
+        forbidden, budget_ms = BUDGETS.get(module, ([], float('inf')))
+        try:
+            results.append(check(module, forbidden, budget_ms, args.top))
+        except RuntimeError as e:
+            print(f"SKIP {module}: {e}")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,297 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# trading_info holds the 1-minute bars written by the ingesters
+DEFAULT_TIMEFRAME = '1Min'
+
+
+def _rolling_sma(values: np.ndarray, window: int) -> np.ndarray:
+    import pandas as pd
+    return pd.Series(values).rolling(window=window).mean().to_numpy()
+
+
+def _rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    import pandas as pd
+    return pd.Series(values).rolling(window=window).std().to_numpy()
+
+
+# indicator name -> fn(values, window), matching pandas rolling(window) semantics
+INDICATORS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    'sma': _rolling_sma,
+    'std': _rolling_std,
+}
+
+
+class _Series:
+    """A cached input series and the indicators computed over it"""
+    __slots__ = ('times', 'values', 'indicators')
+
+    def __init__(self, times: np.ndarray, values: np.ndarray):
+        self.times = times
+        self.values = values
+        self.indicators: Dict[Tuple[str, int], np.ndarray] = {}
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes + sum(a.nbytes for a in self.indicators.values())
+
+    def locate(self, times: np.ndarray, values: np.ndarray) -> Optional[int]:
+        """Offset of the requested series within this one, or None if it is not an exact slice"""
+        if not len(times) or not len(self.times):
+            return None
+        start = int(np.searchsorted(self.times, times[0]))
+        stop = start + len(times)
+        if stop > len(self.times):
+            return None
+        # Bitwise comparison, so NaN closes match and it stays a plain memory compare
+        if not (np.array_equal(self.times[start:stop], times) and
+                np.array_equal(self.values[start:stop].view(np.int64), values.view(np.int64))):
+            return None
+        return start
+
+    def overlaps(self, other: '_Series') -> bool:
+        return (len(self.times) and len(other.times) and
+                self.times[0] <= other.times[-1] and other.times[0] <= self.times[-1])
+
+    def merge(self, other: '_Series') -> Optional['_Series']:
+        """
+        Union of two overlapping series, or None if they differ where they overlap
+
+        This series' indicators are extended over the union; only the bars
+        whose window reaches outside it are computed.
+        """
+        lo, hi = max(self.times[0], other.times[0]), min(self.times[-1], other.times[-1])
+        a0, a1 = np.searchsorted(self.times, lo), np.searchsorted(self.times, hi, side='right')
+        b0, b1 = np.searchsorted(other.times, lo), np.searchsorted(other.times, hi, side='right')
+        if not (np.array_equal(self.times[a0:a1], other.times[b0:b1]) and
+                np.array_equal(self.values[a0:a1].view(np.int64), other.values[b0:b1].view(np.int64))):
+            return None
+        # Only the series starting first has bars before the overlap, and the one ending last after it
+        head = slice(0, a0) if a0 else slice(0, b0)
+        tail = slice(a1, None) if a1 < len(self.times) else slice(b1, None)
+        head_src = self if a0 else other
+        tail_src = self if a1 < len(self.times) else other
+        merged = _Series(
+            np.concatenate([head_src.times[head], self.times[a0:a1], tail_src.times[tail]]),
+            np.concatenate([head_src.values[head], self.values[a0:a1], tail_src.values[tail]])
+        )
+        # Position of this series in the union
+        i = len(head_src.times[head]) - a0
+        j = i + len(self.times)
+        for (name, window), full in self.indicators.items():
+            compute = INDICATORS[name]
+            parts = []
+            if i:
+                # Bars before this series, and its first window - 1 which now have a full window
+                fixed = min(i + window - 1, j)
+                parts += [compute(merged.values[:fixed], window), full[fixed - i:]]
+            else:
+                parts.append(full)
+            if j < len(merged.times):
+                start = max(j - window + 1, 0)
+                parts.append(compute(merged.values[start:], window)[j - start:])
+            merged.indicators[(name, window)] = np.concatenate(parts)
+        return merged
+
+
+class IndicatorStore:
+    def __init__(self, max_bytes: int = 256 * 2**20, cache_dir: Optional[str] = None,
+                 max_segments: int = 8):
+        """
+        Rolling indicator arrays shared across strategies and requests
+
+        Entries are keyed by (symbol, timeframe, data version) and hold the
+        input series of each disjoint range requested plus every (indicator,
+        window) computed over it, so a request for a date range inside a
+        cached one is answered by slicing. A request overlapping a cached
+        range is merged into it, which lets consecutive chunks of a run build
+        up one series. Each request is checked against the cached timestamps
+        and values, so changed data is recomputed even when its version was
+        not bumped; invalidate() releases it sooner.
+
+        Args:
+            max_bytes: Memory budget; least recently used series are evicted beyond it
+            cache_dir: Optional directory to persist series across processes and restarts
+            max_segments: Disjoint ranges kept per symbol and timeframe
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_segments = max_segments
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Segments of each entry, least recently used first
+        self._series: 'OrderedDict[Tuple[str, str, int], List[_Series]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+
+    def version(self, symbol: str) -> int:
+        return self._versions.get(symbol, 0)
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """Bump the data version of symbol (or every symbol) after its bars were rewritten"""
+        with self._lock:
+            symbols = [symbol] if symbol is not None else {k[0] for k in self._series} | set(self._versions)
+            for s in symbols:
+                self._versions[s] = self._versions.get(s, 0) + 1
+            for key in [k for k in self._series if k[0] in symbols]:
+                self._bytes -= sum(series.nbytes for series in self._series.pop(key))
+
+    def get(self, symbol: str, indicator: str, window: int, times, values,
+            timeframe: str = DEFAULT_TIMEFRAME) -> np.ndarray:
+        """
+        Indicator values for the given series, identical to computing them over it directly
+
+        Args:
+            symbol: Symbol the series belongs to
+            indicator: Name in INDICATORS
+            window: Rolling window length
+            times: Bar timestamps, ascending
+            values: Input values (usually close prices)
+            timeframe: Bar timeframe of the series
+        """
+        compute = INDICATORS[indicator]
+        times = np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(times):
+            return compute(values, window)
+        key = (symbol, timeframe, self.version(symbol))
+
+        with self._lock:
+            segments = self._series.get(key)
+            if segments is not None:
+                self._series.move_to_end(key)
+                segments = list(segments)
+        if segments is None:
+            segments = self._load(key) or []
+        series, start = None, None
+        for candidate in segments:
+            start = candidate.locate(times, values)
+            if start is not None:
+                series = candidate
+                break
+
+        missed = series is None
+        if missed:
+            series = _Series(times, values)
+            kept = []
+            for segment in segments:
+                if not segment.overlaps(series):
+                    kept.append(segment)
+                    continue
+                # A segment that disagrees with the request holds outdated bars and is dropped
+                larger, smaller = (segment, series) if len(segment.times) >= len(series.times) else (series, segment)
+                merged = larger.merge(smaller)
+                if merged is not None:
+                    series = merged
+            segments = kept[-(self.max_segments - 1):] + [series] if self.max_segments > 1 else [series]
+            start = series.locate(times, values)
+            self._store(key, segments)
+        elif segments[-1] is not series:
+            segments.remove(series)
+            segments.append(series)
+            with self._lock:
+                if key in self._series:
+                    self._series[key] = segments
+
+        full = series.indicators.get((indicator, window))
+        if full is None or missed:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if full is None:
+            full = compute(series.values, window)
+            with self._lock:
+                series.indicators[(indicator, window)] = full
+                if any(s is series for s in self._series.get(key, ())):
+                    self._bytes += full.nbytes
+                    self._evict()
+            self._save(key, segments)
+        result = full[start:start + len(times)].copy()
+        # Computed over the slice alone the first window - 1 values have no full window
+        result[:min(window - 1, len(result))] = np.nan
+        return result
+
+    def _store(self, key: Tuple[str, str, int], segments: List[_Series]) -> None:
+        with self._lock:
+            old = self._series.pop(key, None)
+            if old is not None:
+                self._bytes -= sum(series.nbytes for series in old)
+            self._series[key] = segments
+            self._bytes += sum(series.nbytes for series in segments)
+            self._evict()
+        self._save(key, segments)
+
+    def _evict(self) -> None:
+        """Drop least recently used entries, then the last entry's oldest segments, until within max_bytes"""
+        while self._bytes > self.max_bytes and self._series:
+            key, segments = next(iter(self._series.items()))
+            if len(self._series) > 1 or len(segments) == 1:
+                # A series larger than the whole budget is computed but not kept
+                del self._series[key]
+                self._bytes -= sum(series.nbytes for series in segments)
+            else:
+                self._series[key] = segments[1:]
+                self._bytes -= segments[0].nbytes
+
+    def _path(self, key: Tuple[str, str, int]) -> str:
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.npz")
+
+    def _save(self, key: Tuple[str, str, int], segments: List[_Series]) -> None:
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        arrays = {}
+        for i, series in enumerate(segments):
+            arrays[f"{i}/times"] = series.times
+            arrays[f"{i}/values"] = series.values
+            arrays.update({f"{i}/{name}:{window}": a for (name, window), a in list(series.indicators.items())})
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    def _load(self, key: Tuple[str, str, int]) -> Optional[List[_Series]]:
+        if self.cache_dir is None:
+            return None
+        try:
+            with np.load(self._path(key)) as data:
+                segments = {}
+                for name in data.files:
+                    i, field = name.split('/', 1)
+                    if field == 'times':
+                        segments[int(i)] = _Series(data[name], data[f"{i}/values"])
+                for name in data.files:
+                    i, field = name.split('/', 1)
+                    if ':' in field:
+                        indicator, window = field.rsplit(':', 1)
+                        segments[int(i)].indicators[(indicator, int(window))] = data[name]
+        except (OSError, ValueError, KeyError):
+            return None
+        segments = [segments[i] for i in sorted(segments)]
+        with self._lock:
+            if key in self._series:
+                return list(self._series[key])
+            self._series[key] = segments
+            self._bytes += sum(series.nbytes for series in segments)
+            self._evict()
+        return list(segments)
+
+
+indicator_store = IndicatorStore(
+    max_bytes=int(os.getenv('INDICATOR_CACHE_MB', 256)) * 2**20,
+    cache_dir=os.getenv('INDICATOR_CACHE_DIR') or None
+)
+
+
+def rolling_indicator(symbol: str, indicator: str, window: int, df, column: str = 'close_price',
+                      timeframe: str = DEFAULT_TIMEFRAME) -> np.ndarray:
+    """Indicator over df[column], served from the shared indicator_store"""
+    return indicator_store.get(symbol, indicator, window, df['timestamp'].to_numpy(),
+                               df[column].to_numpy(), timeframe)
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+# Alpaca API credentials
+API_KEY = os.getenv('APCA_API_KEY_ID')
+API_SECRET = os.getenv('APCA_API_SECRET_KEY')
+# Point APCA_DATA_URL at fake_alpaca_server.py to run without Alpaca access
+DATA_URL = os.getenv('APCA_DATA_URL', "https://data.alpaca.markets/v2")
+
+
+class LatestPriceService:
+    def __init__(self,
+                 data_url: str = DATA_URL,
+                 ttl: float = 2.0,
+                 batch_size: int = 200,
+                 timeout: float = 10.0):
+        """
+        Latest-price lookups batched through Alpaca's multi-symbol snapshot endpoint
+
+        Args:
+            data_url: Base URL of the Alpaca market data API
+            ttl: Seconds a fetched quote is served from cache
+            batch_size: Maximum symbols per snapshot request
+            timeout: HTTP timeout per request in seconds
+        """
+        self.data_url = data_url.rstrip('/')
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "APCA-API-KEY-ID": API_KEY or "",
+            "APCA-API-SECRET-KEY": API_SECRET or "",
+        })
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict] = {}
+        # symbol -> Event set when the in-flight request for it completes
+        self._inflight: Dict[str, threading.Event] = {}
+
+    def _fetch_snapshots(self, symbols: List[str]) -> Dict[str, Dict]:
+        quotes = {}
+        for i in range(0, len(symbols), self.batch_size):
+            batch = symbols[i:i + self.batch_size]
+            try:
+                response = self.session.get(
+                    f"{self.data_url}/stocks/snapshots",
+                    params={"symbols": ",".join(batch)},
+                    timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                # Like a failed status, skip the batch and keep the quotes already collected
+                print(f"Error fetching snapshots: {e}")
+                continue
+            if response.status_code != 200:
+                print(f"Error: {response.status_code} - {response.text}")
+                continue
+            for symbol, snapshot in response.json().items():
+                if not snapshot:
+                    continue
+                trade = snapshot.get("latestTrade") or {}
+                quote = snapshot.get("latestQuote") or {}
+                quotes[symbol] = {
+                    "symbol": symbol,
+                    "price": trade.get("p"),
+                    "timestamp": trade.get("t"),
+                    "bid": quote.get("bp"),
+                    "ask": quote.get("ap"),
+                }
+        return quotes
+
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Return the latest quote for each symbol
+
+        Fresh cache entries are served directly, symbols already being fetched
+        by another thread are waited on rather than requested again, and the
+        rest are fetched in batches. Symbols Alpaca doesn't know are omitted.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+        now = time.monotonic()
+        to_fetch, waiting = [], []
+        with self._lock:
+            for symbol in symbols:
+                cached = self._cache.get(symbol)
+                if cached is not None and now - cached["fetched_at"] < self.ttl:
+                    continue
+                if symbol in self._inflight:
+                    waiting.append(self._inflight[symbol])
+                else:
+                    self._inflight[symbol] = threading.Event()
+                    to_fetch.append(symbol)
+
+        if to_fetch:
+            quotes = {}
+            try:
+                quotes = self._fetch_snapshots(to_fetch)
+            except requests.RequestException as e:
+                print(f"Error fetching snapshots: {e}")
+            finally:
+                # Release waiters whatever happened, or they would wait on these symbols forever
+                fetched_at = time.monotonic()
+                with self._lock:
+                    for symbol, quote in quotes.items():
+                        quote["fetched_at"] = fetched_at
+                        self._cache[symbol] = quote
+                    for symbol in to_fetch:
+                        self._inflight.pop(symbol).set()
+
+        for event in waiting:
+            event.wait(self.timeout)
+
+        with self._lock:
+            return {
+                symbol: {k: v for k, v in self._cache[symbol].items() if k != "fetched_at"}
+                for symbol in symbols if symbol in self._cache
+            }
+
+    def get_price(self, symbol: str) -> Optional[float]:
+        """Return the latest traded price for one symbol, or None if unavailable"""
+        quote = self.get_prices([symbol]).get(symbol.upper())
+        return quote["price"] if quote else None
@@ -0,0 +1,76 @@
+import argparse
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+import requests
+
+# Read endpoints exercised by default; override with --path
+DEFAULT_PATHS = [
+    "/api/stocks?symbol=AAPL&start_date=2023-01-01&end_date=2023-01-31",
+    "/api/portfolio",
+    "/api/backtest/logs?limit=50",
+]
+
+
+def run_load(base_url: str, path: str, concurrency: int, duration: float) -> Dict:
+    """
+    Closed-loop load: `concurrency` clients each send the next request as soon
+    as the previous one completes, for `duration` seconds
+    """
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop_at = time.monotonic() + duration
+
+    def client(i: int) -> None:
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=30)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            latencies[i].append(time.perf_counter() - start)
+            if not ok:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    all_latencies = np.concatenate([np.array(l) for l in latencies]) * 1000
+    if not len(all_latencies):
+        return {"path": path, "requests": 0}
+    p50, p99 = np.percentile(all_latencies, [50, 99])
+    return {
+        "path": path,
+        "requests": len(all_latencies),
+        "errors": sum(errors),
+        "rps": round(len(all_latencies) / elapsed, 1),
+        "p50_ms": round(float(p50), 1),
+        "p99_ms": round(float(p99), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure requests per second and latency of the API, e.g. the dev server "
+                    "(python app.py) against gunicorn (gunicorn app:app)"
+    )
+    parser.add_argument('base_url', nargs='?', default="http://localhost:4000")
+    parser.add_argument('--path', action='append', help="Endpoint to test (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15.0, help="Seconds per endpoint")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<70} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for path in args.path or DEFAULT_PATHS:
+        result = run_load(args.base_url.rstrip('/'), path, args.concurrency, args.duration)
+        print(f"{result['path']:<70} {result['requests']:>9} {result.get('errors', 0):>7} "
+              f"{result.get('rps', 0):>8} {result.get('p50_ms', 0):>8} {result.get('p99_ms', 0):>8}")
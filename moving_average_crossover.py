@@ -1,9 +1,15 @@
 import pandas as pd
 import numpy as np
 import psycopg2
-import matplotlib.pyplot as plt
-from typing import Tuple, List, Dict
+import os
+from typing import Tuple, List, Dict, Optional
 from datetime import datetime
+from chunked_backtest import run_chunked
+from backtest_metrics import MetricsAccumulator
+from simulation_kernels import simulate, MODE_LONG_ONLY
+from indicator_cache import rolling_indicator
+from execution_model import ExecutionModel
+from shared_bars import fetch_shared_bars
 
 class MACrossoverBacktest:
     def __init__(self,
@@ -13,7 +19,10 @@ class MACrossoverBacktest:
                  end_date: str,
                  fast_window: int = 10,
                  slow_window: int = 30,
-                 initial_capital: float = 100000.0):
+                 initial_capital: float = 100000.0,
+                 commission: float = 0.0,
+                 slippage: float = 0.0,
+                 execution: Optional[Dict] = None):
         """
         Initialize the Moving Average Crossover backtest strategy
         
@@ -25,6 +34,10 @@ class MACrossoverBacktest:
             fast_window: Fast moving average period
             slow_window: Slow moving average period
             initial_capital: Starting capital for backtest
+            commission: Fraction of traded notional charged on every fill
+            slippage: Fraction of the close price lost to slippage on every fill
+            execution: Further execution_model.ExecutionModel arguments (per-share
+                commission, spread and volume impact, position sizing)
         """
         self.db_params = db_params
         self.symbol = symbol
@@ -33,11 +46,17 @@ class MACrossoverBacktest:
         self.fast_window = fast_window
         self.slow_window = slow_window
         self.initial_capital = initial_capital
+        self.commission = commission
+        self.slippage = slippage
+        self.execution = ExecutionModel.from_params(commission, slippage, execution)
         self.capital = initial_capital
         self.trades: List[Dict] = []
         
     def fetch_data(self) -> pd.DataFrame:
-        """Fetch data from PostgreSQL database"""
+        """Fetch data from the shared bar server when one is configured (BAR_SERVER), else PostgreSQL"""
+        df = fetch_shared_bars(self.symbol, self.start_date, self.end_date)
+        if df is not None:
+            return df
         try:
             conn = psycopg2.connect(**self.db_params)
             query = """
@@ -62,8 +81,9 @@ class MACrossoverBacktest:
 
     def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculate moving averages"""
-        df['Fast_MA'] = df['close_price'].rolling(window=self.fast_window).mean()
-        df['Slow_MA'] = df['close_price'].rolling(window=self.slow_window).mean()
+        df['Fast_MA'] = rolling_indicator(self.symbol, 'sma', self.fast_window, df)
+        df['Slow_MA'] = rolling_indicator(self.symbol, 'sma', self.slow_window, df)
+        df['Size'] = self.execution.position_size(df['close_price'])
         df['Position'] = 0
         return df
     
@@ -90,131 +110,91 @@ class MACrossoverBacktest:
         
         # Initialize results tracking
         df['Returns'] = df['close_price'].pct_change()
-        df['Strategy_Returns'] = 0.0
-        df['Capital'] = self.initial_capital
-        
-        # Execute trades
-        position = 0
-        entry_price = 0
-        
-        for i in range(1, len(df)):
-            if df['Position'].iloc[i] != 0:
-                if df['Position'].iloc[i] > 0:  # Buy signal
-                    if position == 0:
-                        position = 1
-                        entry_price = df['close_price'].iloc[i]
-                        self.trades.append({
-                            'entry_date': df['timestamp'].iloc[i],
-                            'entry_price': entry_price,
-                            'type': 'buy'
-                        })
-                elif df['Position'].iloc[i] < 0:  # Sell signal
-                    if position == 1:
-                        position = 0
-                        exit_price = df['close_price'].iloc[i]
-                        returns = (exit_price - entry_price) / entry_price
-                        self.capital *= (1 + returns)
-                        self.trades.append({
-                            'exit_date': df['timestamp'].iloc[i],
-                            'exit_price': exit_price,
-                            'returns': returns,
-                            'type': 'sell'
-                        })
-            
-            df.loc[df.index[i], 'Capital'] = self.capital
-            if position == 1:
-                df.loc[df.index[i], 'Strategy_Returns'] = df['Returns'].iloc[i]
+        metrics = MetricsAccumulator(self.initial_capital)
+        capital, strategy_returns = self._simulate(df, self.initial_state(), metrics)
+        df['Strategy_Returns'] = strategy_returns
+        df['Capital'] = capital
         
         # Calculate strategy performance metrics
-        results = self.calculate_performance_metrics(df)
+        results = metrics.results()
         
         return df, results
     
-    def calculate_performance_metrics(self, df: pd.DataFrame) -> Dict:
-        """Calculate strategy performance metrics"""
-        total_return = (self.capital - self.initial_capital) / self.initial_capital
-        strategy_returns = df['Strategy_Returns'].dropna()
-        
-        results = {
-            'Total Return (%)': round(total_return * 100, 2),
-            'Annual Return (%)': round(total_return / (len(df) / 252) * 100, 2),
-            'Sharpe Ratio': round(np.sqrt(252) * strategy_returns.mean() / strategy_returns.std(), 2),
-            'Max Drawdown (%)': round(self.calculate_max_drawdown(df) * 100, 2),
-            'Number of Trades': len(self.trades) // 2,
-            'Win Rate (%)': self.calculate_win_rate(),
-            'Average Trade Duration': self.calculate_avg_trade_duration(),
-            'Profit Factor': self.calculate_profit_factor()
-        }
-        
-        return results
-    
-    def calculate_max_drawdown(self, df: pd.DataFrame) -> float:
-        """Calculate maximum drawdown"""
-        rolling_max = df['Capital'].expanding().max()
-        drawdowns = df['Capital'] / rolling_max - 1
-        return abs(drawdowns.min())
+    def execute_backtest_chunked(self, chunk_size: int = 100_000) -> Dict:
+        """
+        Execute the backtest over bars streamed from the database in chunks
+
+        Produces the same metrics as execute_backtest while holding at most
+        one chunk of bars (plus the slow window) in memory.
+        """
+        return run_chunked(self, chunk_size).results()
     
-    def calculate_win_rate(self) -> float:
-        """Calculate win rate of trades"""
-        if not self.trades:
-            return 0.0
-        
-        winning_trades = sum(1 for trade in self.trades if 
-                           'returns' in trade and trade['returns'] > 0)
-        return round(winning_trades / (len(self.trades) / 2) * 100, 2)
+    @property
+    def lookback(self) -> int:
+        """Bars of history the indicators need before the newest bar"""
+        # +1 for the crossover diff
+        return max(max(self.fast_window, self.slow_window) + 1, self.execution.lookback)
     
-    def calculate_profit_factor(self) -> float:
-        """Calculate profit factor"""
-        profits = sum(trade['returns'] for trade in self.trades if 
-                     'returns' in trade and trade['returns'] > 0)
-        losses = sum(abs(trade['returns']) for trade in self.trades if 
-                    'returns' in trade and trade['returns'] < 0)
-        
-        return round(profits / losses if losses != 0 else float('inf'), 2)
+    def initial_state(self) -> Dict:
+        """Position state carried between chunks of a run"""
+        return {'position': 0, 'entry_price': None, 'prev_close': None, 'capital': self.capital}
     
-    def calculate_avg_trade_duration(self) -> str:
-        """Calculate average trade duration"""
-        durations = []
-        for i in range(0, len(self.trades) - 1, 2):
-            entry_date = pd.to_datetime(self.trades[i]['entry_date'])
-            exit_date = pd.to_datetime(self.trades[i + 1]['exit_date'])
-            duration = exit_date - entry_date
-            durations.append(duration)
-        
-        if durations:
-            avg_duration = sum(durations, pd.Timedelta(0)) / len(durations)
-            return str(avg_duration)
-        return "N/A"
+    def _simulate(self, df: pd.DataFrame, state: Dict,
+                  metrics: MetricsAccumulator) -> Tuple[np.ndarray, np.ndarray]:
+        """Apply signals through the simulation kernel, returning the Capital and Strategy_Returns columns"""
+        close = df['close_price'].to_numpy(dtype=float)
+        size = df['Size'].to_numpy(dtype=float)
+        commission, slippage = self.execution.costs(close, df['volume'].to_numpy(dtype=float),
+                                                    self.initial_capital, size)
+        result = simulate(
+            close,
+            df['Position'].to_numpy(dtype=float),
+            MODE_LONG_ONLY,
+            state,
+            commission=commission,
+            slippage=slippage,
+            size=size
+        )
+        state.update(result.state)
+        self.capital = result.state['capital']
+        metrics.update(df['timestamp'], result)
+        
+        timestamps = df['timestamp']
+        for i, price, returns, is_exit, side in zip(result.event_index, result.event_price,
+                                                     result.event_returns, result.event_is_exit,
+                                                     result.event_side):
+            if is_exit:
+                self.trades.append({
+                    'exit_date': timestamps.iloc[i],
+                    'exit_price': price,
+                    'returns': returns,
+                    'type': 'sell' if side > 0 else 'buy'
+                })
+            else:
+                self.trades.append({
+                    'entry_date': timestamps.iloc[i],
+                    'entry_price': price,
+                    'type': 'buy' if side > 0 else 'sell'
+                })
+        
+        return result.capital, result.strategy_returns
     
-    def plot_results(self, df: pd.DataFrame) -> None:
-        """Plot backtest results"""
-        plt.figure(figsize=(15, 10))
-        
-        # Plot price and moving averages
-        plt.subplot(2, 1, 1)
-        plt.plot(df['timestamp'], df['close_price'], label='Price')
-        plt.plot(df['timestamp'], df['Fast_MA'], 'r--', label=f'{self.fast_window}-day MA')
-        plt.plot(df['timestamp'], df['Slow_MA'], 'g--', label=f'{self.slow_window}-day MA')
-        
-        # Plot buy and sell signals
-        buy_signals = df[df['Position'] > 0]
-        sell_signals = df[df['Position'] < 0]
-        plt.scatter(buy_signals['timestamp'], buy_signals['close_price'], 
-                   marker='^', color='g', label='Buy Signal')
-        plt.scatter(sell_signals['timestamp'], sell_signals['close_price'], 
-                   marker='v', color='r', label='Sell Signal')
-        
-        plt.title(f'Moving Average Crossover Strategy - {self.symbol}')
-        plt.legend()
-        
-        # Plot portfolio value
-        plt.subplot(2, 1, 2)
-        plt.plot(df['timestamp'], df['Capital'], label='Portfolio Value')
-        plt.title('Portfolio Value Over Time')
-        plt.legend()
-        
-        plt.tight_layout()
-        plt.show()
+    @property
+    def chart_title(self) -> str:
+        return f'Moving Average Crossover Strategy - {self.symbol}'
+
+    @property
+    def chart_indicators(self) -> List[Tuple[str, str, str]]:
+        """(label, column, line style) of the indicator lines drawn over the price"""
+        return [(f'{self.fast_window}-day MA', 'Fast_MA', 'r--'), (f'{self.slow_window}-day MA', 'Slow_MA', 'g--')]
+
+    def plot_results(self, df: pd.DataFrame, path: Optional[str] = None) -> Optional[str]:
+        """Render price, indicators, trades and capital to an image file (PNG, or SVG by extension)"""
+        # Headless runs (HEADLESS=1, e.g. the API server) never load matplotlib
+        if os.getenv('HEADLESS') == '1':
+            return None
+        from chart_renderer import save_backtest_chart
+        return save_backtest_chart(self, df, path or f"{self.symbol}_ma_crossover.png")
 
 def main():
     # Database connection parameters
@@ -252,7 +232,9 @@ def main():
             print(f"{metric}: {value}")
         
         # Plot results
-        backtest.plot_results(df)
+        chart = backtest.plot_results(df)
+        if chart:
+            print(f"\nChart saved to {chart}")
         
     except Exception as e:
         print(f"Error during backtest: {e}")
@@ -0,0 +1,595 @@
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import date
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import requests
+from psycopg2.extras import execute_values
+
+from backtest_metrics import MetricsAccumulator
+from chunked_backtest import simulate_chunk
+
+API_KEY = os.getenv('APCA_API_KEY_ID')
+SECRET_KEY = os.getenv('APCA_API_SECRET_KEY')
+BASE_URL = os.getenv('APCA_API_BASE_URL', "https://paper-api.alpaca.markets")  # Paper trading environment
+
+DB_PARAMS = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "alpaca_data",
+    "user": "postgres",
+    "password": "secretpass"
+}
+
+# Order states after which Alpaca no longer changes an order
+TERMINAL_STATUSES = {'filled', 'canceled', 'expired', 'rejected', 'replaced', 'done_for_day'}
+
+
+class Signal(NamedTuple):
+    symbol: str
+    side: str         # 'buy' / 'sell'
+    qty: float
+    strategy: str
+    decided_ns: int   # time.monotonic_ns() when the signal was produced
+
+
+def _signed(side: str, qty: float) -> float:
+    return qty if side == 'buy' else -qty
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        """Allow `rate` acquisitions per second on average with bursts of up to `capacity`"""
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AlpacaBroker:
+    def __init__(self, base_url: str = BASE_URL, timeout: float = 10.0):
+        """Orders and positions through the Alpaca trading API"""
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "APCA-API-KEY-ID": API_KEY or "",
+            "APCA-API-SECRET-KEY": SECRET_KEY or "",
+        })
+
+    def _request(self, method: str, path: str, **kwargs):
+        response = self.session.request(method, f"{self.base_url}/v2{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def submit_order(self, symbol: str, qty: float, side: str, client_order_id: str) -> Dict:
+        return self._request('POST', '/orders', json={
+            "symbol": symbol,
+            "qty": str(qty),
+            "side": side,
+            "type": "market",
+            "time_in_force": "day",
+            "client_order_id": client_order_id,
+        })
+
+    def list_orders(self, status: str = 'all', limit: int = 500) -> List[Dict]:
+        """Most recent orders first"""
+        return self._request('GET', '/orders', params={"status": status, "limit": limit, "direction": "desc"})
+
+    def list_positions(self) -> List[Dict]:
+        return self._request('GET', '/positions')
+
+
+class MockBroker:
+    def __init__(self, price_fn: Optional[Callable[[str], float]] = None, fill_delay: float = 0.0,
+                 latency: float = 0.0):
+        """
+        In-memory stand-in for AlpacaBroker
+
+        Market orders fill in full at price_fn(symbol) once fill_delay seconds
+        have passed; every call sleeps `latency` seconds and is counted.
+        """
+        self.price_fn = price_fn or (lambda symbol: 100.0)
+        self.fill_delay = fill_delay
+        self.latency = latency
+        self.request_count = 0
+        self.orders: Dict[str, Dict] = {}
+        self.positions: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _call(self) -> None:
+        self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _fill_due(self) -> None:
+        now = time.monotonic()
+        for order in self.orders.values():
+            if order['status'] != 'new' or now - order['_submitted'] < self.fill_delay:
+                continue
+            price = float(self.price_fn(order['symbol']))
+            qty = float(order['qty']) * (1 if order['side'] == 'buy' else -1)
+            position = self.positions.setdefault(order['symbol'], {'qty': 0.0, 'avg_entry_price': 0.0})
+            new_qty = position['qty'] + qty
+            if new_qty == 0:
+                del self.positions[order['symbol']]
+            elif position['qty'] == 0 or np.sign(new_qty) != np.sign(position['qty']):
+                position.update(qty=new_qty, avg_entry_price=price)
+            elif abs(new_qty) > abs(position['qty']):
+                position['avg_entry_price'] = (position['avg_entry_price'] * position['qty'] + price * qty) / new_qty
+                position['qty'] = new_qty
+            else:
+                position['qty'] = new_qty
+            order.update(status='filled', filled_qty=order['qty'], filled_avg_price=str(price))
+
+    def submit_order(self, symbol: str, qty: float, side: str, client_order_id: str) -> Dict:
+        self._call()
+        with self._lock:
+            order = {
+                'id': str(uuid.uuid4()),
+                'client_order_id': client_order_id,
+                'symbol': symbol,
+                'qty': str(qty),
+                'side': side,
+                'status': 'new',
+                'filled_qty': '0',
+                'filled_avg_price': None,
+                '_submitted': time.monotonic(),
+            }
+            self.orders[order['id']] = order
+            return {k: v for k, v in order.items() if not k.startswith('_')}
+
+    def list_orders(self, status: str = 'all', limit: int = 500) -> List[Dict]:
+        self._call()
+        with self._lock:
+            self._fill_due()
+            orders = [{k: v for k, v in o.items() if not k.startswith('_')} for o in self.orders.values()]
+            if status != 'all':
+                orders = [o for o in orders if (o['status'] in TERMINAL_STATUSES) == (status == 'closed')]
+            return orders[::-1][:limit]
+
+    def list_positions(self) -> List[Dict]:
+        self._call()
+        with self._lock:
+            self._fill_due()
+            return [{
+                'symbol': symbol,
+                'qty': str(p['qty']),
+                'avg_entry_price': str(p['avg_entry_price']),
+                'current_price': str(self.price_fn(symbol)),
+            } for symbol, p in self.positions.items()]
+
+
+def reconcile_positions(db_params: Dict[str, str], positions: List[Dict]) -> int:
+    """
+    Mirror broker positions into current_positions (rows with source = 'paper') in one transaction
+
+    Rows are only rewritten when entry or quantity changed, positions no longer
+    held are deleted, and the app is notified to reload its valuations.
+    Returns the number of rows inserted, updated or deleted.
+    """
+    rows = []
+    for p in positions:
+        qty, entry, price = float(p['qty']), float(p['avg_entry_price']), float(p['current_price'])
+        pl_percent = (price - entry) / entry * np.sign(qty) * 100 if entry else 0.0
+        rows.append((p['symbol'], round(entry, 2), round(price, 2), round((price - entry) * qty, 2),
+                     round(float(np.clip(pl_percent, -9999, 9999)), 2), qty, 'paper'))
+
+    conn = psycopg2.connect(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            changed = 0
+            if rows:
+                execute_values(cursor, """
+                    INSERT INTO current_positions
+                        (symbol, entry, current_value, profit_loss, pl_percent, quantity, source)
+                    VALUES %s
+                    ON CONFLICT (symbol) WHERE source = 'paper' DO UPDATE
+                    SET entry = EXCLUDED.entry,
+                        quantity = EXCLUDED.quantity,
+                        current_value = EXCLUDED.current_value,
+                        profit_loss = EXCLUDED.profit_loss,
+                        pl_percent = EXCLUDED.pl_percent
+                    WHERE (current_positions.entry, current_positions.quantity)
+                        IS DISTINCT FROM (EXCLUDED.entry, EXCLUDED.quantity)
+                """, rows, page_size=len(rows))
+                changed += cursor.rowcount
+            cursor.execute("""
+                DELETE FROM current_positions
+                WHERE source = 'paper' AND NOT (symbol = ANY(%s))
+            """, ([row[0] for row in rows],))
+            changed += cursor.rowcount
+            if changed:
+                cursor.execute("SELECT pg_notify('positions_reload', '')")
+        conn.commit()
+    finally:
+        conn.close()
+    return changed
+
+
+class ExecutionEngine:
+    def __init__(self,
+                 broker,
+                 db_params: Optional[Dict[str, str]] = DB_PARAMS,
+                 rate_limit: float = 3.0,
+                 burst: int = 10,
+                 max_batch: int = 50,
+                 batch_window: float = 0.05,
+                 poll_interval: float = 1.0,
+                 reconcile_interval: float = 30.0):
+        """
+        Turn strategy signals into broker orders and keep current_positions in sync
+
+        Signals queued within batch_window are netted per symbol so opposing
+        signals cost no orders, submissions pass through a token bucket to
+        stay under the broker's rate limit, and open orders are tracked with
+        one list call per poll rather than one request per order.
+
+        Args:
+            broker: AlpacaBroker or MockBroker
+            db_params: Database connection parameters (None skips reconciliation)
+            rate_limit: Sustained order submissions per second (Alpaca allows 200 requests/minute)
+            burst: Submissions allowed back to back before rate limiting applies
+            max_batch: Maximum signals netted into one batch
+            batch_window: Seconds to wait for more signals after the first of a batch
+            poll_interval: Seconds between order status polls while orders are open
+            reconcile_interval: Maximum seconds between position reconciliations
+        """
+        self.broker = broker
+        self.db_params = db_params
+        self.bucket = TokenBucket(rate_limit, burst)
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.poll_interval = poll_interval
+        self.reconcile_interval = reconcile_interval
+        self.orders: Dict[str, Dict] = {}
+        # Shares held per symbol: broker positions as of the last settled reconcile plus fills since
+        self.positions: Dict[str, float] = {}
+        self.latencies_ms = deque(maxlen=10_000)
+        self._signals: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Signed shares of signals queued but not yet sent, per symbol
+        self._queued: Dict[str, float] = {}
+        self._order_seq = 0
+        self._reconcile_due = threading.Event()
+        self._last_reconcile = 0.0
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    def submit(self, signal: Signal) -> None:
+        with self._lock:
+            self._queued[signal.symbol] = self._queued.get(signal.symbol, 0.0) + _signed(signal.side, signal.qty)
+        self._signals.put(signal)
+
+    def position(self, symbol: str) -> float:
+        """Shares held in symbol, including fills seen since the last reconcile"""
+        with self._lock:
+            return self.positions.get(symbol, 0.0)
+
+    def pending(self, symbol: str) -> float:
+        """Signed shares of symbol still on their way: queued signals plus unfilled open orders"""
+        with self._lock:
+            return self._queued.get(symbol, 0.0) + sum(
+                _signed(o['side'], float(o['qty']) - float(o.get('filled_qty') or 0))
+                for o in self.orders.values()
+                if o['symbol'] == symbol and o['status'] not in TERMINAL_STATUSES
+            )
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for target in (self._submit_loop, self._track_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._signals.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _next_batch(self) -> List[Signal]:
+        first = self._signals.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                signal = self._signals.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if signal is None:
+                self._signals.put(None)
+                break
+            batch.append(signal)
+        return batch
+
+    def _submit_loop(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            net: Dict[str, float] = {}
+            for signal in batch:
+                net[signal.symbol] = net.get(signal.symbol, 0.0) + (signal.qty if signal.side == 'buy' else -signal.qty)
+            for symbol, qty in net.items():
+                signals = [s for s in batch if s.symbol == symbol]
+                if qty == 0:
+                    # Opposing signals cancelled out; nothing to send
+                    self._dequeue(symbol, qty)
+                    self._record_latency(signals)
+                    continue
+                side = 'buy' if qty > 0 else 'sell'
+                client_order_id = f"{signals[0].strategy}-{symbol}-{next(self._ids)}-{uuid.uuid4().hex[:8]}"
+                self.bucket.acquire()
+                try:
+                    order = self.broker.submit_order(symbol, abs(qty), side, client_order_id)
+                except Exception as e:
+                    # No longer pending, so the strategy sends the difference again on its next bar
+                    self._dequeue(symbol, qty)
+                    print(f"Error submitting {side} {abs(qty)} {symbol}: {e}")
+                    continue
+                self._record_latency(signals)
+                with self._lock:
+                    self._queued[symbol] -= qty
+                    self._order_seq += 1
+                    self.orders[order['id']] = {**order, 'filled_qty': '0'}
+                    self._apply_fill(order)
+                self._reconcile_due.set()
+
+    def _dequeue(self, symbol: str, qty: float) -> None:
+        with self._lock:
+            self._queued[symbol] -= qty
+
+    def _apply_fill(self, order: Dict) -> bool:
+        """Update a tracked order from the broker, adding any newly filled shares to positions (lock held)"""
+        tracked = self.orders.get(order['id'])
+        if tracked is None:
+            return False
+        new_fill = float(order.get('filled_qty') or 0) - float(tracked.get('filled_qty') or 0)
+        if new_fill:
+            self.positions[order['symbol']] = self.positions.get(order['symbol'], 0.0) + _signed(order['side'], new_fill)
+        became_filled = order['status'] != tracked['status'] and order['status'] == 'filled'
+        tracked.update(order)
+        return became_filled
+
+    def _record_latency(self, signals: List[Signal]) -> None:
+        now = time.monotonic_ns()
+        for signal in signals:
+            self.latencies_ms.append((now - signal.decided_ns) / 1e6)
+
+    def _has_open_orders(self) -> bool:
+        return any(o['status'] not in TERMINAL_STATUSES for o in self.orders.values())
+
+    def _track_loop(self) -> None:
+        while not self._stopping.is_set():
+            # A new order wakes the loop early; cleared right away so open orders
+            # are polled once per poll_interval rather than continuously
+            self._reconcile_due.wait(self.poll_interval)
+            self._reconcile_due.clear()
+            try:
+                with self._lock:
+                    has_open = self._has_open_orders()
+                filled = False
+                if has_open:
+                    for order in self.broker.list_orders('all'):
+                        with self._lock:
+                            filled = self._apply_fill(order) or filled
+                if filled or time.monotonic() - self._last_reconcile >= self.reconcile_interval:
+                    self.reconcile()
+            except Exception as e:
+                print(f"Error tracking orders: {e}")
+
+    def reconcile(self) -> int:
+        """
+        Re-read broker positions and sync them into current_positions
+
+        positions is only replaced while no order is open (and none was sent
+        during the call): an open order's fill may already be in the broker's
+        positions but not yet counted from the order, and would then be
+        counted twice.
+        """
+        self._last_reconcile = time.monotonic()
+        with self._lock:
+            seq = self._order_seq
+        positions = self.broker.list_positions()
+        with self._lock:
+            if seq == self._order_seq and not self._has_open_orders():
+                self.positions = {p['symbol']: float(p['qty']) for p in positions}
+        if self.db_params is None:
+            return 0
+        return reconcile_positions(self.db_params, positions)
+
+    def latency_report(self) -> Dict[str, float]:
+        """Decision-to-order latency percentiles in milliseconds"""
+        latencies = np.array(self.latencies_ms)
+        if not len(latencies):
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {"count": len(latencies), "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3), "max_ms": round(float(latencies.max()), 3)}
+
+
+class LiveStrategy:
+    def __init__(self, name: str, backtest, quantity: float):
+        """
+        Run a backtest class's signal and position logic bar by bar on live data
+
+        The backtest's position after each update is the target; the difference
+        to what the account holds (plus orders still on their way) becomes a Signal.
+
+        Args:
+            name: Strategy name, used in client order ids
+            backtest: BollingerBandsBacktest or MACrossoverBacktest instance
+            quantity: Shares held per unit of strategy position (scaled by the position size
+                of the backtest's execution model)
+        """
+        self.name = name
+        self.backtest = backtest
+        self.quantity = quantity
+        self.state = backtest.initial_state()
+        self.metrics = MetricsAccumulator(backtest.initial_capital)
+        self.tail: Optional[pd.DataFrame] = None
+        self.last_timestamp = None
+
+    def warm_up(self, bars: pd.DataFrame) -> None:
+        """Feed history so indicators and the strategy position are current before trading"""
+        if not bars.empty:
+            self.tail = simulate_chunk(self.backtest, bars, self.tail, self.state, self.metrics, self.backtest.lookback)
+            self.last_timestamp = bars['timestamp'].iloc[-1]
+
+    def on_bars(self, bars: pd.DataFrame, held: float = 0.0, pending: float = 0.0) -> Optional[Signal]:
+        """
+        Advance the strategy over new bars and return the order needed to reach its target
+
+        Args:
+            bars: New bars of the strategy's symbol
+            held: Shares the account holds (ExecutionEngine.position)
+            pending: Signed shares already queued or ordered (ExecutionEngine.pending)
+        """
+        if self.last_timestamp is not None:
+            bars = bars[bars['timestamp'] > self.last_timestamp]
+        if bars.empty:
+            return None
+        self.tail = simulate_chunk(self.backtest, bars.reset_index(drop=True), self.tail,
+                                   self.state, self.metrics, self.backtest.lookback)
+        self.last_timestamp = bars['timestamp'].iloc[-1]
+        decided_ns = time.monotonic_ns()
+        target = self.state['position'] * self.state.get('size', 1.0) * self.quantity
+        delta = target - held - pending
+        if delta == 0:
+            return None
+        return Signal(self.backtest.symbol, 'buy' if delta > 0 else 'sell', abs(delta), self.name, decided_ns)
+
+
+def strategy_classes() -> Dict:
+    from bollinger_bands_backtest import BollingerBandsBacktest
+    from moving_average_crossover import MACrossoverBacktest
+    return {'bollinger': BollingerBandsBacktest, 'moving_average': MACrossoverBacktest}
+
+
+def fetch_bars(db_params: Dict[str, str], symbols: List[str], after: Optional[Dict] = None,
+               limit_per_symbol: Optional[int] = None) -> pd.DataFrame:
+    """
+    Bars for several symbols in one query: the latest `limit_per_symbol` each, or
+    those newer than each symbol's time in `after` (symbol -> timestamp)
+    """
+    conn = psycopg2.connect(**db_params)
+    try:
+        if limit_per_symbol:
+            query = """
+                SELECT symbol, timestamp, close_price, volume FROM (
+                    SELECT symbol, timestamp, close_price, volume,
+                           ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC) AS rn
+                    FROM trading_info
+                    WHERE symbol = ANY(%s)
+                ) recent
+                WHERE rn <= %s
+                ORDER BY timestamp ASC
+            """
+            params = (symbols, limit_per_symbol)
+        else:
+            # Per symbol, so a bar committed after another symbol's newer one is still picked up
+            query = """
+                SELECT t.symbol, t.timestamp, t.close_price, t.volume
+                FROM trading_info t
+                JOIN unnest(%s::varchar[], %s::timestamp[]) AS seen(symbol, after) ON t.symbol = seen.symbol
+                WHERE t.timestamp > seen.after
+                ORDER BY t.timestamp ASC
+            """
+            params = (symbols, [pd.Timestamp(after[symbol]).to_pydatetime() for symbol in symbols])
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def run_paper_trading(symbols: List[str],
+                      strategy: str = 'moving_average',
+                      quantity: float = 1.0,
+                      poll_interval: float = 5.0,
+                      broker=None,
+                      db_params: Dict[str, str] = DB_PARAMS,
+                      **strategy_params) -> None:
+    """
+    Trade the paper account from live bars in trading_info (written by webSocket.py)
+
+    Args:
+        symbols: Symbols to trade
+        strategy: 'bollinger' or 'moving_average'
+        quantity: Shares per unit of strategy position
+        poll_interval: Seconds between checks for new bars
+        broker: Broker to trade through (AlpacaBroker by default)
+        strategy_params: Extra arguments for the backtest class (window, fast_window, ...)
+    """
+    broker = broker or AlpacaBroker()
+    engine = ExecutionEngine(broker, db_params)
+    engine.reconcile()
+    today = date.today().isoformat()
+    backtest_cls = strategy_classes()[strategy]
+
+    strategies = {}
+    for symbol in symbols:
+        backtest = backtest_cls(db_params=db_params, symbol=symbol, start_date=today, end_date=today, **strategy_params)
+        strategies[symbol] = LiveStrategy(strategy, backtest, quantity)
+    history = fetch_bars(db_params, symbols, limit_per_symbol=2 * max(s.backtest.lookback for s in strategies.values()))
+    for symbol, bars in history.groupby('symbol'):
+        strategies[symbol].warm_up(bars.drop(columns='symbol').reset_index(drop=True))
+
+    engine.start()
+    print(f"Paper trading {', '.join(symbols)} with {strategy}")
+    try:
+        while True:
+            time.sleep(poll_interval)
+            # Each strategy's newest processed bar; on_bars advances it
+            last_seen = {symbol: s.last_timestamp if s.last_timestamp is not None else pd.Timestamp(today)
+                         for symbol, s in strategies.items()}
+            bars = fetch_bars(db_params, symbols, after=last_seen)
+            if bars.empty:
+                continue
+            for symbol, symbol_bars in bars.groupby('symbol'):
+                signal = strategies[symbol].on_bars(symbol_bars.drop(columns='symbol'),
+                                                    engine.position(symbol), engine.pending(symbol))
+                if signal is not None:
+                    engine.submit(signal)
+                    print(f"{signal.side} {signal.qty} {symbol}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        print(f"Decision-to-order latency: {engine.latency_report()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paper trade a backtested strategy on live bars")
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--strategy', choices=['bollinger', 'moving_average'], default='moving_average')
+    parser.add_argument('--quantity', type=float, default=1.0)
+    parser.add_argument('--mock', action='store_true', help="Trade against an in-memory mock broker")
+    args = parser.parse_args()
+    run_paper_trading(args.symbols, args.strategy, args.quantity, broker=MockBroker() if args.mock else None)
@@ -0,0 +1,303 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+DATA_STREAM_URL = "wss://stream.data.alpaca.markets/v2/iex"
+
+
+class PortfolioValuationEngine:
+    def __init__(self,
+                 db_params: Dict[str, str],
+                 flush_interval: float = 5.0,
+                 price_service=None,
+                 poll_interval: float = 15.0):
+        """
+        Keep current_positions valued against an in-memory latest-price map
+
+        Args:
+            db_params: Database connection parameters
+            flush_interval: Minimum seconds between batched writes to current_positions
+            price_service: Optional LatestPriceService polled when no trade stream is running
+            poll_interval: Seconds between price_service polls
+        """
+        self.db_params = db_params
+        self.flush_interval = flush_interval
+        self.price_service = price_service
+        self.poll_interval = poll_interval
+        self._last_poll = 0.0
+        self._lock = threading.RLock()
+        self._symbol_index: Dict[str, int] = {}
+        self._prices = np.full(0, np.nan)
+        # Position columns, one element per current_positions row
+        self._ids = np.empty(0, dtype=np.int64)
+        self._symbols: List[str] = []
+        self._symbol_codes = np.empty(0, dtype=np.int64)
+        self._entry = np.empty(0)
+        self._quantity = np.empty(0)
+        self._current = np.empty(0)
+        self._profit_loss = np.empty(0)
+        self._pl_percent = np.empty(0)
+        self._dirty = np.empty(0, dtype=bool)
+        self._snapshot: Optional[List[Dict]] = None
+        self._last_flush = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._ws = None
+        self._listeners = []
+
+    def _symbol_code(self, symbol: str) -> int:
+        code = self._symbol_index.get(symbol)
+        if code is None:
+            code = len(self._symbol_index)
+            self._symbol_index[symbol] = code
+            self._prices = np.append(self._prices, np.nan)
+        return code
+
+    def load_positions(self) -> None:
+        """Load all current_positions rows into memory"""
+        conn = psycopg2.connect(**self.db_params)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, symbol, entry, current_value, profit_loss, pl_percent, COALESCE(quantity, 1)
+                    FROM current_positions
+                    ORDER BY id
+                """)
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+            self._symbols = [row[1] for row in rows]
+            self._symbol_codes = np.array([self._symbol_code(s) for s in self._symbols], dtype=np.int64)
+            self._entry = np.array([float(row[2]) for row in rows])
+            self._quantity = np.array([float(row[6]) for row in rows])
+            self._current = np.array([float(row[3]) for row in rows])
+            self._profit_loss = np.array([float(row[4]) for row in rows])
+            self._pl_percent = np.array([float(row[5]) for row in rows])
+            self._dirty = np.zeros(len(rows), dtype=bool)
+            self._snapshot = None
+
+    def reload_positions(self) -> None:
+        """Re-read current_positions after another process changed it and push the new rows to listeners"""
+        with self._lock:
+            known = set(self._symbol_index)
+            self.load_positions()
+            new_symbols = sorted(set(self._symbols) - known)
+        self.load_latest_bars()
+        self.revalue()
+        rows = self.snapshot()
+        for callback in self._listeners:
+            callback(rows)
+        if new_symbols and self._ws is not None and self._ws.sock is not None:
+            self._ws.send(json.dumps({"action": "subscribe", "trades": new_symbols}))
+
+    def load_latest_bars(self) -> None:
+        """Seed prices missing from the stream with the latest close in trading_info"""
+        with self._lock:
+            missing = [s for s, code in self._symbol_index.items() if np.isnan(self._prices[code])]
+        if not missing:
+            return
+
+        conn = psycopg2.connect(**self.db_params)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT DISTINCT ON (symbol) symbol, close_price
+                    FROM trading_info
+                    WHERE symbol = ANY(%s)
+                    ORDER BY symbol, timestamp DESC
+                """, (missing,))
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            for symbol, close_price in rows:
+                code = self._symbol_index[symbol]
+                # A trade that arrived while we were querying is fresher than the bar
+                if np.isnan(self._prices[code]):
+                    self._prices[code] = close_price
+
+    def add_position(self, position_id: int, symbol: str, entry: float, quantity: float = 1.0) -> None:
+        """Track a position that was just inserted into current_positions"""
+        with self._lock:
+            if (self._ids == position_id).any():
+                return
+            self._ids = np.append(self._ids, position_id)
+            self._symbols.append(symbol)
+            self._symbol_codes = np.append(self._symbol_codes, self._symbol_code(symbol))
+            self._entry = np.append(self._entry, float(entry))
+            self._quantity = np.append(self._quantity, float(quantity))
+            self._current = np.append(self._current, float(entry))
+            self._profit_loss = np.append(self._profit_loss, 0.0)
+            self._pl_percent = np.append(self._pl_percent, 0.0)
+            self._dirty = np.append(self._dirty, False)
+            self._snapshot = None
+            row = self._row(len(self._ids) - 1)
+        for callback in self._listeners:
+            callback([row])
+        if self._ws is not None and self._ws.sock is not None:
+            self._ws.send(json.dumps({"action": "subscribe", "trades": [symbol]}))
+
+    def update_price(self, symbol: str, price: float) -> None:
+        """Record the latest traded price for a symbol"""
+        with self._lock:
+            self._prices[self._symbol_code(symbol)] = price
+
+    def handle_stream_message(self, message: str) -> None:
+        """Feed a raw Alpaca data stream message (as received by webSocket.py) into the price map"""
+        for event in json.loads(message):
+            if event.get('T') == 't':
+                self.update_price(event['S'], event['p'])
+
+    def add_listener(self, callback) -> None:
+        """Register callback(changed_rows) to be called after a revaluation changes positions"""
+        self._listeners.append(callback)
+
+    def revalue(self) -> int:
+        """Recompute value and P&L for every position in one vectorized pass"""
+        with self._lock:
+            if not len(self._ids):
+                return 0
+            prices = self._prices[self._symbol_codes]
+            current = np.where(np.isnan(prices), self._current, prices)
+            # Rows without a quantity (added by hand) are valued per share
+            profit_loss = (current - self._entry) * self._quantity
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pl_percent = np.where(self._entry != 0,
+                                      (current - self._entry) / self._entry * np.sign(self._quantity) * 100, 0.0)
+
+            # Compare at the precision the table stores so ticks below a cent aren't written
+            changed = np.round(current, 2) != np.round(self._current, 2)
+            self._current = current
+            self._profit_loss = profit_loss
+            self._pl_percent = pl_percent
+            if changed.any():
+                self._dirty |= changed
+                self._snapshot = None
+            changed_rows = [self._row(i) for i in np.flatnonzero(changed)]
+
+        if changed_rows:
+            for callback in self._listeners:
+                callback(changed_rows)
+        return len(changed_rows)
+
+    def _row(self, i: int) -> Dict:
+        return {
+            "id": int(self._ids[i]),
+            "symbol": self._symbols[i],
+            "entry": round(float(self._entry[i]), 2),
+            "quantity": float(self._quantity[i]),
+            "current_value": round(float(self._current[i]), 2),
+            "profit_loss": round(float(self._profit_loss[i]), 2),
+            "pl_percent": round(float(self._pl_percent[i]), 2),
+        }
+
+    def snapshot(self) -> List[Dict]:
+        """Return the current valuation of every position without touching the database"""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = [self._row(i) for i in range(len(self._ids))]
+            return self._snapshot
+
+    def flush(self, force: bool = False) -> int:
+        """Write changed positions back to current_positions in a single batched UPDATE"""
+        with self._lock:
+            if not force and time.monotonic() - self._last_flush < self.flush_interval:
+                return 0
+            dirty = np.flatnonzero(self._dirty)
+            rows = [
+                (int(self._ids[i]), round(float(self._current[i]), 2),
+                 round(float(self._profit_loss[i]), 2), round(float(self._pl_percent[i]), 2))
+                for i in dirty
+            ]
+            self._dirty[dirty] = False
+            self._last_flush = time.monotonic()
+        if not rows:
+            return 0
+
+        try:
+            conn = psycopg2.connect(**self.db_params)
+            try:
+                with conn.cursor() as cursor:
+                    execute_values(cursor, """
+                        UPDATE current_positions AS c
+                        SET current_value = v.current_value,
+                            profit_loss = v.profit_loss,
+                            pl_percent = v.pl_percent
+                        FROM (VALUES %s) AS v(id, current_value, profit_loss, pl_percent)
+                        WHERE c.id = v.id
+                    """, rows)
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Error writing position valuations: {e}")
+            with self._lock:
+                ids = {row[0] for row in rows}
+                self._dirty |= np.isin(self._ids, list(ids))
+            return 0
+        return len(rows)
+
+    def start(self, stream: bool = True) -> None:
+        """Load positions and run the revalue/flush loop (and optionally the trade stream) in the background"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.load_positions()
+            self.load_latest_bars()
+            self.revalue()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        if stream and os.getenv('APCA_API_KEY_ID'):
+            threading.Thread(target=self._run_stream, daemon=True).start()
+
+    def poll_prices(self) -> None:
+        """Refresh every tracked symbol from the price service in one batched lookup"""
+        with self._lock:
+            symbols = list(self._symbol_index)
+        for symbol, quote in self.price_service.get_prices(symbols).items():
+            if quote.get("price") is not None:
+                self.update_price(symbol, quote["price"])
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(1.0)
+            try:
+                streaming = self._ws is not None and self._ws.sock is not None
+                if (self.price_service is not None and not streaming
+                        and time.monotonic() - self._last_poll >= self.poll_interval):
+                    self._last_poll = time.monotonic()
+                    self.poll_prices()
+                self.revalue()
+                self.flush()
+            except Exception as e:
+                print(f"Error revaluing portfolio: {e}")
+
+    def _run_stream(self) -> None:
+        import websocket
+
+        def on_open(ws):
+            ws.send(json.dumps({
+                "action": "auth",
+                "key": os.getenv('APCA_API_KEY_ID'),
+                "secret": os.getenv('APCA_API_SECRET_KEY')
+            }))
+            with self._lock:
+                symbols = sorted(set(self._symbols))
+            ws.send(json.dumps({"action": "subscribe", "trades": symbols}))
+
+        self._ws = ws = websocket.WebSocketApp(
+            os.getenv('APCA_STREAM_URL', DATA_STREAM_URL),
+            on_open=on_open,
+            on_message=lambda ws, message: self.handle_stream_message(message),
+            on_error=lambda ws, error: print(f"Price stream error: {error}")
+        )
+        ws.run_forever(reconnect=5)
@@ -0,0 +1,157 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backtest_metrics import bar_periods_per_year
+
+# Upper bound on resample-matrix elements materialized at once per process
+MAX_BATCH_ELEMENTS = 4_000_000
+
+
+def trade_returns(trades: List[Dict]) -> np.ndarray:
+    """
+    Per-trade P&L fractions from a backtest's self.trades list
+
+    Exit records store the raw price return; closing a short (a 'buy' exit)
+    earns its negative.
+    """
+    return np.array([
+        trade['returns'] if trade['type'] == 'sell' else -trade['returns']
+        for trade in trades if 'returns' in trade
+    ], dtype=float)
+
+
+def _path_stats(returns: np.ndarray, periods_per_year: float) -> Dict[str, np.ndarray]:
+    """Sharpe, max drawdown and total return for each row of a (resamples, periods) matrix"""
+    equity = np.cumprod(1 + returns, axis=1)
+    running_max = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.sqrt(periods_per_year) * returns.mean(axis=1) / returns.std(axis=1, ddof=1)
+    return {
+        'sharpe_ratio': sharpe,
+        'max_drawdown': np.max(1 - equity / running_max, axis=1),
+        'total_return': equity[:, -1] - 1,
+    }
+
+
+def _resample_indices(rng: np.random.Generator, n: int, n_resamples: int,
+                      block_size: Optional[int], permute: bool) -> np.ndarray:
+    if permute:
+        return rng.permuted(np.broadcast_to(np.arange(n), (n_resamples, n)), axis=1)
+    if not block_size or block_size <= 1:
+        return rng.integers(0, n, size=(n_resamples, n))
+    # Circular block bootstrap: whole runs of consecutive periods keep autocorrelation
+    n_blocks = -(-n // block_size)
+    starts = rng.integers(0, n, size=(n_resamples, n_blocks, 1))
+    idx = (starts + np.arange(block_size)) % n
+    return idx.reshape(n_resamples, -1)[:, :n]
+
+
+def _resample_batch(returns: np.ndarray, n_resamples: int, block_size: Optional[int], permute: bool,
+                    periods_per_year: float, seed) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    batch = max(1, MAX_BATCH_ELEMENTS // max(len(returns), 1))
+    parts = []
+    for start in range(0, n_resamples, batch):
+        size = min(batch, n_resamples - start)
+        idx = _resample_indices(rng, len(returns), size, block_size, permute)
+        parts.append(_path_stats(returns[idx], periods_per_year))
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def resample(returns: Sequence[float],
+             n_resamples: int = 10_000,
+             block_size: Optional[int] = None,
+             permute: bool = False,
+             periods_per_year: Optional[float] = None,
+             seed: Optional[int] = None,
+             n_jobs: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Distribution of Sharpe, max drawdown and total return over resampled return paths
+
+    Args:
+        returns: Per-period returns (e.g. Strategy_Returns) or per-trade returns (see trade_returns)
+        n_resamples: Number of resampled paths
+        block_size: Block length for a circular block bootstrap (None = i.i.d. bootstrap)
+        permute: Reorder the original returns instead of sampling with replacement;
+            total return is unchanged but drawdown reflects path risk
+        periods_per_year: Annualization factor for the Sharpe ratio, i.e. returns per year
+            (required; see backtest_metrics.bar_periods_per_year, or 1 to leave it unannualized)
+        seed: Seed for reproducible results
+        n_jobs: Worker processes; resamples are split evenly with independent seeds
+    """
+    if periods_per_year is None:
+        raise ValueError("periods_per_year is required")
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[~np.isnan(returns)]
+    if len(returns) < 2:
+        raise ValueError("At least two returns are needed to resample")
+
+    seeds = np.random.SeedSequence(seed).spawn(max(n_jobs, 1))
+    if n_jobs <= 1:
+        return _resample_batch(returns, n_resamples, block_size, permute, periods_per_year, seeds[0])
+
+    sizes = [n_resamples // n_jobs + (i < n_resamples % n_jobs) for i in range(n_jobs)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [
+            pool.submit(_resample_batch, returns, size, block_size, permute, periods_per_year, s)
+            for size, s in zip(sizes, seeds) if size
+        ]
+        parts = [f.result() for f in futures]
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def confidence_intervals(samples: Dict[str, np.ndarray], confidence: float = 0.95) -> Dict[str, Dict[str, float]]:
+    """Percentile confidence interval and median for each resampled statistic"""
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name, values in samples.items():
+        values = values[np.isfinite(values)]
+        if not len(values):
+            intervals[name] = {'lower': np.nan, 'median': np.nan, 'upper': np.nan}
+            continue
+        lower, median, upper = np.percentile(values, [tail, 50, 100 - tail])
+        intervals[name] = {'lower': float(lower), 'median': float(median), 'upper': float(upper)}
+    return intervals
+
+
+def robustness_report(strategy_returns: Sequence[float],
+                      trades: List[Dict],
+                      timestamps=None,
+                      n_resamples: int = 10_000,
+                      block_size: Optional[int] = None,
+                      periods_per_year: Optional[float] = None,
+                      confidence: float = 0.95,
+                      seed: Optional[int] = None,
+                      n_jobs: int = 1) -> Dict[str, Dict]:
+    """
+    Confidence intervals from bar-return bootstrap, trade bootstrap and trade-order permutation
+
+    Args:
+        strategy_returns: The Strategy_Returns column of a finished backtest
+        trades: The backtest's self.trades list
+        timestamps: The backtest's timestamp column; the bar Sharpe is annualized with the
+            bar frequency observed over it, as in the backtest's own metrics
+        periods_per_year: Annualization factor to use instead of deriving it from timestamps
+    """
+    if periods_per_year is None:
+        if timestamps is None:
+            raise ValueError("Either timestamps or periods_per_year is required")
+        periods_per_year = bar_periods_per_year(timestamps)
+    report = {
+        'bar_bootstrap': confidence_intervals(
+            resample(strategy_returns, n_resamples, block_size, False, periods_per_year, seed, n_jobs),
+            confidence
+        )
+    }
+    per_trade = trade_returns(trades)
+    if len(per_trade) >= 2:
+        # Trades have no fixed period, so their Sharpe is left unannualized
+        report['trade_bootstrap'] = confidence_intervals(
+            resample(per_trade, n_resamples, None, False, 1, seed, n_jobs), confidence
+        )
+        report['trade_permutation'] = confidence_intervals(
+            resample(per_trade, n_resamples, None, True, 1, seed, n_jobs), confidence
+        )
+    return report
@@ -0,0 +1,365 @@
+import inspect
+import json
+import select
+import threading
+import time
+from typing import Callable, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+
+# Daily rollup of trading_info, so a screen reads one row per symbol and day
+# instead of every minute bar
+DAILY_BARS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_bars (
+        symbol VARCHAR NOT NULL,
+        day DATE NOT NULL,
+        open_price DOUBLE PRECISION NOT NULL,
+        high_price DOUBLE PRECISION NOT NULL,
+        low_price DOUBLE PRECISION NOT NULL,
+        close_price DOUBLE PRECISION NOT NULL,
+        volume DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (symbol, day)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_daily_bars_day ON daily_bars (day)",
+]
+
+# Days from `since` are (re)aggregated, for one symbol or all of them
+_REFRESH_SQL = """
+    INSERT INTO daily_bars (symbol, day, open_price, high_price, low_price, close_price, volume)
+    SELECT symbol, timestamp::date,
+           (array_agg(open_price ORDER BY timestamp))[1],
+           max(high_price), min(low_price),
+           (array_agg(close_price ORDER BY timestamp DESC))[1],
+           sum(volume)
+    FROM trading_info
+    WHERE timestamp >= %s AND symbol = COALESCE(%s, symbol)
+    GROUP BY symbol, timestamp::date
+    ON CONFLICT (symbol, day) DO UPDATE SET
+        open_price = EXCLUDED.open_price, high_price = EXCLUDED.high_price,
+        low_price = EXCLUDED.low_price, close_price = EXCLUDED.close_price,
+        volume = EXCLUDED.volume
+"""
+
+
+class BarMatrix(NamedTuple):
+    """Daily bars as symbol x day matrices; NaN where a symbol has no bar that day"""
+    symbols: np.ndarray
+    days: np.ndarray  # datetime64[D], ascending
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    volume: np.ndarray
+
+
+def refresh_daily_bars(conn, since=None, symbol: Optional[str] = None):
+    """
+    Roll trading_info up into daily_bars from `since` (default: the last rolled-up day)
+
+    Returns the day the rollup started from.
+    """
+    with conn.cursor() as cursor:
+        if since is None:
+            cursor.execute("SELECT max(day) FROM daily_bars")
+            since = cursor.fetchone()[0] or '1970-01-01'
+        cursor.execute(_REFRESH_SQL, (since, symbol))
+    conn.commit()
+    return since
+
+
+def _note_stale_day(stale: Dict[str, str], channel: str, payload: str) -> None:
+    """Record the earliest day a bars_changed or bar notification reports bars for, per symbol"""
+    message = json.loads(payload)
+    day = str(message['start'] if channel == 'bars_changed' else message['timestamp'])[:10]
+    symbol = message['symbol']
+    if symbol not in stale or day < stale[symbol]:
+        stale[symbol] = day
+
+
+def run_daily_rollup(db_params: Dict[str, str], interval: float = 60.0) -> None:
+    """
+    Keep daily_bars current by rolling up new minute bars every `interval` seconds (blocks)
+
+    Only the days from the last rolled-up one are re-aggregated on every
+    pass. Bars stored for earlier days (back-fills, loads of older ranges,
+    late live bars) are announced on the bars_changed and bar channels, and
+    their symbol is re-aggregated from that day on the next pass.
+    """
+    stale: Dict[str, str] = {}
+    while True:
+        listener = conn = None
+        try:
+            listener = psycopg2.connect(**db_params)
+            listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with listener.cursor() as cursor:
+                cursor.execute('LISTEN "bars_changed"')
+                cursor.execute('LISTEN "bar"')
+            conn = psycopg2.connect(**db_params)
+            while True:
+                since = str(refresh_daily_bars(conn))
+                for symbol, day in list(stale.items()):
+                    if day < since:
+                        refresh_daily_bars(conn, day, symbol)
+                    del stale[symbol]
+                deadline = time.monotonic() + interval
+                while (remaining := deadline - time.monotonic()) > 0:
+                    if select.select([listener], [], [], remaining) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        notify = listener.notifies.pop(0)
+                        try:
+                            _note_stale_day(stale, notify.channel, notify.payload)
+                        except (ValueError, KeyError, TypeError) as e:
+                            print(f"Ignoring {notify.channel} notification: {e}")
+        except Exception as e:
+            print(f"Daily bar rollup failed: {e}")
+            time.sleep(interval)
+        finally:
+            for c in (listener, conn):
+                if c is not None:
+                    c.close()
+
+
+def start_daily_rollup(db_params: Dict[str, str], interval: float = 60.0):
+    """
+    Run run_daily_rollup in a child process, the single owner of the rollup; returns the process
+
+    Started once by the server (gunicorn.conf.py), so workers' screeners only read daily_bars.
+    """
+    import multiprocessing
+
+    ctx = multiprocessing.get_context('spawn')
+    process = ctx.Process(target=run_daily_rollup, args=(db_params, interval),
+                          name='daily-rollup', daemon=True)
+    process.start()
+    return process
+
+
+def load_matrix(db_params: Dict[str, str], lookback_days: int = 120, refresh: bool = False) -> BarMatrix:
+    """Read the last lookback_days trading days of the available_stock universe into a BarMatrix"""
+    conn = psycopg2.connect(**db_params)
+    try:
+        if refresh:
+            refresh_daily_bars(conn)
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT d.symbol, d.day, d.close_price, d.high_price, d.low_price, d.volume
+                FROM daily_bars d
+                JOIN available_stock s ON s.symbol = d.symbol
+                WHERE d.day >= (
+                    SELECT min(day) FROM (
+                        SELECT DISTINCT day FROM daily_bars ORDER BY day DESC LIMIT %s
+                    ) recent
+                )
+            """, (lookback_days,))
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        empty = np.empty((0, 0))
+        return BarMatrix(np.array([], dtype=object), np.array([], dtype='datetime64[D]'),
+                         empty, empty, empty, empty)
+    symbol_col, day_col, *value_cols = zip(*rows)
+    symbols, row = np.unique(np.array(symbol_col, dtype=object), return_inverse=True)
+    days, col = np.unique(np.array(day_col, dtype='datetime64[D]'), return_inverse=True)
+    matrices = []
+    for values in value_cols:
+        m = np.full((len(symbols), len(days)), np.nan)
+        m[row, col] = np.asarray(values, dtype=np.float64)
+        matrices.append(m)
+    return BarMatrix(symbols, days, *matrices)
+
+
+def _window_stats(x: np.ndarray, window: int, end: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and sample std per symbol over the `window` days ending `end` days
+    before the last; NaN for symbols missing a day in the window
+    """
+    stop = x.shape[1] - end
+    if stop - window < 0:
+        missing = np.full(x.shape[0], np.nan)
+        return missing, missing
+    block = x[:, stop - window:stop]
+    return block.mean(axis=1), block.std(axis=1, ddof=1)
+
+
+def screen_below_lower_band(m: BarMatrix, window: int = 20, num_std: float = 2.0):
+    """Last close below the lower Bollinger band; score is the depth below it in std units"""
+    mean, std = _window_stats(m.close, window)
+    lower = mean - num_std * std
+    close = m.close[:, -1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return close < lower, (lower - close) / std
+
+
+def screen_above_upper_band(m: BarMatrix, window: int = 20, num_std: float = 2.0):
+    """Last close above the upper Bollinger band; score is the height above it in std units"""
+    mean, std = _window_stats(m.close, window)
+    upper = mean + num_std * std
+    close = m.close[:, -1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return close > upper, (close - upper) / std
+
+
+def _crossover(m: BarMatrix, fast_window: int, slow_window: int, direction: int):
+    fast_now, _ = _window_stats(m.close, fast_window)
+    slow_now, _ = _window_stats(m.close, slow_window)
+    fast_prev, _ = _window_stats(m.close, fast_window, end=1)
+    slow_prev, _ = _window_stats(m.close, slow_window, end=1)
+    spread_now = direction * (fast_now - slow_now)
+    spread_prev = direction * (fast_prev - slow_prev)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (spread_now > 0) & (spread_prev <= 0), spread_now / slow_now
+
+
+def screen_ma_cross_up(m: BarMatrix, fast_window: int = 10, slow_window: int = 30):
+    """Fast MA crossed above the slow MA on the last day; score is the relative spread"""
+    return _crossover(m, fast_window, slow_window, 1)
+
+
+def screen_ma_cross_down(m: BarMatrix, fast_window: int = 10, slow_window: int = 30):
+    """Fast MA crossed below the slow MA on the last day; score is the relative spread"""
+    return _crossover(m, fast_window, slow_window, -1)
+
+
+def screen_volume_spike(m: BarMatrix, window: int = 20, ratio: float = 2.0):
+    """Last day's volume at least `ratio` times its average over the previous window; score is the ratio"""
+    mean, _ = _window_stats(m.volume, window, end=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = m.volume[:, -1] / mean
+    return score >= ratio, score
+
+
+# name -> fn(matrix, **params) returning (match mask, score) per symbol; higher scores rank first
+SCREENS: Dict[str, Callable[..., Tuple[np.ndarray, np.ndarray]]] = {
+    'below_lower_band': screen_below_lower_band,
+    'above_upper_band': screen_above_upper_band,
+    'ma_cross_up': screen_ma_cross_up,
+    'ma_cross_down': screen_ma_cross_down,
+    'volume_spike': screen_volume_spike,
+}
+
+
+def screen_params(name: str, args: Mapping[str, str]) -> Dict:
+    """Pick the parameters of screen `name` out of args, converted to the types of their defaults"""
+    params = {}
+    for param in list(inspect.signature(SCREENS[name]).parameters.values())[1:]:
+        if param.name in args:
+            params[param.name] = type(param.default)(args[param.name])
+    return params
+
+
+class Screener:
+    def __init__(self, db_params: Dict[str, str], lookback_days: int = 120, ttl: float = 60.0):
+        """
+        Cross-sectional screens over the whole symbol universe
+
+        The daily bar matrix is held in memory and re-read at most every
+        `ttl` seconds, so screens themselves are a few vectorized passes over
+        it. daily_bars is kept current by one rollup owner (start_daily_rollup),
+        not by the screeners.
+
+        Args:
+            db_params: Database connection parameters
+            lookback_days: Trading days kept in the matrix; bounds the longest window
+            ttl: Seconds before the matrix is refreshed from the database
+        """
+        self.db_params = db_params
+        self.lookback_days = lookback_days
+        self.ttl = ttl
+        self._matrix: Optional[BarMatrix] = None
+        self._loaded_at = 0.0
+        self._loading = False
+        self._cond = threading.Condition()
+
+    def matrix(self) -> BarMatrix:
+        """
+        The current bar matrix
+
+        One thread reloads an expired matrix outside the lock while the others
+        keep being served the previous one; only the very first load is waited for.
+        """
+        with self._cond:
+            while True:
+                if self._matrix is not None and (self._loading or time.monotonic() - self._loaded_at <= self.ttl):
+                    return self._matrix
+                if not self._loading:
+                    self._loading = True
+                    break
+                self._cond.wait()
+        try:
+            matrix = load_matrix(self.db_params, self.lookback_days)
+        except BaseException:
+            with self._cond:
+                self._loading = False
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._matrix = matrix
+            self._loaded_at = time.monotonic()
+            self._loading = False
+            self._cond.notify_all()
+        return matrix
+
+    def run(self, screens: Sequence[Tuple[str, Dict]], limit: int = 50) -> Dict:
+        """
+        Symbols matching every screen, ranked by the first screen's score
+
+        Args:
+            screens: (name in SCREENS, keyword parameters) pairs
+            limit: Maximum number of matches returned
+        """
+        m = self.matrix()
+        if not len(m.days) or not screens:
+            return {"as_of": None, "universe": len(m.symbols), "matches": []}
+        match = np.ones(len(m.symbols), dtype=bool)
+        scores = {}
+        for name, params in screens:
+            hit, score = SCREENS[name](m, **params)
+            match &= hit
+            scores[name] = score
+        rank_by = scores[screens[0][0]]
+        idx = np.flatnonzero(match)
+        idx = idx[np.argsort(-rank_by[idx], kind='stable')][:limit]
+        return {
+            "as_of": str(m.days[-1]),
+            "universe": len(m.symbols),
+            "count": int(match.sum()),
+            "matches": [
+                {
+                    "symbol": m.symbols[i],
+                    "close_price": float(m.close[i, -1]),
+                    "volume": float(m.volume[i, -1]),
+                    "scores": {name: round(float(score[i]), 4) for name, score in scores.items()}
+                }
+                for i in idx
+            ]
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Roll trading_info up into daily_bars for the screener")
+    parser.add_argument('--every', type=float, help="Keep refreshing every N seconds instead of once")
+    args = parser.parse_args()
+
+    db_params = {
+        "host": "localhost",
+        "port": 5432,
+        "database": "alpaca_data",
+        "user": "postgres",
+        "password": "secretpass"
+    }
+    if args.every:
+        run_daily_rollup(db_params, args.every)
+    else:
+        conn = psycopg2.connect(**db_params)
+        try:
+            refresh_daily_bars(conn)
+        finally:
+            conn.close()
@@ -0,0 +1,305 @@
+import hashlib
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+BARS_QUERY = """
+    SELECT timestamp, close_price, volume
+    FROM trading_info
+    WHERE symbol = %s
+    AND timestamp BETWEEN %s AND %s
+    ORDER BY timestamp ASC
+"""
+BAR_COLUMNS = ('timestamp', 'close_price', 'volume')
+
+# RAM-backed on Linux, so the column files are shared memory that happens to have a path
+DEFAULT_SEGMENT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class BarServer:
+    def __init__(self, db_params: Dict[str, str], max_bytes: int = 1024 * 2**20,
+                 segment_dir: Optional[str] = None):
+        """
+        Load bars from trading_info once per (symbol, start, end) and publish them as memory-mapped columns
+
+        Each range is written as one .npy file per column under a fresh
+        directory; workers map them read-only, so any number of processes
+        share one physical copy. Evicting or invalidating a range only
+        unlinks its files: workers that already mapped them keep valid views
+        and the memory is released when the last of them lets go.
+
+        Args:
+            db_params: Database connection parameters
+            max_bytes: Budget for published columns; least recently used ranges are removed beyond it
+            segment_dir: Parent directory for the column files (defaults to /dev/shm)
+        """
+        self.db_params = db_params
+        self.max_bytes = max_bytes
+        self.root = tempfile.mkdtemp(prefix='bars-', dir=segment_dir or DEFAULT_SEGMENT_DIR)
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._segments: 'OrderedDict[Tuple[str, str, str], Dict]' = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, str], Future] = {}
+        self._bytes = 0
+        self._counter = itertools.count()
+
+    def acquire(self, symbol: str, start_date: str, end_date: str) -> Dict:
+        """
+        Descriptor of the published bars for a range, loading them on first request
+
+        Concurrent requests for a range that is still loading wait for that load.
+        Returns {'path', 'rows', 'columns'} for attach_bars.
+        """
+        key = (symbol, str(start_date), str(end_date))
+        with self._lock:
+            segment = self._segments.get(key)
+            if segment is not None:
+                self._segments.move_to_end(key)
+                return segment
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if owner:
+            try:
+                segment = self._publish(key)
+                with self._lock:
+                    self.loads += 1
+                    self._segments[key] = segment
+                    self._bytes += segment['nbytes']
+                    while self._bytes > self.max_bytes and len(self._segments) > 1:
+                        self._remove(self._segments.popitem(last=False)[1])
+                future.set_result(segment)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        return future.result()
+
+    def invalidate(self, symbol: Optional[str] = None, at=None) -> int:
+        """
+        Drop the published ranges of symbol (or all of them) after its bars changed; returns how many
+
+        Args:
+            symbol: Symbol whose bars changed, or None for every symbol
+            at: Time of a single bar that was added; only ranges containing it are dropped
+        """
+        at = None if at is None else np.datetime64(at, 'ns')
+        with self._lock:
+            keys = [k for k in self._segments
+                    if (symbol is None or k[0] == symbol) and (at is None or _contains(k, at))]
+            for key in keys:
+                self._remove(self._segments.pop(key))
+        return len(keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'ranges': len(self._segments), 'bytes': self._bytes, 'loads': self.loads}
+
+    def close(self) -> None:
+        """Remove every published file"""
+        with self._lock:
+            self._segments.clear()
+            self._bytes = 0
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _publish(self, key: Tuple[str, str, str]) -> Dict:
+        import pandas as pd
+        import psycopg2
+
+        conn = psycopg2.connect(**self.db_params)
+        try:
+            df = pd.read_sql_query(BARS_QUERY, conn, params=key)
+        finally:
+            conn.close()
+
+        # A new directory per load, so a reload never overwrites files a worker has mapped
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        path = os.path.join(self.root, f"{name}-{next(self._counter)}")
+        tmp = f"{path}.tmp"
+        os.makedirs(tmp)
+        columns, nbytes = [], 0
+        for column in BAR_COLUMNS:
+            values = df[column].to_numpy()
+            if values.dtype == object:
+                values = values.astype(np.float64)
+            np.save(os.path.join(tmp, f"{column}.npy"), np.ascontiguousarray(values))
+            columns.append(column)
+            nbytes += values.nbytes
+        os.rename(tmp, path)  # Workers never see a partly written range
+        return {'path': path, 'rows': len(df), 'columns': columns, 'nbytes': nbytes}
+
+    def _remove(self, segment: Dict) -> None:
+        self._bytes -= segment['nbytes']
+        shutil.rmtree(segment['path'], ignore_errors=True)
+
+
+def _contains(key: Tuple[str, str, str], at: np.datetime64) -> bool:
+    try:
+        return np.datetime64(key[1], 'ns') <= at <= np.datetime64(key[2], 'ns')
+    except ValueError:
+        return True  # Bounds numpy cannot parse; drop the range rather than risk serving it stale
+
+
+def attach_bars(segment: Dict):
+    """
+    DataFrame over a BarServer descriptor whose columns are read-only views of the mapped files
+
+    Nothing is copied. Adding columns (indicators, signals) works as usual;
+    writing into a bar column raises, so replace the column instead.
+    """
+    import pandas as pd
+
+    data = {}
+    for column in segment['columns']:
+        mapped = np.load(os.path.join(segment['path'], f"{column}.npy"), mmap_mode='r')
+        data[column] = mapped.view(np.ndarray)
+    return pd.DataFrame(data, columns=segment['columns'], copy=False)
+
+
+def _bar_manager():
+    from multiprocessing.managers import BaseManager
+
+    class BarManager(BaseManager):
+        pass
+
+    return BarManager
+
+
+def serve_bars(db_params: Dict[str, str], address: Tuple[str, int], authkey: bytes,
+               max_bytes: int = 1024 * 2**20, segment_dir: Optional[str] = None, ready=None) -> None:
+    """Run a BarServer behind a multiprocessing manager until interrupted (blocks)"""
+    server = BarServer(db_params, max_bytes, segment_dir)
+    manager_cls = _bar_manager()
+    manager_cls.register('bars', callable=lambda: server)
+    manager = manager_cls(address=address, authkey=authkey).get_server()
+    if ready is not None:
+        ready.put(manager.address)
+    try:
+        manager.serve_forever()
+    finally:
+        server.close()
+
+
+def start_bar_server(db_params: Dict[str, str], address: Tuple[str, int] = ('127.0.0.1', 0),
+                     authkey: Optional[bytes] = None, max_bytes: int = 1024 * 2**20):
+    """
+    Start the data server in a child process; returns (process, address, authkey)
+
+    Port 0 picks a free port. Point workers at it with BAR_SERVER=host:port
+    and BAR_SERVER_KEY=<authkey hex>, or a SharedBarClient.
+    """
+    import multiprocessing
+
+    authkey = authkey or os.urandom(16)
+    ctx = multiprocessing.get_context('spawn')
+    ready = ctx.Queue()
+    process = ctx.Process(target=serve_bars, args=(db_params, address, authkey, max_bytes, None, ready),
+                          name='bar-server', daemon=True)
+    process.start()
+    return process, ready.get(timeout=30), authkey
+
+
+class SharedBarClient:
+    def __init__(self, address: Tuple[str, int], authkey: bytes):
+        """Worker-side connection to a data server started by serve_bars or start_bar_server"""
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _proxy(self):
+        # Proxies are not thread safe, so each thread opens its own connection
+        proxy = getattr(self._local, 'proxy', None)
+        if proxy is None:
+            manager_cls = _bar_manager()
+            manager_cls.register('bars')
+            manager = manager_cls(address=self.address, authkey=self.authkey)
+            manager.connect()
+            proxy = self._local.proxy = manager.bars()
+        return proxy
+
+    def bars(self, symbol: str, start_date: str, end_date: str):
+        """Bars for the range as a zero-copy DataFrame (see attach_bars)"""
+        return attach_bars(self._proxy().acquire(symbol, start_date, end_date))
+
+    def invalidate(self, symbol: Optional[str] = None, at=None) -> int:
+        return self._proxy().invalidate(symbol, None if at is None else str(at))
+
+    def stats(self) -> Dict:
+        return self._proxy().stats()
+
+
+_client: Optional[SharedBarClient] = None
+
+
+def bar_client() -> Optional[SharedBarClient]:
+    """Client for the server in BAR_SERVER (host:port) / BAR_SERVER_KEY (hex), or None if unset"""
+    global _client
+    address = os.getenv('BAR_SERVER')
+    if not address:
+        return None
+    if _client is None or _client.address != _parse_address(address):
+        _client = SharedBarClient(_parse_address(address), bytes.fromhex(os.getenv('BAR_SERVER_KEY', '')))
+    return _client
+
+
+def _parse_address(address: str) -> Tuple[str, int]:
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def fetch_shared_bars(symbol: str, start_date: str, end_date: str):
+    """Bars from the configured data server, or None to fall back to the database"""
+    client = bar_client()
+    if client is None:
+        return None
+    try:
+        return client.bars(symbol, start_date, end_date)
+    except Exception as e:
+        print(f"Shared bar server unavailable, reading the database: {e}")
+        return None
+
+
+
+def invalidate_shared_bars(symbol: Optional[str] = None, at=None) -> int:
+    """Drop the configured data server's ranges of symbol (see BarServer.invalidate); 0 if there is none"""
+    client = bar_client()
+    if client is None:
+        return 0
+    try:
+        return client.invalidate(symbol, at)
+    except Exception as e:
+        print(f"Could not invalidate shared bars of {symbol}: {e}")
+        return 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve trading_info bars to backtest workers through shared memory")
+    parser.add_argument('--address', default=os.getenv('BAR_SERVER', '127.0.0.1:50055'), help="host:port to listen on")
+    parser.add_argument('--max-mb', type=int, default=1024, help="Memory budget for published bars")
+    args = parser.parse_args()
+
+    key = os.getenv('BAR_SERVER_KEY')
+    if not key:
+        key = os.urandom(16).hex()
+        print(f"BAR_SERVER_KEY={key}")
+    serve_bars(
+        {
+            "host": "localhost",
+            "port": 5432,
+            "database": "alpaca_data",
+            "user": "postgres",
+            "password": "secretpass"
+        },
+        _parse_address(args.address), bytes.fromhex(key), args.max_mb * 2**20
+    )
@@ -0,0 +1,263 @@
+import importlib.util
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+# Position rules understood by the kernels
+MODE_FLIP = 0       # Any non-zero signal different from the position closes it and opens that side
+MODE_LONG_ONLY = 1  # Positive signal opens a long when flat, negative signal closes it
+
+# Numba is optional (the NumPy path covers the default rules) and slow to import,
+# so it is only loaded for the first compiled run
+BACKEND = 'numba' if importlib.util.find_spec('numba') is not None else 'numpy'
+
+
+class SimulationResult(NamedTuple):
+    capital: np.ndarray           # Capital after each bar
+    strategy_returns: np.ndarray  # Bar return times the position held into the bar
+    position: np.ndarray          # Position held after each bar
+    event_index: np.ndarray       # Bar index of each entry/exit, in order
+    event_price: np.ndarray       # Fill price including slippage
+    event_returns: np.ndarray     # Price return of the closed trade (NaN for entries)
+    event_is_exit: np.ndarray
+    event_side: np.ndarray        # 1 long / -1 short, for the position opened or closed
+    state: Dict                   # position, entry_price, size, prev_close, capital after the last bar
+
+
+def _state_machine(close, signal, mode, position, entry_price, entry_size, prev_close, has_prev, capital,
+                   commission, slippage, size, stop_loss, take_profit):
+    """
+    Sequential per-bar position logic; compiled with Numba when available
+
+    commission, slippage and size are per-bar arrays (see simulate).
+    """
+    n = close.shape[0]
+    capital_out = np.empty(n)
+    strategy_returns = np.zeros(n)
+    position_out = np.empty(n, dtype=np.int8)
+    # At most an exit and an entry per bar
+    ev_index = np.empty(2 * n, dtype=np.int64)
+    ev_price = np.empty(2 * n)
+    ev_returns = np.empty(2 * n)
+    ev_is_exit = np.empty(2 * n, dtype=np.bool_)
+    ev_side = np.empty(2 * n, dtype=np.int8)
+    n_events = 0
+
+    for i in range(n):
+        price = close[i]
+        if not has_prev:
+            # First bar of the run only seeds the previous close
+            capital_out[i] = capital
+            position_out[i] = position
+            prev_close = price
+            has_prev = True
+            continue
+        bar_return = price / prev_close - 1
+        prev_close = price
+        # The bar's move is earned by the position held coming into it
+        if position != 0:
+            strategy_returns[i] = bar_return * position * entry_size
+
+        target = position
+        if position != 0 and (stop_loss > 0 or take_profit > 0):
+            unrealized = position * (price - entry_price) / entry_price
+            if (stop_loss > 0 and unrealized <= -stop_loss) or (take_profit > 0 and unrealized >= take_profit):
+                target = 0
+        if target == position:
+            s = signal[i]
+            if mode == MODE_FLIP:
+                if s != 0 and s == s and s != position:
+                    target = 1 if s > 0 else -1
+            else:
+                if s > 0 and position == 0:
+                    target = 1
+                elif s < 0 and position == 1:
+                    target = 0
+
+        if target != position:
+            if position != 0:
+                exit_price = price * (1 - slippage[i] * position)
+                returns = (exit_price - entry_price) / entry_price
+                capital *= (1 + returns * position * entry_size)
+                capital *= (1 - commission[i] * entry_size)
+                ev_index[n_events] = i
+                ev_price[n_events] = exit_price
+                ev_returns[n_events] = returns
+                ev_is_exit[n_events] = True
+                ev_side[n_events] = position
+                n_events += 1
+            if target != 0:
+                entry_price = price * (1 + slippage[i] * target)
+                entry_size = size[i]
+                capital *= (1 - commission[i] * entry_size)
+                ev_index[n_events] = i
+                ev_price[n_events] = entry_price
+                ev_returns[n_events] = np.nan
+                ev_is_exit[n_events] = False
+                ev_side[n_events] = target
+                n_events += 1
+            position = target
+
+        capital_out[i] = capital
+        position_out[i] = position
+
+    return (capital_out, strategy_returns, position_out, ev_index[:n_events], ev_price[:n_events],
+            ev_returns[:n_events], ev_is_exit[:n_events], ev_side[:n_events],
+            position, entry_price, entry_size, prev_close, capital)
+
+
+_compiled_state_machine = None
+
+
+def _compiled():
+    global _compiled_state_machine
+    if _compiled_state_machine is None:
+        from numba import njit
+        _compiled_state_machine = njit(cache=True, nogil=True)(_state_machine)
+    return _compiled_state_machine
+
+
+def _vectorized(close, signal, mode, position, entry_price, entry_size, prev_close, has_prev, capital,
+                commission, slippage, size):
+    """NumPy equivalent of _state_machine for rules without stops"""
+    n = len(close)
+    signal = np.array(signal, dtype=float)
+    if not has_prev:
+        signal[0] = np.nan  # The first bar of a run never trades
+    prev = np.concatenate(([prev_close if has_prev else np.nan], close[:-1]))
+    bar_returns = close / prev - 1
+
+    # The position held after each bar is the last actionable signal, forward filled
+    if mode == MODE_FLIP:
+        desired = np.where((signal != 0) & ~np.isnan(signal), np.sign(signal), np.nan)
+    else:
+        desired = np.where(signal > 0, 1.0, np.where(signal < 0, 0.0, np.nan))
+    idx = np.where(np.isnan(desired), -1, np.arange(n))
+    np.maximum.accumulate(idx, out=idx)
+    held = np.where(idx >= 0, desired[np.maximum(idx, 0)], position).astype(np.int8)
+
+    before = np.concatenate(([position], held[:-1])).astype(np.int8)
+    changes = np.flatnonzero(held != before)
+    exits = changes[before[changes] != 0]
+    entries = changes[held[changes] != 0]
+
+    entry_fills = close[entries] * (1 + slippage[entries] * held[entries])
+    exit_fills = close[exits] * (1 - slippage[exits] * before[exits])
+    entry_sizes = size[entries]
+    # Each exit closes the most recent entry before it (or the carried-in position)
+    opened_at = np.searchsorted(entries, exits, side='left') - 1
+    if len(entries):
+        exit_entry_price = np.where(opened_at >= 0, entry_fills[np.maximum(opened_at, 0)], entry_price)
+        exit_size = np.where(opened_at >= 0, entry_sizes[np.maximum(opened_at, 0)], entry_size)
+    else:
+        exit_entry_price = np.full(len(exits), entry_price)
+        exit_size = np.full(len(exits), entry_size)
+    exit_returns = (exit_fills - exit_entry_price) / exit_entry_price
+
+    # Size of the position held after each bar: that of the latest entry (or the carried-in one)
+    last_entry = np.searchsorted(entries, np.arange(n), side='right') - 1
+    if len(entries):
+        held_size = np.where(last_entry >= 0, entry_sizes[np.maximum(last_entry, 0)], entry_size)
+    else:
+        held_size = np.full(n, entry_size)
+    size_before = np.concatenate(([entry_size], held_size[:-1]))
+
+    # Capital changes multiplicatively at each exit (trade P&L) and every fill (commission);
+    # seeding cumprod with the starting capital keeps the multiplication order of the loop
+    factors = np.ones(n + 1)
+    factors[0] = capital
+    np.multiply.at(factors, exits + 1,
+                   (1 + exit_returns * before[exits] * exit_size) * (1 - commission[exits] * exit_size))
+    np.multiply.at(factors, entries + 1, 1 - commission[entries] * entry_sizes)
+    capital_out = np.cumprod(factors)[1:]
+
+    strategy_returns = np.where(before != 0, bar_returns * before * size_before, 0.0)
+    if not has_prev:
+        strategy_returns[0] = 0.0
+
+    ev_index = np.concatenate((exits, entries))
+    ev_is_exit = np.concatenate((np.ones(len(exits), bool), np.zeros(len(entries), bool)))
+    # Exits sort before entries on the same bar
+    order = np.lexsort((~ev_is_exit, ev_index))
+    ev_price = np.concatenate((exit_fills, entry_fills))[order]
+    ev_returns = np.concatenate((exit_returns, np.full(len(entries), np.nan)))[order]
+    ev_side = np.concatenate((before[exits], held[entries])).astype(np.int8)[order]
+
+    final_position = int(held[-1]) if n else position
+    final_entry = entry_fills[-1] if len(entries) else entry_price
+    final_size = entry_sizes[-1] if len(entries) else entry_size
+    return (capital_out, strategy_returns, held, ev_index[order], ev_price, ev_returns, ev_is_exit[order], ev_side,
+            final_position, final_entry, final_size, close[-1] if n else prev_close,
+            capital_out[-1] if n else capital)
+
+
+def simulate(close: np.ndarray,
+             signal: np.ndarray,
+             mode: int,
+             state: Optional[Dict] = None,
+             commission=0.0,
+             slippage=0.0,
+             stop_loss: float = 0.0,
+             take_profit: float = 0.0,
+             backend: Optional[str] = None,
+             size=1.0) -> SimulationResult:
+    """
+    Run the per-bar position state machine over plain arrays
+
+    Args:
+        close: Close prices
+        signal: Strategy signal per bar, interpreted according to mode (NaN = no signal)
+        mode: MODE_FLIP or MODE_LONG_ONLY
+        state: Carried state from a previous call (position, entry_price, size, prev_close, capital)
+        commission: Fraction of traded notional charged on a fill, scalar or per bar
+        slippage: Fraction of price paid on top of the close when entering (and given up
+            when exiting), scalar or per bar
+        stop_loss: Close the position once its unrealized loss reaches this fraction (0 = off)
+        take_profit: Close the position once its unrealized gain reaches this fraction (0 = off)
+        backend: 'numba' or 'numpy'; defaults to BACKEND
+        size: Fraction of capital committed by a position opened on the bar, scalar or per
+            bar; the position keeps it until it closes
+    """
+    state = state or {}
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    signal = np.ascontiguousarray(signal, dtype=np.float64)
+    position = int(state.get('position') or 0)
+    entry_price = float(state['entry_price']) if state.get('entry_price') is not None else np.nan
+    entry_size = float(state.get('size', 1.0))
+    prev_close = state.get('prev_close')
+    has_prev = prev_close is not None
+    capital = float(state['capital'])
+    backend = backend or BACKEND
+    commission, slippage, size = (
+        np.ascontiguousarray(np.broadcast_to(np.asarray(x, dtype=np.float64), close.shape))
+        for x in (commission, slippage, size)
+    )
+
+    if backend == 'numba':
+        if BACKEND != 'numba':
+            raise ImportError("numba is not installed")
+        out = _compiled()(close, signal, mode, position, entry_price, entry_size,
+                          float(prev_close) if has_prev else np.nan, has_prev, capital,
+                          commission, slippage, size, stop_loss, take_profit)
+    elif stop_loss > 0 or take_profit > 0:
+        # Stops depend on the path since entry, so without Numba run the loop on plain arrays
+        out = _state_machine(close, signal, mode, position, entry_price, entry_size,
+                             float(prev_close) if has_prev else np.nan, has_prev, capital,
+                             commission, slippage, size, stop_loss, take_profit)
+    else:
+        out = _vectorized(close, signal, mode, position, entry_price, entry_size,
+                          float(prev_close) if has_prev else np.nan, has_prev, capital,
+                          commission, slippage, size)
+
+    (capital_out, strategy_returns, held, ev_index, ev_price, ev_returns, ev_is_exit, ev_side,
+     position, entry_price, entry_size, prev_close, capital) = out
+    return SimulationResult(
+        capital_out, strategy_returns, held, ev_index, ev_price, ev_returns, ev_is_exit, ev_side,
+        {
+            'position': int(position),
+            'entry_price': None if np.isnan(entry_price) else float(entry_price),
+            'size': float(entry_size),
+            'prev_close': None if np.isnan(prev_close) else float(prev_close),
+            'capital': float(capital),
+        }
+    )
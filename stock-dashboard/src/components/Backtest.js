@@ -18,6 +18,9 @@ const Backtest = () => {
   const [results, setResults] = useState(null);
   const [error, setError] = useState(null);
   const [logs, setLogs] = useState([]);
+  const [logSummary, setLogSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [jobStatus, setJobStatus] = useState(null);
 
   const handleChange = (e) => {
     const { name, value } = e.target;
@@ -51,8 +54,7 @@ const Backtest = () => {
 
       const data = await response.json();
       if (data.success) {
-        setResults(data.results);
-        fetchLogs(); // Refresh logs after successful backtest
+        setResults(data.results); // New log rows arrive over the event stream
       } else {
         setError(data.error);
       }
@@ -61,11 +63,19 @@ const Backtest = () => {
     }
   };
 
-  const fetchLogs = async () => {
+  const fetchLogs = async (cursor = null) => {
     try {
-      const response = await fetch('http://localhost:4000/api/backtest/logs');
+      const url = cursor
+        ? `http://localhost:4000/api/backtest/logs?cursor=${encodeURIComponent(cursor)}`
+        : 'http://localhost:4000/api/backtest/logs';
+      const response = await fetch(url);
+      if (response.status === 304) {
+        return; // Logs unchanged since the last fetch
+      }
       const data = await response.json();
-      setLogs(data);
+      setLogs(cursor ? (prevLogs) => [...prevLogs, ...data.logs] : data.logs);
+      setLogSummary(data.summary);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error('Failed to fetch backtest logs:', err);
     }
@@ -73,6 +83,17 @@ const Backtest = () => {
 
   useEffect(() => {
     fetchLogs(); // Fetch logs when component mounts
+
+    // Server pushes new log rows and job progress instead of us refetching
+    const events = new EventSource('http://localhost:4000/api/events?topics=log,job');
+    events.addEventListener('log', (e) => {
+      const log = JSON.parse(e.data);
+      setLogs((prevLogs) =>
+        prevLogs.some((existing) => existing.id === log.id) ? prevLogs : [log, ...prevLogs]
+      );
+    });
+    events.addEventListener('job', (e) => setJobStatus(JSON.parse(e.data)));
+    return () => events.close();
   }, []);
 
   return (
@@ -177,6 +198,9 @@ const Backtest = () => {
           </div>
           <button type="submit" className="submit-button">Run Backtest</button>
         </form>
+        {jobStatus && jobStatus.status === 'running' && (
+          <p className="job-status">Running {jobStatus.strategy} backtest on {jobStatus.symbol}...</p>
+        )}
         {error && <p className="error-message">{error}</p>}
         {results && (
           <div className="results">
@@ -194,7 +218,11 @@ const Backtest = () => {
 
       {/* Logs Section */}
       <div className="logs-tile">
-        <BacktestLogs logs={logs} />
+        <BacktestLogs
+          logs={logs}
+          summary={logSummary}
+          onLoadMore={nextCursor ? () => fetchLogs(nextCursor) : null}
+        />
       </div>
     </div>
   );
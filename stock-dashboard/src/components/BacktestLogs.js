@@ -1,14 +1,22 @@
 import React from 'react';
 import './Backtest.css';
 
-const BacktestLogs = ({ logs }) => {
+const BacktestLogs = ({ logs, summary, onLoadMore }) => {
   return (
     <div className="logs-container">
       <h2>Historical Backtest Logs</h2>
+      {summary && (
+        <p className="logs-summary">
+          {summary.count} runs &middot; Best Sharpe: {summary.best_sharpe_ratio ?? 'N/A'} &middot;
+          Mean Return: {summary.mean_total_return ?? 'N/A'}%
+        </p>
+      )}
       <table className="logs-table">
         <thead>
           <tr>
             <th>ID</th>
+            <th>Strategy</th>
+            <th>Symbol</th>
             <th>Annual Return (%)</th>
             <th>Number of Trades</th>
             <th>Profit Factor</th>
@@ -22,6 +30,8 @@ const BacktestLogs = ({ logs }) => {
           {logs.map(log => (
             <tr key={log.id}>
               <td>{log.id}</td>
+              <td>{log.strategy ?? '-'}</td>
+              <td>{log.symbol ?? '-'}</td>
               <td>{log.annual_return}</td>
               <td>{log.number_of_trades}</td>
               <td>{log.profit_factor}</td>
@@ -33,6 +43,11 @@ const BacktestLogs = ({ logs }) => {
           ))}
         </tbody>
       </table>
+      {onLoadMore && (
+        <button type="button" className="submit-button" onClick={onLoadMore}>
+          Load More
+        </button>
+      )}
     </div>
   );
 };
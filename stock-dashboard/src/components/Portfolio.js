@@ -72,6 +72,18 @@ const CurrentPortfolio = () => {
 
   useEffect(() => {
     fetchPortfolio();
+
+    // Merge pushed position updates instead of refetching the whole portfolio
+    const events = new EventSource("http://localhost:4000/api/events?topics=positions");
+    events.addEventListener("positions", (e) => {
+      const changed = JSON.parse(e.data);
+      setPortfolio((prevPortfolio) => {
+        const byId = new Map(prevPortfolio.map((position) => [position.id, position]));
+        changed.forEach((position) => byId.set(position.id, position));
+        return Array.from(byId.values());
+      });
+    });
+    return () => events.close();
   }, []);
 
   return (
@@ -120,36 +132,33 @@ const CurrentPortfolio = () => {
 };
 
 const App = () => {
-  const [symbols, setSymbols] = useState([]);
   const [searchTerm, setSearchTerm] = useState("");
   const [filteredSymbols, setFilteredSymbols] = useState([]);
   const [selectedSymbol, setSelectedSymbol] = useState("");
   const [isAddingToPortfolio, setIsAddingToPortfolio] = useState(false);
 
-  const fetchSymbols = async () => {
-    try {
-      const response = await axios.get("http://localhost:4000/api/stocks/symbols");
-      setSymbols(response.data);
-    } catch (error) {
-      console.error("Error fetching stock symbols:", error);
-    }
-  };
-
-  useEffect(() => {
-    fetchSymbols();
-  }, []);
-
   useEffect(() => {
-    if (searchTerm) {
-      setFilteredSymbols(
-        symbols.filter((symbol) =>
-          symbol.toLowerCase().includes(searchTerm.toLowerCase())
-        )
-      );
-    } else {
+    if (!searchTerm) {
       setFilteredSymbols([]);
+      return;
     }
-  }, [searchTerm, symbols]);
+
+    // Prefix search runs server-side against the cached symbol universe
+    let cancelled = false;
+    axios
+      .get("http://localhost:4000/api/stocks/symbols", {
+        params: { prefix: searchTerm, limit: 50 },
+      })
+      .then((response) => {
+        if (!cancelled) {
+          setFilteredSymbols(response.data);
+        }
+      })
+      .catch((error) => console.error("Error fetching stock symbols:", error));
+    return () => {
+      cancelled = true;
+    };
+  }, [searchTerm]);
 
   const handleSymbolClick = (symbol) => {
     setSelectedSymbol(symbol);
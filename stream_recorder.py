@@ -0,0 +1,125 @@
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+API_KEY = os.getenv('APCA_API_KEY_ID')
+SECRET_KEY = os.getenv('APCA_API_SECRET_KEY')
+DATA_STREAM_URL = os.getenv('APCA_STREAM_URL', "wss://stream.data.alpaca.markets/v2/iex")
+
+
+class StreamRecorder:
+    def __init__(self, path: str, flush_every: int = 1000, flush_interval: float = 1.0):
+        """
+        Append raw stream messages with their receive time to a gzip JSON-lines file
+
+        Each line is {"r": receive time in epoch nanoseconds, "m": raw message}.
+        Every open appends a new gzip member, so a recording can be resumed
+        and a crash loses at most the unflushed tail.
+
+        Args:
+            path: Recording file (conventionally *.jsonl.gz)
+            flush_every: Messages written between flushes
+            flush_interval: Maximum seconds between flushes
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, message: str, received_ns: Optional[int] = None) -> None:
+        line = json.dumps({"r": received_ns or time.time_ns(), "m": message}, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self.count += 1
+            self._unflushed += 1
+            if (self._unflushed >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def _flush(self) -> None:
+        self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_recording(path: str) -> Iterator[Tuple[int, str]]:
+    """Yield (receive time in epoch nanoseconds, raw message) from a recording, skipping a torn last line"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                yield record['r'], record['m']
+        except EOFError:
+            # Recorder was killed mid-write; everything before it is intact
+            return
+
+
+def record_stream(path: str,
+                  trades: List[str],
+                  quotes: Optional[List[str]] = None,
+                  bars: Optional[List[str]] = None,
+                  url: str = DATA_STREAM_URL) -> None:
+    """Subscribe to an Alpaca data stream and record every message until interrupted"""
+    import websocket
+
+    recorder = StreamRecorder(path)
+
+    def on_open(ws):
+        print("WebSocket opened.")
+        ws.send(json.dumps({"action": "auth", "key": API_KEY, "secret": SECRET_KEY}))
+        ws.send(json.dumps({
+            "action": "subscribe",
+            "trades": trades,
+            "quotes": quotes or [],
+            "bars": bars or [],
+        }))
+
+    def on_message(ws, message):
+        recorder.write(message, time.time_ns())
+
+    def on_error(ws, error):
+        print(f"Error occurred: {error}")
+
+    ws = websocket.WebSocketApp(url, on_open=on_open, on_message=on_message, on_error=on_error)
+    try:
+        ws.run_forever(reconnect=5)
+    finally:
+        recorder.close()
+        print(f"Recorded {recorder.count} messages to {path}")
+
+
+def _symbols(value: str) -> List[str]:
+    return [s for s in value.split(',') if s]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record an Alpaca market data stream")
+    parser.add_argument('path', help="Output file, e.g. trades.jsonl.gz (appended to if it exists)")
+    parser.add_argument('--trades', type=_symbols, default=["AAPL", "MSFT"], help="Comma-separated symbols")
+    parser.add_argument('--quotes', type=_symbols, default=[])
+    parser.add_argument('--bars', type=_symbols, default=[])
+    parser.add_argument('--url', default=DATA_STREAM_URL)
+    args = parser.parse_args()
+    record_stream(args.path, args.trades, args.quotes, args.bars, args.url)
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from stream_recorder import read_recording
+
+# Run locally and set APCA_STREAM_URL=ws://localhost:8765 to stand in for the Alpaca data stream
+PORT = 8765
+
+# Message type -> subscription channel
+CHANNELS = {'t': 'trades', 'q': 'quotes', 'b': 'bars', 'u': 'bars', 'd': 'bars'}
+
+
+def load_recording(path: str) -> List[Tuple[int, str, list]]:
+    """Read a recording into (receive ns, raw message, decoded items), dropping control messages"""
+    messages = []
+    for received, raw in read_recording(path):
+        items = json.loads(raw)
+        if not isinstance(items, list):
+            items = [items]
+        if any(item.get('T') in CHANNELS for item in items):
+            messages.append((received, raw, items))
+    return messages
+
+
+class StreamReplayServer:
+    def __init__(self, messages: List[Tuple[int, str, list]], speed: float = 1.0, loop: bool = False):
+        """
+        Serve a recorded stream over WebSocket using Alpaca's auth/subscribe protocol
+
+        Each client gets its own playback from the start of the recording once
+        it subscribes, filtered to its subscriptions ("*" matches every symbol).
+
+        Args:
+            messages: Output of load_recording
+            speed: Playback rate relative to the recorded receive times; 0 = as fast as possible
+            loop: Start over when the recording ends
+        """
+        if not messages:
+            raise ValueError("Recording has no market data messages")
+        self.messages = messages
+        self.speed = speed
+        self.loop = loop
+        self.sent = 0
+        self.port = None
+
+    async def handler(self, websocket) -> None:
+        await websocket.send(json.dumps([{"T": "success", "msg": "connected"}]))
+        authenticated = False
+        subscriptions: Dict[str, Set[str]] = {'trades': set(), 'quotes': set(), 'bars': set()}
+        replay = None
+        try:
+            async for raw in websocket:
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    await websocket.send(json.dumps([{"T": "error", "code": 400, "msg": "invalid syntax"}]))
+                    continue
+                action = message.get('action')
+                if action == 'auth':
+                    if not (message.get('key') and message.get('secret')):
+                        await websocket.send(json.dumps([{"T": "error", "code": 402, "msg": "auth failed"}]))
+                        continue
+                    authenticated = True
+                    await websocket.send(json.dumps([{"T": "success", "msg": "authenticated"}]))
+                elif not authenticated:
+                    await websocket.send(json.dumps([{"T": "error", "code": 401, "msg": "not authenticated"}]))
+                elif action in ('subscribe', 'unsubscribe'):
+                    for channel, symbols in subscriptions.items():
+                        change = set(message.get(channel) or [])
+                        if action == 'subscribe':
+                            symbols |= change
+                        else:
+                            symbols -= change
+                    await websocket.send(json.dumps([{
+                        "T": "subscription",
+                        **{channel: sorted(symbols) for channel, symbols in subscriptions.items()}
+                    }]))
+                    if replay is None:
+                        replay = asyncio.ensure_future(self._replay(websocket, subscriptions))
+        finally:
+            if replay is not None:
+                replay.cancel()
+
+    def _select(self, raw: str, items: list, subscriptions: Dict[str, Set[str]]) -> Optional[str]:
+        kept = []
+        for item in items:
+            symbols = subscriptions.get(CHANNELS.get(item.get('T')), ())
+            if '*' in symbols or item.get('S') in symbols:
+                kept.append(item)
+        if not kept:
+            return None
+        # Unfiltered messages go out as recorded, avoiding a re-encode
+        return raw if len(kept) == len(items) else json.dumps(kept)
+
+    async def _replay(self, websocket, subscriptions: Dict[str, Set[str]]) -> None:
+        event_loop = asyncio.get_running_loop()
+        first = self.messages[0][0]
+        sent = 0
+        started = time.monotonic()
+        while True:
+            start = event_loop.time()
+            for i, (received, raw, items) in enumerate(self.messages):
+                if self.speed > 0:
+                    delay = (received - first) / 1e9 / self.speed - (event_loop.time() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif i % 1000 == 0:
+                    await asyncio.sleep(0)  # Let other clients and control messages through
+                out = self._select(raw, items, subscriptions)
+                if out is not None:
+                    await websocket.send(out)
+                    sent += 1
+            if not self.loop:
+                break
+        self.sent += sent
+        elapsed = time.monotonic() - started
+        print(f"Replay finished: {sent} messages in {elapsed:.2f}s ({sent / max(elapsed, 1e-9):.0f} msg/s)")
+
+    async def serve(self, host: str = 'localhost', port: int = PORT, ready: Optional[threading.Event] = None) -> None:
+        import websockets
+
+        async with websockets.serve(self.handler, host, port, max_queue=None) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            if ready is not None:
+                ready.set()
+            await asyncio.Future()
+
+
+def start_replay_server(path: str, port: int = 0, speed: float = 1.0, loop: bool = False,
+                        timeout: float = 10.0) -> StreamReplayServer:
+    """
+    Start a replay server in a background thread; port 0 picks a free port (see .port)
+
+    Raises the server's error if it fails to start (e.g. the port is in use),
+    or TimeoutError if it is not listening within `timeout` seconds.
+    """
+    server = StreamReplayServer(load_recording(path), speed, loop)
+    ready = threading.Event()
+    errors = []
+
+    def run():
+        try:
+            asyncio.run(server.serve('localhost', port, ready))
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            ready.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    if not ready.wait(timeout):
+        raise TimeoutError(f"Replay server did not start within {timeout}s")
+    if errors:
+        raise errors[0]
+    return server
+
+
+def _speed(value: str) -> float:
+    return 0.0 if value == 'max' else float(value.rstrip('x'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded market data stream over WebSocket")
+    parser.add_argument('path', help="Recording written by stream_recorder.py")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--speed', type=_speed, default=1.0, help="1x, 10x, ... or max")
+    parser.add_argument('--loop', action='store_true', help="Restart the recording when it ends")
+    args = parser.parse_args()
+    replay_server = StreamReplayServer(load_recording(args.path), args.speed, args.loop)
+    print(f"Replaying {len(replay_server.messages)} messages on ws://localhost:{args.port}")
+    asyncio.run(replay_server.serve('localhost', args.port))
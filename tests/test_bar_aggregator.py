@@ -0,0 +1,57 @@
+import pandas as pd
+
+import bar_aggregator
+from bar_aggregator import BAR_COLUMNS, aggregate_trade_file, insert_bars
+
+
+class RecordingConnection:
+    """psycopg2 connection stand-in keeping the rows insert_bars writes"""
+
+    def __init__(self):
+        self.rows = []
+        self.notifications = []
+        self.committed = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.notifications.append(params)
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        pass
+
+
+def test_empty_chunk_keeps_bar_dtypes_through_insert(tmp_path, monkeypatch):
+    path = tmp_path / 'trades.csv'
+    pd.DataFrame({
+        'symbol': ['AAPL'] * 6,
+        'timestamp': ['2024-01-02T15:00:00Z', '2024-01-02T15:00:10Z',
+                      # The second chunk stays inside the open minute, so it finishes no bars
+                      '2024-01-02T15:00:20Z', '2024-01-02T15:00:30Z',
+                      '2024-01-02T15:01:05Z', '2024-01-02T15:02:10Z'],
+        'price': [10.0, 11.0, 9.0, 10.5, 12.0, 12.5],
+        'size': [100, 200, 100, 50, 10, 20],
+    }).to_csv(path, index=False)
+
+    bars = aggregate_trade_file(str(path), chunk_size=2)
+    assert list(bars.columns) == BAR_COLUMNS
+    assert bars['timestamp'].dtype == 'datetime64[ns]'
+    assert bars['number_of_trades'].tolist() == [4, 1, 1]
+    assert bars['high_price'].tolist() == [11.0, 12.0, 12.5]
+
+    conn = RecordingConnection()
+    monkeypatch.setattr(bar_aggregator.psycopg2, 'connect', lambda **params: conn)
+    monkeypatch.setattr(bar_aggregator, 'execute_values', lambda cursor, sql, rows: conn.rows.extend(rows))
+    insert_bars({}, bars)
+    assert conn.committed and len(conn.rows) == 3 and len(conn.notifications) == 3
+    assert conn.rows[0][1] == pd.Timestamp('2024-01-02T15:00:00').to_pydatetime()
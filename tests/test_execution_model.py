@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from execution_model import BARS_PER_YEAR, ExecutionModel
+
+
+def test_volatility_sizing_does_not_depend_on_the_slice():
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, 2000)))
+    model = ExecutionModel(sizing='volatility', volatility_window=20)
+    full = model.position_size(close)
+
+    # A chunk sized with only its lookback of history, as run_chunked and live sizing do
+    start = 1200
+    chunk = model.position_size(close[start - model.lookback:])[model.lookback:]
+    np.testing.assert_allclose(chunk, full[start:])
+    assert model.periods_per_year == BARS_PER_YEAR['1Min']
+
+
+def test_from_params_rejects_invalid_execution():
+    with pytest.raises(ValueError, match='object'):
+        ExecutionModel.from_params(execution=['spread'])
+    with pytest.raises(ValueError, match='Unknown execution parameters: bogus'):
+        ExecutionModel.from_params(execution={'bogus': 1})
+    with pytest.raises(ValueError):
+        ExecutionModel.from_params(execution={'fraction': 'half'})
+    with pytest.raises(ValueError):
+        ExecutionModel.from_params(execution={'periods_per_year': 0})
+    assert ExecutionModel.from_params(0.001, execution={'spread': 0.0002}).commission == 0.001
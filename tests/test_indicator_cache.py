@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from indicator_cache import IndicatorStore
+
+
+def bars(n=5000, seed=7):
+    rng = np.random.default_rng(seed)
+    times = np.datetime64('2024-01-02T14:30', 'ns') + np.arange(n) * np.timedelta64(60, 's')
+    return times, 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+
+
+def direct(values, window):
+    return pd.Series(values).rolling(window).mean().to_numpy()
+
+
+def test_overlapping_chunks_merge_into_one_series(tmp_path):
+    times, close = bars()
+    store = IndicatorStore(cache_dir=str(tmp_path))
+    # Chunks overlapping by the lookback, as run_chunked reads them
+    for start in range(0, len(times), 1000):
+        lo = max(start - 31, 0)
+        result = store.get('AAPL', 'sma', 30, times[lo:start + 1000], close[lo:start + 1000])
+        np.testing.assert_allclose(result, direct(close[lo:start + 1000], 30), rtol=1e-12, equal_nan=True)
+    (segments,) = store._series.values()
+    assert len(segments) == 1 and len(segments[0].times) == len(times)
+    np.testing.assert_allclose(segments[0].indicators[('sma', 30)], direct(close, 30), rtol=1e-12, equal_nan=True)
+
+    # Any range of the run is now a slice, also for a process reading the persisted file
+    misses = store.misses
+    store.get('AAPL', 'sma', 30, times[1500:3500], close[1500:3500])
+    assert store.misses == misses
+    reloaded = IndicatorStore(cache_dir=str(tmp_path))
+    result = reloaded.get('AAPL', 'sma', 30, times[2000:2600], close[2000:2600])
+    np.testing.assert_allclose(result, direct(close[2000:2600], 30), rtol=1e-12, equal_nan=True)
+    assert reloaded.misses == 0
+
+
+def test_alternating_disjoint_ranges_stay_cached():
+    times, close = bars()
+    store = IndicatorStore()
+    for _ in range(3):
+        store.get('AAPL', 'sma', 20, times[:1000], close[:1000])
+        store.get('AAPL', 'sma', 20, times[3000:4000], close[3000:4000])
+    assert store.misses == 2 and store.hits == 4
+
+
+def test_changed_bars_are_recomputed_and_invalidate_releases_them():
+    times, close = bars()
+    store = IndicatorStore()
+    store.get('AAPL', 'sma', 20, times[:2000], close[:2000])
+    changed = close.copy()
+    changed[1500] *= 1.01
+    result = store.get('AAPL', 'sma', 20, times[1000:3000], changed[1000:3000])
+    np.testing.assert_allclose(result, direct(changed[1000:3000], 20), rtol=1e-12, equal_nan=True)
+    (segments,) = store._series.values()
+    assert len(segments) == 1 and segments[0].times[0] == times[1000].astype(np.int64)
+
+    store.invalidate('AAPL')
+    assert not store._series and store._bytes == 0
+
+
+def test_a_single_growing_entry_stays_within_the_budget():
+    times, close = bars(20000)
+    store = IndicatorStore(max_bytes=200_000)
+    for start in range(0, len(times), 1000):
+        lo = max(start - 21, 0)
+        result = store.get('AAPL', 'sma', 20, times[lo:start + 1000], close[lo:start + 1000])
+        np.testing.assert_allclose(result, direct(close[lo:start + 1000], 20), rtol=1e-12, equal_nan=True)
+        assert store._bytes <= store.max_bytes
+        assert store._bytes == sum(s.nbytes for segments in store._series.values() for s in segments)
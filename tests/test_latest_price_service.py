@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from fake_alpaca_server import FakeAlpacaHandler, FakeAlpacaState, start_fake_server
+from latest_price_service import LatestPriceService
+
+
+@pytest.fixture
+def fake_alpaca():
+    FakeAlpacaHandler.state = FakeAlpacaState(seed=1)
+    server = start_fake_server()
+    yield server, FakeAlpacaHandler.state
+    server.shutdown()
+    server.server_close()
+
+
+def make_service(server, **kwargs):
+    service = LatestPriceService(data_url=f"http://localhost:{server.server_address[1]}/v2", **kwargs)
+    service.session.headers["APCA-API-KEY-ID"] = "test"
+    return service
+
+
+def test_prices_are_fetched_in_batches_and_cached(fake_alpaca):
+    server, state = fake_alpaca
+    service = make_service(server, batch_size=2, ttl=60)
+
+    prices = service.get_prices(["aapl", "MSFT", "TSLA", "AAPL"])
+
+    assert sorted(prices) == ["AAPL", "MSFT", "TSLA"]
+    assert prices["AAPL"]["price"] == state.prices["AAPL"]
+    assert prices["AAPL"]["bid"] < prices["AAPL"]["ask"]
+    assert state.request_count == 2
+    assert service.get_price("msft") == prices["MSFT"]["price"]
+    assert state.request_count == 2
+
+
+def test_concurrent_requests_share_one_fetch(fake_alpaca):
+    server, state = fake_alpaca
+    service = make_service(server, ttl=60)
+    fetch = service._fetch_snapshots
+
+    def slow_fetch(symbols):
+        time.sleep(0.2)
+        return fetch(symbols)
+
+    service._fetch_snapshots = slow_fetch
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get_prices(["AAPL"]))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state.request_count == 1
+    assert all(result["AAPL"]["price"] == state.prices["AAPL"] for result in results)
+
+
+def test_unexpected_fetch_error_releases_waiting_symbols(fake_alpaca):
+    server, state = fake_alpaca
+    service = make_service(server, ttl=60, timeout=5)
+
+    def broken_fetch(symbols):
+        raise KeyError("malformed snapshot")
+
+    fetch = service._fetch_snapshots
+    service._fetch_snapshots = broken_fetch
+    with pytest.raises(KeyError):
+        service.get_prices(["AAPL"])
+    assert service._inflight == {}
+
+    service._fetch_snapshots = fetch
+    started = time.monotonic()
+    prices = service.get_prices(["AAPL"])
+    assert time.monotonic() - started < 1
+    assert prices["AAPL"]["price"] == state.prices["AAPL"]
+
+
+def test_fake_server_rejects_missing_credentials(fake_alpaca):
+    server, state = fake_alpaca
+    service = LatestPriceService(data_url=f"http://localhost:{server.server_address[1]}/v2")
+    service.session.headers["APCA-API-KEY-ID"] = ""
+
+    assert service.get_prices(["AAPL"]) == {}
+    assert state.request_count == 0
+
+
+def test_failed_batch_keeps_quotes_from_earlier_batches(fake_alpaca):
+    import requests
+
+    server, state = fake_alpaca
+    service = make_service(server, batch_size=2, ttl=60)
+    get = service.session.get
+    calls = []
+
+    def flaky_get(*args, **kwargs):
+        calls.append(kwargs["params"]["symbols"])
+        if len(calls) == 2:
+            raise requests.ConnectionError("connection reset")
+        return get(*args, **kwargs)
+
+    service.session.get = flaky_get
+    prices = service.get_prices(["AAPL", "MSFT", "TSLA"])
+
+    assert sorted(prices) == ["AAPL", "MSFT"]
+    assert prices["MSFT"]["price"] == state.prices["MSFT"]
+    assert service._inflight == {}
@@ -0,0 +1,116 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from moving_average_crossover import MACrossoverBacktest
+from paper_trading import ExecutionEngine, LiveStrategy, MockBroker, Signal
+
+
+class CountingBroker(MockBroker):
+    """MockBroker counting list_orders calls and optionally failing the first submissions"""
+
+    def __init__(self, fail_submits: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.list_orders_calls = 0
+        self.fail_submits = fail_submits
+
+    def list_orders(self, status='all', limit=500):
+        self.list_orders_calls += 1
+        return super().list_orders(status, limit)
+
+    def submit_order(self, symbol, qty, side, client_order_id):
+        if self.fail_submits:
+            self.fail_submits -= 1
+            raise ConnectionError("broker unavailable")
+        return super().submit_order(symbol, qty, side, client_order_id)
+
+
+def signal(symbol, side, qty):
+    return Signal(symbol, side, qty, 'test', time.monotonic_ns())
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_open_orders_are_polled_once_per_interval():
+    broker = CountingBroker(fill_delay=1.0)
+    engine = ExecutionEngine(broker, db_params=None, poll_interval=0.1, reconcile_interval=60)
+    engine.start()
+    try:
+        engine.submit(signal('AAPL', 'buy', 5))
+        assert wait_until(lambda: engine.pending('AAPL') == 5 and engine.orders)
+        time.sleep(0.6)
+        calls = broker.list_orders_calls
+    finally:
+        engine.stop()
+    # Roughly one poll per interval plus the wake-up from the submission
+    assert calls <= 10
+
+
+def test_fills_update_positions_and_pending():
+    broker = CountingBroker(fill_delay=0.2)
+    engine = ExecutionEngine(broker, db_params=None, poll_interval=0.05, batch_window=0.01)
+    engine.start()
+    try:
+        engine.submit(signal('AAPL', 'buy', 5))
+        engine.submit(signal('MSFT', 'buy', 3))
+        engine.submit(signal('MSFT', 'sell', 3))
+        assert engine.pending('AAPL') == 5
+        assert wait_until(lambda: engine.position('AAPL') == 5)
+        assert engine.pending('AAPL') == 0
+        # Opposing MSFT signals were netted without an order
+        assert engine.position('MSFT') == 0 and engine.pending('MSFT') == 0
+        assert [o['symbol'] for o in engine.orders.values()] == ['AAPL']
+    finally:
+        engine.stop()
+
+
+def test_reconcile_rereads_broker_positions_once_settled():
+    broker = CountingBroker()
+    engine = ExecutionEngine(broker, db_params=None)
+    broker.positions['TSLA'] = {'qty': 7.0, 'avg_entry_price': 200.0}
+
+    engine.reconcile()
+
+    assert engine.position('TSLA') == 7
+    broker.positions.clear()
+    engine.reconcile()
+    assert engine.position('TSLA') == 0
+
+
+def test_failed_submission_is_retried_on_the_next_bar():
+    broker = CountingBroker(fail_submits=1)
+    engine = ExecutionEngine(broker, db_params=None, poll_interval=0.05, batch_window=0.01)
+    backtest = MACrossoverBacktest(db_params={}, symbol='TEST', start_date='2024-01-02', end_date='2024-01-02',
+                                   fast_window=2, slow_window=4)
+    strategy = LiveStrategy('moving_average', backtest, quantity=10)
+    times = pd.date_range('2024-01-02 14:30', periods=30, freq='min')
+    bars = pd.DataFrame({'timestamp': times, 'volume': 1000.0,
+                         'close_price': np.r_[np.linspace(110, 100, 20), np.linspace(101, 110, 10)]})
+    strategy.warm_up(bars.iloc[:20].reset_index(drop=True))
+
+    engine.start()
+    try:
+        sent = []
+        for i in range(20, 30):
+            order = strategy.on_bars(bars.iloc[i:i + 1], engine.position('TEST'), engine.pending('TEST'))
+            if order is not None:
+                sent.append(order)
+                engine.submit(order)
+            # Let the engine submit (or fail) and the fill be tracked before the next bar
+            wait_until(lambda: engine.pending('TEST') == 0)
+            time.sleep(0.1)
+        assert wait_until(lambda: engine.position('TEST') == 10)
+    finally:
+        engine.stop()
+
+    # The first buy failed at the broker, the next bar sent it again, then nothing more
+    assert [(s.side, s.qty) for s in sent] == [('buy', 10.0), ('buy', 10.0)]
+    assert broker.positions['TEST']['qty'] == 10
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from moving_average_crossover import MACrossoverBacktest
+from robustness import resample, robustness_report
+
+
+def minute_bars(n=390 * 10, seed=5):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range('2024-01-02 14:30', periods=n, freq='min')
+    close = 100 * np.exp(np.cumsum(rng.normal(0.00004, 0.001, n)))
+    return pd.DataFrame({'timestamp': timestamps, 'close_price': close, 'volume': np.full(n, 1000.0)})
+
+
+def test_bar_sharpe_is_annualized_like_the_backtest_metrics():
+    backtest = MACrossoverBacktest({}, 'TEST', '2024-01-02', '2024-01-12', fast_window=5, slow_window=20)
+    backtest.fetch_data = minute_bars
+    df, results = backtest.execute_backtest()
+
+    report = robustness_report(df['Strategy_Returns'], backtest.trades, df['timestamp'],
+                               n_resamples=2000, seed=1)
+    median = report['bar_bootstrap']['sharpe_ratio']['median']
+    assert median == pytest.approx(results['Sharpe Ratio'], rel=0.1, abs=0.5)
+
+
+def test_annualization_rate_is_required():
+    returns = np.random.default_rng(0).normal(0, 0.01, 100)
+    with pytest.raises(ValueError):
+        resample(returns, 10)
+    with pytest.raises(ValueError):
+        robustness_report(returns, [])
@@ -0,0 +1,45 @@
+import json
+import threading
+import time
+
+import screener
+from screener import Screener, _note_stale_day
+
+
+def test_expired_matrix_is_served_while_one_thread_reloads(monkeypatch):
+    release = threading.Event()
+    loads = []
+
+    def load_matrix(db_params, lookback_days):
+        loads.append(threading.current_thread().name)
+        if len(loads) > 1:
+            release.wait(5)
+        return f"matrix {len(loads)}"
+
+    monkeypatch.setattr(screener, 'load_matrix', load_matrix)
+    s = Screener({}, ttl=0.05)
+    assert s.matrix() == "matrix 1"
+    time.sleep(0.1)
+
+    reloaded = []
+    reloader = threading.Thread(target=lambda: reloaded.append(s.matrix()), name='reloader')
+    reloader.start()
+    while len(loads) < 2:
+        time.sleep(0.01)
+    # The reload is in progress: other requests get the previous matrix at once
+    started = time.monotonic()
+    assert s.matrix() == "matrix 1"
+    assert time.monotonic() - started < 1
+    release.set()
+    reloader.join(5)
+    assert reloaded == ["matrix 2"] and loads == ['MainThread', 'reloader']
+    assert s.matrix() == "matrix 2"
+
+
+def test_stale_days_keep_the_earliest_reported_per_symbol():
+    stale = {}
+    _note_stale_day(stale, 'bars_changed', json.dumps({"symbol": "AAPL", "start": "2024-03-05T14:31:00Z"}))
+    _note_stale_day(stale, 'bar', json.dumps({"symbol": "AAPL", "timestamp": "2024-03-07T15:00:00.000000"}))
+    _note_stale_day(stale, 'bar', json.dumps({"symbol": "MSFT", "timestamp": "2024-03-07T15:00:00.000000"}))
+    _note_stale_day(stale, 'bars_changed', json.dumps({"symbol": "AAPL", "start": "2024-02-01T14:31:00Z"}))
+    assert stale == {"AAPL": "2024-02-01", "MSFT": "2024-03-07"}
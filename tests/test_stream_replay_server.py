@@ -0,0 +1,25 @@
+import json
+import socket
+import time
+
+import pytest
+
+from stream_recorder import StreamRecorder
+from stream_replay_server import start_replay_server
+
+
+def test_start_fails_fast_when_the_port_is_taken(tmp_path):
+    path = str(tmp_path / 'stream.rec')
+    with StreamRecorder(path) as recorder:
+        recorder.write(json.dumps([{"T": "t", "S": "AAPL", "p": 190.0, "s": 10, "t": "2024-01-02T15:00:00Z"}]))
+
+    with socket.socket() as taken:
+        taken.bind(('localhost', 0))
+        taken.listen()
+        started = time.monotonic()
+        with pytest.raises(OSError):
+            start_replay_server(path, port=taken.getsockname()[1], timeout=5)
+        assert time.monotonic() - started < 5
+
+    server = start_replay_server(path, timeout=5)
+    assert server.port
@@ -1,13 +1,25 @@
-import alpaca_trade_api as tradeapi
 import websocket
 import json
 import os
+from bar_aggregator import TradeBarAggregator, insert_bars
 
 # Replace with your Alpaca API credentials
 API_KEY = os.getenv('APCA_API_KEY_ID')
 SECRET_KEY = os.getenv('APCA_API_SECRET_KEY')
 BASE_URL = "https://paper-api.alpaca.markets"  # For paper trading; use "https://api.alpaca.markets" for live trading
-DATA_STREAM_URL = "wss://stream.data.alpaca.markets/v2/iex"  # Use IEX or SIP based on your subscription
+DATA_STREAM_URL = os.getenv('APCA_STREAM_URL', "wss://stream.data.alpaca.markets/v2/iex")  # Use IEX or SIP based on your subscription; point at stream_replay_server.py to run offline
+
+DB_PARAMS = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "alpaca_data",
+    "user": "postgres",
+    "password": "secretpass"
+}
+
+# Trades are rolled up into 1-minute bars and stored alongside the historical ones
+aggregator = TradeBarAggregator(interval='1Min', on_bars=lambda bars: insert_bars(DB_PARAMS, bars))
+
 print(API_KEY)
 # Callback functions for WebSocket
 def on_open(ws):
@@ -29,12 +41,14 @@ def on_open(ws):
 
 def on_message(ws, message):
     print(f"Received message: {message}")
+    aggregator.add_messages(json.loads(message))
 
 def on_error(ws, error):
     print(f"Error occurred: {error}")
 
 def on_close(ws, close_status_code, close_msg):
     print("WebSocket closed.")
+    aggregator.flush()
 
 # Initialize WebSocket connection
 def start_stream():
@@ -1,12 +1,24 @@
 import websocket
 import json
 import os
+from bar_aggregator import TradeBarAggregator, insert_bars
 # Replace with your Alpaca API credentials
 API_KEY = os.getenv('APCA_API_KEY_ID')
 SECRET_KEY = os.getenv('APCA_API_SECRET_KEY')
 
 # Updated WebSocket URL for crypto data
-CRYPTO_STREAM_URL = "wss://stream.data.alpaca.markets/v1beta3/crypto/us"
+CRYPTO_STREAM_URL = os.getenv('APCA_CRYPTO_STREAM_URL', "wss://stream.data.alpaca.markets/v1beta3/crypto/us")
+
+DB_PARAMS = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "alpaca_data",
+    "user": "postgres",
+    "password": "secretpass"
+}
+
+# Trades are rolled up into 1-minute bars and stored alongside the historical ones
+aggregator = TradeBarAggregator(interval='1Min', on_bars=lambda bars: insert_bars(DB_PARAMS, bars))
 
 def on_open(ws):
     print("WebSocket opened.")
@@ -27,12 +39,14 @@ def on_open(ws):
 
 def on_message(ws, message):
     print(f"Received message: {message}")
+    aggregator.add_messages(json.loads(message))
 
 def on_error(ws, error):
     print(f"Error occurred: {error}")
 
 def on_close(ws, close_status_code, close_msg):
     print("WebSocket closed.")
+    aggregator.flush()
 
 def start_stream():
     ws = websocket.WebSocketApp(